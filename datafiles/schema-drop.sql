@@ -1,7 +1,10 @@
 -- OpenNSA SQL Schema (PostgreSQL) DROPs
 -- This is mainly for development
 
+DROP TABLE outbound_messages;
 DROP TABLE generic_backend_connections;
+DROP FUNCTION generic_backend_change();
+DROP SEQUENCE generic_backend_change_seq;
 DROP TABLE sub_connections;
 DROP TABLE service_connections;
 DROP TYPE directionality;
@@ -73,6 +73,10 @@ CREATE TABLE sub_connections (
 );
 
 
+-- change sequence for generic backend connections, used for finding connections
+-- changed since a calendar snapshot was written
+CREATE SEQUENCE generic_backend_change_seq;
+
 -- move this into the backend sometime
 CREATE TABLE generic_backend_connections (
     id                      serial                      PRIMARY KEY,
@@ -98,7 +102,34 @@ CREATE TABLE generic_backend_connections (
     directionality          directionality              NOT NULL,
     bandwidth               integer                     NOT NULL, -- mbps
     parameter               parameter[],
-    allocated               boolean                     NOT NULL  -- indicated if the resources are actually allocated
+    allocated               boolean                     NOT NULL, -- indicated if the resources are actually allocated
+    change_seq              bigint                      NOT NULL DEFAULT nextval('generic_backend_change_seq')
+);
+
+CREATE FUNCTION generic_backend_change() RETURNS trigger AS $$
+BEGIN
+    NEW.change_seq := nextval('generic_backend_change_seq');
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER generic_backend_change BEFORE UPDATE ON generic_backend_connections
+    FOR EACH ROW EXECUTE PROCEDURE generic_backend_change();
+
+-- For existing databases, the change sequence can be added with:
+-- CREATE SEQUENCE generic_backend_change_seq;
+-- ALTER TABLE generic_backend_connections ADD COLUMN change_seq bigint NOT NULL DEFAULT nextval('generic_backend_change_seq');
+-- and the function and trigger above.
+
+
+-- outbound notifications/confirmations waiting to be delivered to requesters
+CREATE TABLE outbound_messages (
+    id                      serial                      PRIMARY KEY,
+    url                     text                        NOT NULL,
+    action                  text                        NOT NULL,
+    payload                 text                        NOT NULL,
+    attempts                integer                     NOT NULL,
+    created                 timestamp                   NOT NULL
 );
 
 
@@ -6,18 +6,26 @@ Copyright: NORDUnet (2011-2012)
 """
 import datetime
 
-from zope.interface import implements
+from zope.interface import implementer
 
 from twisted.python import log
 from twisted.internet import defer
 
 from opennsa.interface import INSIProvider, INSIRequester
-from opennsa import error, nsa, state, database, constants as cnt
+from opennsa import error, nsa, state, database, logging, constants as cnt
+from opennsa.shared import cache
 
 
 
 LOG_SYSTEM = 'Aggregator'
 
+# states where a connection has a request outstanding
+TRANSIENT_STATES = ( state.RESERVE_CHECKING, state.RESERVE_HELD, state.RESERVE_COMMITTING, state.RESERVE_FAILED,
+                     state.RESERVE_ABORTING, state.RESERVE_TIMEOUT, state.PROVISIONING, state.RELEASING, state.TERMINATING )
+
+# order id of sub connections from failed reservation attempts, they are kept until their termination is confirmed
+ABANDONED = -1
+
 
 
 def shortLabel(label):
@@ -63,9 +71,26 @@ def _createAggregateException(connection_id, action, results, provider_urns, def
 
 
 
+def _labelSize(label):
+    # number of label values
+    if label is None or label.values is None:
+        return 0
+    return sum( [ v2 - v1 + 1 for v1, v2 in label.values ] )
+
+
+
+def _inFlight(conn):
+    # in-flight connections are pinned in the orm cache, so concurrent updates use the same object
+    return conn.reservation_state in TRANSIENT_STATES or conn.provision_state in TRANSIENT_STATES or conn.lifecycle_state in TRANSIENT_STATES
+
+
+
+@implementer(INSIProvider, INSIRequester)
 class Aggregator:
 
-    implements(INSIProvider, INSIRequester)
+    CONNECTION_CACHE_SIZE = 10000
+    DEMARCATION_CACHE_SIZE = 1000 # remote networks for which the demarcation ports are kept
+    RESERVATION_TTL = 600 # seconds, reservation info is dropped if no confirmation arrives within this time
 
     def __init__(self, network, nsa_, network_topology, route_vectors, parent_requester, provider_registry, policies, plugin):
         self.network = network
@@ -78,12 +103,18 @@ class Aggregator:
         self.policies           = policies
         self.plugin             = plugin
 
-        self.reservations       = {} # correlation_id -> info
+        self.reservations       = cache.ExpiringDict(self.RESERVATION_TTL, name='aggregator.reservations') # correlation_id -> info
+        self.alternative_paths  = cache.ExpiringDict(self.RESERVATION_TTL, name='aggregator.alternative_paths') # connection key -> untried paths
         self.notification_id    = 0
 
         # db orm cache, needed to avoid concurrent updates stepping on each other
-        self.db_connections = {}
-        self.db_sub_connections = {}
+        self.db_connections = cache.LRUCache(self.CONNECTION_CACHE_SIZE, _inFlight, 'aggregator.connection_cache')
+        self.db_sub_connections = cache.LRUCache(self.CONNECTION_CACHE_SIZE, _inFlight, 'aggregator.sub_connection_cache')
+
+        # remote network -> demarcation ports, see _demarcationPorts
+        self.demarcation_cache = cache.LRUCache(self.DEMARCATION_CACHE_SIZE, name='aggregator.demarcation_cache')
+        if route_vectors is not None:
+            route_vectors.callOnUpdate(self._vectorsUpdated, paths=True)
 
         # these are for query recursive, due to nsi being extremely crappy design
         self.query_requests = {}
@@ -111,8 +142,9 @@ class Aggregator:
             self.db_connections[connection_id] = connections[0]
             return connections[0]
 
-        if connection_id in self.db_connections:
-            return defer.succeed(self.db_connections[connection_id])
+        conn = self.db_connections.get(connection_id)
+        if conn is not None:
+            return defer.succeed(conn)
 
         d = database.ServiceConnection.findBy(connection_id=connection_id)
         d.addCallback(gotResult)
@@ -142,8 +174,9 @@ class Aggregator:
             self.db_sub_connections[connection_id] = connections[0]
             return connections[0]
 
-        if connection_id in self.db_sub_connections:
-            return defer.succeed(self.db_sub_connections[connection_id])
+        sub_conn = self.db_sub_connections.get(connection_id)
+        if sub_conn is not None:
+            return defer.succeed(sub_conn)
 
         d = database.SubConnection.findBy(provider_nsa=provider_nsa, connection_id=connection_id)
         d.addCallback(gotResult)
@@ -163,7 +196,7 @@ class Aggregator:
             return defer.DeferredList(defs).addCallback(gotSubConns)
 
         dbconfig = database.Registry.getConfig()
-        d = dbconfig.select('sub_connections', where=['service_connection_id = ?', service_connection_key], select='provider_nsa, connection_id')
+        d = dbconfig.select('sub_connections', where=['service_connection_id = ? AND order_id <> ?', service_connection_key, ABANDONED], select='provider_nsa, connection_id')
         d.addCallback(gotResult)
         return d
 
@@ -311,25 +344,24 @@ class Aggregator:
                 local_stp      = dest_stp
                 remote_stp     = source_stp
 
-            # we should really find multiple port/link vectors to the remote network, but right now we don't
-            vector_port = self.route_vectors.vector(remote_stp.network)
-            if vector_port is None:
+            demarcations = self._demarcationPorts(remote_stp.network)
+            if not demarcations:
                 raise error.STPResolutionError('No vector to network %s, cannot create circuit' % remote_stp.network)
 
-            log.msg('Vector to %s via port %s' % (remote_stp.network, vector_port), system=LOG_SYSTEM)
+            log.msg('Vector to %s via port(s) %s' % (remote_stp.network, ', '.join( [ d[0].id_ for d in demarcations ] )), system=LOG_SYSTEM)
 
-            # this really shouldn't fail, so we don't need to check
-            demarc_ports = [ self.network_topology.getPort( self.network + ':' + vector_port ) ]
+            demarcations = yield self._rankDemarcationPorts(demarcations, criteria.schedule, sd.capacity)
 
-            ldp = demarc_ports[0] # most of the time we will only have one anyway, should iterate and build multiple paths
+            # one path per demarcation port, the least loaded first, the others are tried if reservation fails
+            paths = []
+            for ldp, remote_demarc_network, remote_demarc_port in demarcations:
+                local_demarc_port  = ldp.id_.rsplit(':', 1)[1]
 
-            local_demarc_port  = ldp.id_.rsplit(':', 1)[1]
-            remote_demarc_network, remote_demarc_port = ldp.remote_port.rsplit(':', 1) # [1] # this is wrong in the new naming scheme
+                local_link  = nsa.Link( local_stp, nsa.STP(local_stp.network, local_demarc_port, ldp.label()) )
+                remote_link = nsa.Link( nsa.STP(remote_demarc_network, remote_demarc_port, ldp.label()), remote_stp) # # the ldp label isn't quite correct
 
-            local_link  = nsa.Link( local_stp, nsa.STP(local_stp.network, local_demarc_port, ldp.label()) )
-            remote_link = nsa.Link( nsa.STP(remote_demarc_network, remote_demarc_port, ldp.label()), remote_stp) # # the ldp label isn't quite correct
+                paths.append( [ local_link, remote_link ] )
 
-            paths = [ [ local_link, remote_link ] ]
             paths = yield self.plugin.prunePaths(paths)
 
         elif cnt.AGGREGATOR in self.policies:
@@ -343,33 +375,103 @@ class Aggregator:
                 (source_stp.network, dest_stp.network, self.network))
 
 
-        selected_path = paths[0] # shortest path (legacy structure)
-        log_path = ' -> '.join( [ str(p) for p in selected_path ] )
-        log.msg('Attempting to create path %s' % log_path, system=LOG_SYSTEM)
+        conn_trace = (header.connection_trace or []) + [ self.nsa_.urn() + ':' + conn.connection_id ]
 
-        for link in selected_path:
-            if link.src_stp.network == self.network:
-                continue # we got this..
-            p = self.provider_registry.getProviderByNetwork(link.src_stp.network)
-            if p is None:
-                raise error.ConnectionCreateError('No provider for network %s. Cannot create link.' % link.src_stp.network)
+        err = yield self._reservePaths(header, conn, criteria, paths, conn_trace, request_info, connection_id)
+        if err is None:
+            log.msg('Connection %s: Reserve acked' % conn.connection_id, system=LOG_SYSTEM)
+            defer.returnValue(connection_id)
 
-        conn_trace = (header.connection_trace or []) + [ self.nsa_.urn() + ':' + conn.connection_id ]
+        # I think this is out of spec, the aggregator shouldn't do anything here...
+        yield state.terminating(conn)
+        yield state.terminated(conn)
+        raise err
+
+
+    @defer.inlineCallbacks
+    def _reservePaths(self, header, conn, criteria, paths, conn_trace, request_info, local_connection_id):
+        # try the paths in order until one is acked by all children, returns None if one is, otherwise the error of the last path
+        for attempt, selected_path in enumerate(paths):
+
+            log_path = ' -> '.join( [ str(p) for p in selected_path ] )
+            log.msg('Attempting to create path %s' % log_path, system=LOG_SYSTEM)
+
+            for link in selected_path:
+                if link.src_stp.network == self.network:
+                    continue # we got this..
+                p = self.provider_registry.getProviderByNetwork(link.src_stp.network)
+                if p is None:
+                    raise error.ConnectionCreateError('No provider for network %s. Cannot create link.' % link.src_stp.network)
+
+            # the remaining paths are kept, so they can be tried if a child fails the reservation asynchronously, see reserveFailed
+            remaining_paths = paths[attempt+1:]
+            if remaining_paths:
+                self.alternative_paths[conn.id] = (header, criteria, remaining_paths, conn_trace, request_info)
+
+            # the local sub connection gets the connection id of the aggregate, but it may be terminated by a previous attempt
+            results, conn_info = yield self._reservePath(header, conn, criteria, selected_path, local_connection_id if attempt == 0 else None, conn_trace, request_info)
+            successes = [ r[0] for r in results ]
+
+            if all(successes):
+                defer.returnValue(None)
+
+            self.alternative_paths.pop(conn.id, None)
+
+            if remaining_paths:
+                # forget the failed attempt, so late confirmations are not aggregated into the next attempt
+                for _, _, correlation_id in conn_info:
+                    self.reservations.pop(correlation_id, None)
+                yield self._abandonSubConnections(conn)
+
+            # terminate non-failed connections
+            # currently we don't try and be too clever about cleaning, just do it, and switch state
+            defs = []
+            reserved_connections = [ (sc_id, provider_urn) for (success,sc_id),(_,provider_urn,_) in zip(results, conn_info) if success ]
+            for (sc_id, provider_urn) in reserved_connections:
+                defs.append( self._terminateSubConnection(header, provider_urn, sc_id) )
+            yield defer.DeferredList(defs)
+
+            # construct provider nsa urns, so we can produce a good error message
+            provider_urns = [ ci[1] for ci in conn_info ]
+            err = _createAggregateException(conn.connection_id, 'reservations', results, provider_urns, error.ConnectionCreateError)
+
+            if not remaining_paths:
+                defer.returnValue(err)
+
+            log.msg('Connection %s: Reservation via path %s failed (%s), trying next path' % (conn.connection_id, log_path, err), system=LOG_SYSTEM)
+
+
+    def _terminateSubConnection(self, header, provider_urn, sc_id):
+        provider = self.getProvider(provider_urn)
+        t_header = nsa.NSIHeader(self.nsa_.urn(), provider_urn, security_attributes=header.security_attributes)
+
+        d = provider.terminate(t_header, sc_id)
+        d.addCallbacks(
+            lambda c : log.msg('Succesfully terminated sub connection %s at %s after partial reservation failure.' % (sc_id, provider_urn) , system=LOG_SYSTEM),
+            lambda f : log.msg('Error terminating connection after partial-reservation failure: %s' % str(f), system=LOG_SYSTEM)
+        )
+        return d
+
+
+    def _reservePath(self, header, conn, criteria, path, local_connection_id, conn_trace, request_info):
+        # send reserve for each link in the path, returns deferred list results and [ (deferred, provider urn, correlation id) ]
+
+        sd = criteria.service_def
         conn_info = []
 
-        for idx, link in enumerate(selected_path):
+        for idx, link in enumerate(path):
 
             sub_connection_id = None
 
             if link.src_stp.network == self.network:
                 provider_urn = self.nsa_.urn()
-                sub_connection_id = connection_id
+                sub_connection_id = local_connection_id
             else:
                 provider_urn = self.provider_registry.getProviderByNetwork(link.src_stp.network)
 
             c_header = nsa.NSIHeader(self.nsa_.urn(), provider_urn, security_attributes=header.security_attributes, connection_trace=conn_trace)
 
-            sd = nsa.Point2PointService(link.src_stp, link.dst_stp, conn.bandwidth, sd.directionality, sd.symmetric)
+            link_sd = nsa.Point2PointService(link.src_stp, link.dst_stp, conn.bandwidth, sd.directionality, sd.symmetric)
 
             # save info for db saving
             self.reservations[c_header.correlation_id] = {
@@ -381,51 +483,107 @@ class Aggregator:
                                                         'dest_network'   : link.dst_stp.network,
                                                         'dest_port'      : link.dst_stp.port }
 
-            crt = nsa.Criteria(criteria.revision, criteria.schedule, sd)
+            crt = nsa.Criteria(criteria.revision, criteria.schedule, link_sd)
 
             provider = self.getProvider(provider_urn)
             # note: request info will only be passed to local backends, remote requester will just ignore it
             d = provider.reserve(c_header, sub_connection_id, conn.global_reservation_id, conn.description, crt, request_info)
-            d.addErrback(_logErrorResponse, connection_id, provider_urn, 'reserve')
+            d.addErrback(_logErrorResponse, conn.connection_id, provider_urn, 'reserve')
 
-            conn_info.append( (d, provider_urn) )
+            conn_info.append( (d, provider_urn, c_header.correlation_id) )
 
             # Don't bother trying to save connection here, wait for reserveConfirmed
 
+        d = defer.DeferredList( [ c[0] for c in conn_info ], consumeErrors=True) # doesn't errback
+        d.addCallback(lambda results : (results, conn_info))
+        return d
 
-        results = yield defer.DeferredList( [ c[0] for c in conn_info ], consumeErrors=True) # doesn't errback
-        successes = [ r[0] for r in results ]
 
-        if all(successes):
-            log.msg('Connection %s: Reserve acked' % conn.connection_id, system=LOG_SYSTEM)
-            defer.returnValue(connection_id)
+    @defer.inlineCallbacks
+    def _abandonSubConnections(self, conn):
+        # detach the sub connections of a failed reservation attempt, which have been confirmed before the failure
+        # the rows are kept until the termination of the sub connection is confirmed, see terminateConfirmed
+        sub_conns = yield self.getSubConnectionsByConnectionKey(conn.id)
+        for sc in sub_conns:
+            sc.order_id = ABANDONED
+            sc.lifecycle_state = state.TERMINATING
+            yield sc.save()
+        defer.returnValue(sub_conns)
 
-        else:
-            # I think this is out of spec, the aggregator shouldn't do anything here...
-            # terminate non-failed connections
-            # currently we don't try and be too clever about cleaning, just do it, and switch state
-            yield state.terminating(conn)
-            defs = []
-            reserved_connections = [ (sc_id, provider_urn) for (success,sc_id),(_,provider_urn) in zip(results, conn_info) if success ]
-            for (sc_id, provider_urn) in reserved_connections:
 
-                provider = self.getProvider(provider_urn)
-                t_header = nsa.NSIHeader(self.nsa_.urn(), provider_urn, security_attributes=header.security_attributes)
+    @defer.inlineCallbacks
+    def _abortAttempt(self, header, conn):
+        # clean up a reservation attempt which has failed asynchronously, so another path can be tried
+        # the outstanding calls of the attempt are forgotten, late replies for them are rejected as unrecognized
+        for correlation_id, info in self.reservations.items():
+            if info.get('service_connection_id') == conn.id:
+                self.reservations.pop(correlation_id, None)
+
+        sub_conns = yield self._abandonSubConnections(conn)
+        defs = [ self._terminateSubConnection(header, sc.provider_nsa, sc.connection_id) for sc in sub_conns ]
+        yield defer.DeferredList(defs)
+
+
+    def _demarcationPorts(self, remote_network):
+        # [ (local demarcation port, remote network, remote port) ] towards a network, in vector order
+        # cached per network, entries are dropped when the vectors to the network change
+        demarcations = self.demarcation_cache.get(remote_network)
+        if demarcations is None:
+            demarcations = []
+            for vector_port in self.route_vectors.vectorPorts(remote_network):
+                # this really shouldn't fail, so we don't need to check
+                ldp = self.network_topology.getPort( self.network + ':' + vector_port )
+                remote_demarc_network, remote_demarc_port = ldp.remote_port.rsplit(':', 1) # [1] # this is wrong in the new naming scheme
+                demarcations.append( (ldp, remote_demarc_network, remote_demarc_port) )
+            self.demarcation_cache[remote_network] = demarcations
+        return demarcations
+
+
+    def _vectorsUpdated(self, networks):
+        for network in networks:
+            self.demarcation_cache.pop(network)
 
-                d = provider.terminate(t_header, sc_id)
-                d.addCallbacks(
-                    lambda c : log.msg('Succesfully terminated sub connection %s at %s after partial reservation failure.' % (sc_id, provider_urn) , system=LOG_SYSTEM),
-                    lambda f : log.msg('Error terminating connection after partial-reservation failure: %s' % str(f), system=LOG_SYSTEM)
-                )
-                defs.append(d)
-            dl = defer.DeferredList(defs)
-            yield dl
-            yield state.terminated(conn)
 
-            # construct provider nsa urns, so we can produce a good error message
-            provider_urns = [ ci[1] for ci in conn_info ]
-            err = _createAggregateException(connection_id, 'reservations', results, provider_urns, error.ConnectionCreateError)
-            raise err
+    @defer.inlineCallbacks
+    def _rankDemarcationPorts(self, demarcations, schedule, bandwidth):
+        """
+        Order local demarcation ports by how loaded they are in the schedule of
+        a reservation. Ports which cannot provide the bandwidth come last, then
+        ports are ordered by number of free labels, and then bandwidth headroom.
+        Equally loaded ports keep their order (the vector order).
+
+        This is a heuristic: the load is estimated from the sub connections the
+        aggregator has stored, whose schedule overlap the requested one, and
+        not from the backend calendar. Connections made by other aggregators
+        or directly at the backend are not seen, and labels are counted once
+        per sub connection, even if they are only used for part of the
+        window. A wrong guess costs a retry on the next port, not a failure.
+        """
+        if len(demarcations) < 2:
+            defer.returnValue(demarcations)
+
+        port_names = [ d[0].id_.rsplit(':', 1)[1] for d in demarcations ]
+        used_labels    = dict( [ (name, set()) for name in port_names ] )
+        used_bandwidth = dict( [ (name, 0) for name in port_names ] )
+
+        rows = yield database.getPortUsage(self.network, schedule.start_time, schedule.end_time, state.TERMINATED)
+        for source_network, source_port, source_label, dest_network, dest_port, dest_label, row_bandwidth in rows:
+            for network, port, label in ( (source_network, source_port, source_label), (dest_network, dest_port, dest_label) ):
+                if network == self.network and port in used_labels:
+                    used_bandwidth[port] += row_bandwidth or 0
+                    if label is not None:
+                        used_labels[port].add(label.labelValue())
+
+        def rank(port_entry):
+            (ldp, _, _), name = port_entry
+            capacity = getattr(ldp.inbound_port, 'bandwidth', None) if ldp.isBidirectional() else getattr(ldp, 'bandwidth', None)
+            headroom = capacity - used_bandwidth[name] if capacity is not None else 0
+            free_labels = _labelSize(ldp.label()) - len(used_labels[name])
+            return ( capacity is not None and headroom < bandwidth, -free_labels, -headroom )
+
+        ranked = sorted(zip(demarcations, port_names), key=rank)
+        logging.debug('Demarcation ports, least loaded first: %s', ', '.join( [ name for _, name in ranked ] ), system=LOG_SYSTEM)
+        defer.returnValue( [ d for d, _ in ranked ] )
 
 
     @defer.inlineCallbacks
@@ -641,38 +799,34 @@ class Aggregator:
         log.msg('QuerySummary request from %s. CID: %s. GID: %s' % (header.requester_nsa, connection_ids, global_reservation_ids), system=LOG_SYSTEM)
 
         try:
-            if connection_ids:
-                conns = yield database.ServiceConnection.find(where=['requester_nsa = ? AND connection_id IN ?', header.requester_nsa, tuple(connection_ids) ] )
-            elif global_reservation_ids:
-                conns = yield database.ServiceConnection.find(where=['requester_nsa = ? AND global_reservation_ids IN ?', header.requester_nsa, tuple(global_reservation_ids) ] )
-            else:
-                conns = yield database.ServiceConnection.find(where=['requester_nsa = ?', header.requester_nsa ] )
+            rows = yield database.getConnectionSummaries(header.requester_nsa, connection_ids, global_reservation_ids)
 
             # largely copied from genericbackend, merge later
             reservations = []
-            for c in conns:
-
-                source_stp  = nsa.STP(c.source_network, c.source_port, c.source_label)
-                dest_stp    = nsa.STP(c.dest_network, c.dest_port, c.dest_label)
-                schedule    = nsa.Schedule(c.start_time, c.end_time)
-                sd          = nsa.Point2PointService(source_stp, dest_stp, c.bandwidth, cnt.BIDIRECTIONAL, False, None)
-                criteria    = nsa.QueryCriteria(c.revision, schedule, sd)
-
-                sub_conns = yield self.getSubConnectionsByConnectionKey(c.id)
-                if len(sub_conns) == 0: # apparently this can happen
+            for row in rows:
+                ( connection_id, global_reservation_id, description, requester_nsa, revision,
+                  reservation_state, provision_state, lifecycle_state,
+                  source_network, source_port, source_label, dest_network, dest_port, dest_label,
+                  start_time, end_time, bandwidth,
+                  n_sub_conns, aggr_active, aggr_version, aggr_consistent ) = row
+
+                source_stp  = nsa.STP(source_network, source_port, source_label)
+                dest_stp    = nsa.STP(dest_network, dest_port, dest_label)
+                schedule    = nsa.Schedule(start_time, end_time)
+                sd          = nsa.Point2PointService(source_stp, dest_stp, bandwidth, cnt.BIDIRECTIONAL, False, None)
+                criteria    = nsa.QueryCriteria(revision, schedule, sd)
+
+                if n_sub_conns == 0: # apparently this can happen
                     data_plane_status = (False, 0, False)
                 else:
-                    aggr_active     = all( [ sc.data_plane_active     for sc in sub_conns ] )
-                    aggr_version    = max( [ sc.data_plane_version    for sc in sub_conns ] ) or 0 # can be None otherwise
-                    aggr_consistent = all( [ sc.data_plane_consistent for sc in sub_conns ] )
                     data_plane_status = (aggr_active, aggr_version, aggr_consistent)
 
-                states = (c.reservation_state, c.provision_state, c.lifecycle_state, data_plane_status)
+                states = (reservation_state, provision_state, lifecycle_state, data_plane_status)
                 notification_id = self.getNotificationId()
                 result_id = 0
 
-                ci = nsa.ConnectionInfo(c.connection_id, c.global_reservation_id, c.description, cnt.EVTS_AGOLE, [ criteria ],
-                                        self.nsa_.urn(), c.requester_nsa, states, notification_id, result_id)
+                ci = nsa.ConnectionInfo(connection_id, global_reservation_id, description, cnt.EVTS_AGOLE, [ criteria ],
+                                        self.nsa_.urn(), requester_nsa, states, notification_id, result_id)
                 reservations.append(ci)
 
             self.parent_requester.querySummaryConfirmed(header, reservations)
@@ -891,6 +1045,7 @@ class Aggregator:
         # if we get responses very close, multiple requests can trigger this, so we check main state as well
         if all( [ sc.reservation_state == state.RESERVE_HELD for sc in sub_conns ] ) and conn.reservation_state != state.RESERVE_HELD:
             log.msg('Connection %s: All sub connections reserve held, can emit reserveConfirmed' % (conn.connection_id), system=LOG_SYSTEM)
+            self.alternative_paths.pop(conn.id, None)
             yield state.reserveHeld(conn)
             header = nsa.NSIHeader(conn.requester_nsa, self.nsa_.urn())
             source_stp = nsa.STP(conn.source_network, conn.source_port, conn.source_label)
@@ -925,6 +1080,22 @@ class Aggregator:
         service_connection_key = resv_info['service_connection_id']
 
         conn = yield self.getConnectionByKey(service_connection_key)
+
+        # children usually fail asynchronously (e.g., when out of labels), so try the remaining paths here as well
+        alternative = self.alternative_paths.pop(conn.id, None)
+        if alternative is not None and conn.reservation_state == state.RESERVE_CHECKING:
+            r_header, criteria, paths, conn_trace, request_info = alternative
+            log.msg('Connection %s: Reservation failed at %s, trying next path' % (conn.connection_id, header.provider_nsa), system=LOG_SYSTEM)
+            yield self._abortAttempt(r_header, conn)
+            try:
+                path_err = yield self._reservePaths(r_header, conn, criteria, paths, conn_trace, request_info, None)
+            except error.NSIError as e:
+                path_err = e
+            if path_err is None:
+                log.msg('Connection %s: Reserve acked via alternative path' % conn.connection_id, system=LOG_SYSTEM)
+                return
+            err = path_err
+
         if conn.reservation_state != state.RESERVE_FAILED: # since we can fail multiple times
             yield state.reserveFailed(conn)
 
@@ -1015,6 +1186,13 @@ class Aggregator:
     def terminateConfirmed(self, header, connection_id):
 
         sub_connection = yield self.getSubConnection(header.provider_nsa, connection_id)
+
+        if sub_connection.order_id == ABANDONED:
+            log.msg('Sub connection %s at %s from failed reservation attempt terminated' % (connection_id, header.provider_nsa), system=LOG_SYSTEM)
+            self.db_sub_connections.pop(connection_id, None)
+            yield sub_connection.delete()
+            return
+
         sub_connection.lifecycle_state = state.TERMINATED
         yield sub_connection.save()
 
@@ -1126,6 +1304,10 @@ class Aggregator:
         # should mark sub connection as terminated / failed
         sub_conn = yield self.getSubConnection(header.provider_nsa, connection_id)
 
+        if sub_conn.order_id == ABANDONED:
+            log.msg('errorEvent for sub connection %s at %s from failed reservation attempt: %s %s' % (connection_id, header.provider_nsa, event, info), system=LOG_SYSTEM)
+            return
+
         conn = yield self.getConnectionByKey(sub_conn.service_connection_id)
         sub_conns = yield self.getSubConnectionsByConnectionKey(conn.id)
 
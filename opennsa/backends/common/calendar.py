@@ -11,21 +11,159 @@ overlap detection will not work properly.
 None is allowed for start and end time. In that case the semantics is now for
 start time and forever for end time.
 
+Reservations are indexed per resource in an interval tree (a treap ordered on
+start time, augmented with the latest end time in each subtree). Adding,
+removing and checking a reservation is O(log n) expected in the number of
+reservations on the resource.
+
 Author: Henrik Thostrup Jensen <htj@nordu.net>
 Copyright: NORDUnet (2011-2016)
 """
 
-import types
+import random
 import datetime
 
-from opennsa import error
+from opennsa import nsa, error
+
+
+
+# stand-ins for open ended reservations, used for ordering the per-resource interval trees
+NO_START = datetime.datetime.min
+FOREVER  = datetime.datetime(9999, 1, 1)
+
+
+
+def _labelBitmap(label):
+    # bit n is set if value n is in the label
+    bitmap = 0
+    for v1, v2 in label.values:
+        bitmap |= (1 << (v2+1)) - (1 << v1)
+    return bitmap
+
+
+
+class _Node:
+
+    __slots__ = ('interval', 'priority', 'max_end', 'left', 'right')
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.priority = random.random()
+        self.max_end  = interval[1]
+        self.left     = None
+        self.right    = None
+
+
+    def update(self):
+        self.max_end = self.interval[1]
+        if self.left is not None and self.left.max_end > self.max_end:
+            self.max_end = self.left.max_end
+        if self.right is not None and self.right.max_end > self.max_end:
+            self.max_end = self.right.max_end
+
+
+
+def _split(node, key, include_key=False):
+    # split tree into nodes before key and nodes from key on (after key, if include_key is set)
+    if node is None:
+        return None, None
+    if node.interval < key or (include_key and node.interval == key):
+        node.right, right = _split(node.right, key, include_key)
+        node.update()
+        return node, right
+    else:
+        left, node.left = _split(node.left, key, include_key)
+        node.update()
+        return left, node
+
+
+
+def _merge(left, right):
+    # all intervals in left must be ordered before the ones in right
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        left.update()
+        return left
+    else:
+        right.left = _merge(left, right.left)
+        right.update()
+        return right
+
+
+
+class _IntervalTree:
+    """
+    Intervals of a single resource, as (start_time, end_time) tuples.
+    Duplicate intervals are allowed.
+    """
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+
+    def __len__(self):
+        return self.size
+
+
+    def __iter__(self):
+        stack = []
+        node = self.root
+        while stack or node is not None:
+            if node is not None:
+                stack.append(node)
+                node = node.left
+            else:
+                node = stack.pop()
+                yield node.interval
+                node = node.right
+
+
+    def add(self, interval):
+        left, right = _split(self.root, interval)
+        self.root = _merge(_merge(left, _Node(interval)), right)
+        self.size += 1
+
+
+    def remove(self, interval):
+        left, right = _split(self.root, interval)
+        equal, right = _split(right, interval, include_key=True)
+        if equal is None:
+            self.root = _merge(left, right)
+            raise ValueError('Interval %s not in tree' % str(interval))
+        # drop one of the equal intervals
+        equal = _merge(equal.left, equal.right)
+        self.root = _merge(_merge(left, equal), right)
+        self.size -= 1
+
+
+    def overlaps(self, start, end):
+        # true if an interval with start <= end and end >= start exists
+        node = self.root
+        while node is not None:
+            i_start, i_end = node.interval
+            if i_start <= end and i_end >= start:
+                return True
+            # if the left subtree has an interval ending after start, but none overlapping,
+            # all of them start after end, and so do the nodes to the right
+            if node.left is not None and node.left.max_end >= start:
+                node = node.left
+            else:
+                node = node.right
+        return False
 
 
 
 class ReservationCalendar:
 
     def __init__(self):
-        self.reservations = [] # [ ( resource, start_time, end_time ) ]
+        self.reservations = {} # resource -> _IntervalTree of ( start_time, end_time )
+        # label value bitmaps, used for finding free labels without checking every value
+        self._label_values    = {} # (port, label type) -> bitmap of label values with a known resource
+        self._label_resources = {} # (port, label type) -> { resource : bitmap of label values }
 
 
     def _checkArgs(self, resource, start_time, end_time):
@@ -43,23 +181,41 @@ class ReservationCalendar:
     def addReservation(self, resource, start_time, end_time):
         self._checkArgs(resource, start_time, end_time)
 
-        reservation = (resource, start_time, end_time)
-        self.reservations.append(reservation)
+        interval = (start_time or NO_START, end_time or FOREVER)
+        try:
+            intervals = self.reservations[resource]
+        except KeyError:
+            intervals = self.reservations[resource] = _IntervalTree()
+        intervals.add(interval)
 
 
     def removeReservation(self, resource, start_time, end_time):
         self._checkArgs(resource, start_time, end_time)
 
-        reservation = (resource, start_time, end_time)
+        interval = (start_time or NO_START, end_time or FOREVER)
         try:
-            self.reservations.remove(reservation)
-        except ValueError:
+            intervals = self.reservations[resource]
+            intervals.remove(interval)
+        except (KeyError, ValueError):
             raise ValueError('Reservation (%s, %s, %s) does not exist. Cannot remove' % (resource, start_time, end_time))
 
+        if not intervals:
+            del self.reservations[resource]
+
 
     def checkReservation(self, resource, start_time, end_time):
         self._checkArgs(resource, start_time, end_time)
 
+        self._checkTime(start_time, end_time)
+
+        if self._resourceOverlap(resource, start_time, end_time):
+            raise error.STPUnavailableError('Resource %s not available in specified time span' % resource)
+
+        # all good
+
+
+    def _checkTime(self, start_time, end_time):
+
         # check start time is before end time
         if start_time is not None and end_time is not None and start_time > end_time:
             raise error.PayloadError('Invalid request: Reverse duration (end time before start time)')
@@ -77,36 +233,63 @@ class ReservationCalendar:
             if start_time > datetime.datetime(2025, 1, 1):
                 raise error.PayloadError('Invalid request: Start time after year 2025')
 
-        for (c_resource, c_start_time, c_end_time) in self.reservations:
-            if resource == c_resource:
-                if self._resourceOverlap(c_start_time, c_end_time, start_time, end_time):
-                    raise error.STPUnavailableError('Resource %s not available in specified time span' % resource)
 
-        # all good
+    def findFreeLabel(self, resource, ports, label, start_time, end_time):
+        """
+        Find the lowest value in label, which is available on all the ports in
+        the specified time span. The resource argument is a callable, mapping
+        a port and label to a calendar resource (i.e., getResource of the
+        connection manager).
 
+        Returns the label value, or None if no value is available.
+        """
+        self._checkTime(start_time, end_time)
 
-    def _resourceOverlap(self, res1_start_time, res1_end_time, res2_start_time, res2_end_time):
-        # resource temporal availability
+        free = _labelBitmap(label)
+        for port in ports:
+            if not free:
+                break
+            free &= ~self._occupiedLabels(resource, port, label, start_time, end_time)
+
+        if not free:
+            return None
+        return (free & -free).bit_length() - 1 # lowest set bit
 
-        # hack on
-        # instead of doing a lot of complicated branching for None checking, we just coalesce the values into something easier
 
-        now = datetime.datetime.utcnow()
-        forever = datetime.datetime(9999, 1, 1)
+    def _occupiedLabels(self, resource, port, label, start_time, end_time):
+        # returns bitmap of the values in label, which are reserved on port in the time span
 
-        r1s = res1_start_time or now
-        r2s = res2_start_time or now
-        r1e = res1_end_time or forever
-        r2e = res2_end_time or forever
+        key = (port, label.type_)
+        known_values = self._label_values.get(key, 0)
+        port_resources = self._label_resources.setdefault(key, {})
+
+        unknown_values = _labelBitmap(label) & ~known_values
+        if unknown_values:
+            # first time these values are seen on the port, map them to resources
+            for lv in label.enumerateValues():
+                if unknown_values >> lv & 1:
+                    r = resource(port, nsa.Label(label.type_, lv))
+                    port_resources[r] = port_resources.get(r, 0) | 1 << lv
+            self._label_values[key] = known_values | unknown_values
+
+        occupied = 0
+        for r in port_resources.keys() & self.reservations.keys():
+            if self._resourceOverlap(r, start_time, end_time):
+                occupied |= port_resources[r]
+        return occupied
+
+
+    def _resourceOverlap(self, resource, start_time, end_time):
+        # resource temporal availability
+        # note that reservations touching each other (end == start) are considered overlapping
 
-        assert r1s < r1e, 'Cannot detect overlap for backwards reservation (1)'
-        assert r2s < r2e, 'Cannot detect overlap for backwards reservation (2)'
+        intervals = self.reservations.get(resource)
+        if not intervals:
+            return False
 
-        if r2e < r1s:
-            return False # res2 ends before res1 starts so it is ok
-        if r2s > r1e:
-            return False # res2 starts after res1 ends so it is ok
+        r_start = start_time or datetime.datetime.utcnow()
+        r_end   = end_time or FOREVER
 
-        # resources overlap in time
-        return True
+        assert r_start < r_end, 'Cannot detect overlap for backwards reservation'
 
+        return intervals.overlaps(r_start, r_end)
@@ -9,24 +9,31 @@ The use this module a connection manager has to be supplied. The methods
 setupLink(source_port, dest_port) and tearDown(source_port, dest_port) must be
 implemented in the manager. The methods should return a deferred.
 
+A manager can optionally implement setupLinks(links) and teardownLinks(links),
+where links is a list of (connection_id, source_target, dest_target, bandwidth)
+tuples. If so, these are used when several connections are activated or ended
+at the same time, so the device can be configured in one go.
+
 Author: Henrik Thostrup Jensen <htj@nordu.net>
 Copyright: NORDUnet (2011-2012)
 """
 
+import time
 import datetime
 
-from zope.interface import implements
+from zope.interface import implementer
 
 from twisted.python import log
-from twisted.internet import reactor, defer
+from twisted.internet import reactor, defer, task
 from twisted.application import service
 
 from opennsa.interface import INSIProvider
 
-from opennsa import constants as cnt, error, state, nsa, authz
-from opennsa.backends.common import scheduler, calendar
+from opennsa import constants as cnt, error, state, nsa, authz, metrics, logging
+from opennsa.backends.common import scheduler, calendar, snapshot
 
 from twistar.dbobject import DBObject
+from twistar.registry import Registry
 
 
 
@@ -35,15 +42,21 @@ class GenericBackendConnections(DBObject):
 
 
 
+@implementer(INSIProvider)
 class GenericBackend(service.Service):
 
-    implements(INSIProvider)
-
     # This is how long a reservation will be kept in reserved, but not committed state.
     # Two minutes (120 seconds) is the recommended value from the NSI group
     # Yeah, it should be much less, but some NRMs are that slow
     TPC_TIMEOUT = 120 # seconds
 
+    # connections are restored from the database in pages of this size
+    RESTORE_PAGE_SIZE = 1000
+    # max number of transitions (activation, end, etc.) done concurrently during restore
+    RESTORE_CONCURRENCY = 10
+    # how often the calendar snapshot is written, if enabled
+    SNAPSHOT_INTERVAL = 300 # seconds
+
     def __init__(self, network, nrm_ports, connection_manager, parent_requester, log_system, minimum_duration=60):
 
         self.network            = network
@@ -57,10 +70,14 @@ class GenericBackend(service.Service):
 
         self.scheduler = scheduler.CallScheduler()
         self.calendar  = calendar.ReservationCalendar()
-        # need to build the calendar as well
+        self.calendar_entries = {} # connection_id -> (src_resource, dst_resource, start_time, end_time)
 
-        # need to build schedule here
-        self.restore_defer = defer.Deferred()
+        self.snapshot_file = None # path to calendar snapshot file, set from backend config in setup
+        self.snapshot_call = None
+
+        # need to build calendar and schedule here
+        self.calendar_defer = defer.Deferred() # fires when the calendar is restored, reservations wait for this
+        self.restore_defer  = defer.Deferred() # fires when all scheduled calls are restored
         reactor.callWhenRunning(self.buildSchedule)
 
 
@@ -72,6 +89,9 @@ class GenericBackend(service.Service):
         service.Service.stopService(self)
         if self.restore_defer.called:
             self.scheduler.cancelAllCalls()
+            if self.snapshot_call is not None:
+                self.snapshot_call.stop()
+                return self._writeCalendarSnapshot()
             return defer.succeed(None)
         else:
             return self.restore_defer.addCallback( lambda _ : self.scheduler.cancelAllCalls() )
@@ -85,88 +105,221 @@ class GenericBackend(service.Service):
 
     @defer.inlineCallbacks
     def buildSchedule(self):
+        # restore happens in two phases, first the calendar and future transitions are restored, from the
+        # database in pages, then transitions which should already have happened are done (with bounded
+        # concurrency). The backend accepts reservations again after the first phase.
+
+        restore_start = time.time()
+        n_conns = 0
+        last_id = 0
+
+        if self.snapshot_file:
+            snapshot_entries, restored, immediate_calls, max_id = yield self._loadCalendarSnapshot()
+            if snapshot_entries or restored:
+                # calendar is up to date with the database
+                self._calendarRestored(restore_start, len(snapshot_entries) + len(restored))
+        else:
+            snapshot_entries, restored, immediate_calls, max_id = {}, [], [], None # immediate_calls: [ (call, conn) ]
+        restored = set(restored)
+
+        while True:
+            # page on id, so pages do not shift if connections are created or terminated meanwhile
+            # if the calendar was restored from a snapshot, reservations are accepted during the walk, connections
+            # created since then are scheduled by reserve, so the walk stops at the last connection before that
+            where = ['lifecycle_state <> ? AND id > ?', state.TERMINATED, last_id]
+            if max_id is not None:
+                where[0] += ' AND id <= ?'
+                where.append(max_id)
+            conns = yield GenericBackendConnections.find(where=where, orderby='id', limit=(self.RESTORE_PAGE_SIZE, 0))
+            for conn in conns:
+                if conn.connection_id in restored:
+                    continue
+                if conn.connection_id in snapshot_entries:
+                    # calendar entry is from the snapshot, only transitions needs to be restored
+                    if conn.connection_id not in self.calendar_entries:
+                        continue # resources was released after the calendar was restored
+                    call = self._restoreConnection(conn, add_calendar_entry=False)
+                else:
+                    call = self._restoreConnection(conn)
+                if call is not None:
+                    immediate_calls.append( (call, conn) )
 
-        conns = yield GenericBackendConnections.find(where=['lifecycle_state <> ?', state.TERMINATED])
-        for conn in conns:
-            # avoid race with newly created connections
-            if self.scheduler.hasScheduledCall(conn.connection_id):
-                continue
+            n_conns += len(conns)
+            if len(conns) < self.RESTORE_PAGE_SIZE:
+                break
+            last_id = conns[-1].id
 
-            now = datetime.datetime.utcnow()
+        if not self.calendar_defer.called:
+            self._calendarRestored(restore_start, n_conns)
 
-            if conn.lifecycle_state in (state.PASSED_ENDTIME, state.TERMINATED):
-                continue # This connection has already lived it life to the fullest :-)
+        transition_start = time.time()
+        sem = defer.DeferredSemaphore(self.RESTORE_CONCURRENCY)
+        yield defer.DeferredList( [ sem.run(call, conn) for call, conn in immediate_calls ] )
 
-            if conn.reservation_state == state.RESERVE_START and not conn.allocated:
-                # This happens when a connection was reserved, but never committed and abort/timeout happened
-                log.msg('Connection %s: Was never comitted, not putting entry into calendar' % conn.connection_id, debug=True, system=self.log_system)
-                continue
+        transition_time = time.time() - transition_start
+        metrics.sample('backend.restore.transition_time').add(transition_time)
+        log.msg('Scheduled calls restored: %i immediate transitions (%.2f seconds)' % (len(immediate_calls), transition_time), system=self.log_system)
+        self.restore_defer.callback(None)
 
-            # add reservation, some of the following code will remove the reservation again
-            src_resource = self.connection_manager.getResource(conn.source_port, conn.source_label)
-            dst_resource = self.connection_manager.getResource(conn.dest_port,   conn.dest_label)
-            self.calendar.addReservation(  src_resource, conn.start_time, conn.end_time)
-            self.calendar.addReservation(  dst_resource, conn.start_time, conn.end_time)
+        if self.snapshot_file:
+            self.snapshot_call = task.LoopingCall(self._writeCalendarSnapshot)
+            self.snapshot_call.start(self.SNAPSHOT_INTERVAL, now=True)
 
-            if conn.end_time is not None and conn.end_time < now and conn.lifecycle_state not in (state.PASSED_ENDTIME, state.TERMINATED):
-                log.msg('Connection %s: Immediate end during buildSchedule' % conn.connection_id, system=self.log_system)
-                yield self._doEndtime(conn)
-                continue
 
-            elif conn.reservation_state == state.RESERVE_HELD:
-                abort_time = conn.reserve_time + datetime.timedelta(seconds=self.TPC_TIMEOUT)
-                timeout_time = min(abort_time, conn.end_time or abort_time) # or to handle None case
-                if timeout_time < now:
-                    # have passed the time when timeout should occur
-                    log.msg('Connection %s: Reservation Held, but timeout has passed, doing rollback' % conn.connection_id, system=self.log_system)
-                    yield self._doReserveRollback(conn) # will remove reservation
-                else:
-                    td = timeout_time - now
-                    log.msg('Connection %s: Reservation Held, scheduling timeout in %i seconds' % (conn.connection_id, td.total_seconds()), system=self.log_system)
-                    self.scheduler.scheduleCall(conn.connection_id, timeout_time, self._doReserveTimeout, conn)
-
-            elif conn.start_time is None or conn.start_time < now:
-                # we have passed start time, we must either: activate, schedule deactive, or schedule terminate
-                if conn.provision_state == state.PROVISIONED:
-                    if conn.data_plane_active:
-                        if conn.end_time is None:
-                            log.msg('Connection %s: already active, no scheduled end time' % conn.connection_id, system=self.log_system)
-                        else:
-                            self.scheduler.scheduleCall(conn.connection_id, conn.end_time, self._doEndtime, conn)
-                            td = conn.end_time - now
-                            log.msg('Connection %s: already active, scheduling end for %s UTC (%i seconds) (buildSchedule)' % (conn.connection_id, conn.end_time.replace(microsecond=0), td.total_seconds()), system=self.log_system)
-                    else:
-                        log.msg('Connection %s: Immediate activate during buildSchedule' % conn.connection_id, system=self.log_system)
-                        yield self._doActivate(conn)
-                elif conn.provision_state == state.RELEASED:
+    def _calendarRestored(self, restore_start, n_conns):
+        calendar_time = time.time() - restore_start
+        metrics.sample('backend.restore.calendar_time').add(calendar_time)
+        log.msg('Calendar restored: %i connections (%.2f seconds)' % (n_conns, calendar_time), system=self.log_system)
+        self.calendar_defer.callback(None)
+
+
+    def _restoreConnection(self, conn, add_calendar_entry=True):
+        """
+        Restore the calendar entry and scheduled transitions for a connection.
+        If a transition should already have happened, the call for doing it is
+        returned, otherwise None. The calendar entry is not added if it was
+        loaded from a calendar snapshot.
+        """
+        # avoid race with newly created connections
+        if self.scheduler.hasScheduledCall(conn.connection_id):
+            return None
+
+        now = datetime.datetime.utcnow()
+
+        if conn.lifecycle_state in (state.PASSED_ENDTIME, state.TERMINATED):
+            return None # This connection has already lived it life to the fullest :-)
+
+        if conn.reservation_state == state.RESERVE_START and not conn.allocated:
+            # This happens when a connection was reserved, but never committed and abort/timeout happened
+            logging.debug('Connection %s: Was never comitted, not putting entry into calendar', conn.connection_id, system=self.log_system)
+            return None
+
+        # add reservation, some of the following code will remove the reservation again
+        if add_calendar_entry:
+            src_resource = self.connection_manager.getResource(conn.source_port, conn.source_label)
+            dst_resource = self.connection_manager.getResource(conn.dest_port,   conn.dest_label)
+            self._addCalendarEntry(conn.connection_id, src_resource, dst_resource, conn.start_time, conn.end_time)
+
+        if conn.end_time is not None and conn.end_time < now and conn.lifecycle_state not in (state.PASSED_ENDTIME, state.TERMINATED):
+            log.msg('Connection %s: Immediate end during buildSchedule' % conn.connection_id, system=self.log_system)
+            return self._doEndtime
+
+        elif conn.reservation_state == state.RESERVE_HELD:
+            abort_time = conn.reserve_time + datetime.timedelta(seconds=self.TPC_TIMEOUT)
+            timeout_time = min(abort_time, conn.end_time or abort_time) # or to handle None case
+            if timeout_time < now:
+                # have passed the time when timeout should occur
+                log.msg('Connection %s: Reservation Held, but timeout has passed, doing rollback' % conn.connection_id, system=self.log_system)
+                return self._doReserveRollback # will remove reservation
+            else:
+                td = timeout_time - now
+                log.msg('Connection %s: Reservation Held, scheduling timeout in %i seconds' % (conn.connection_id, td.total_seconds()), system=self.log_system)
+                self.scheduler.scheduleCall(conn.connection_id, timeout_time, self._doReserveTimeout, conn)
+
+        elif conn.start_time is None or conn.start_time < now:
+            # we have passed start time, we must either: activate, schedule deactive, or schedule terminate
+            if conn.provision_state == state.PROVISIONED:
+                if conn.data_plane_active:
                     if conn.end_time is None:
-                        log.msg('Connection %s: Currently released, no end scheduled' % conn.connection_id, system=self.log_system)
+                        log.msg('Connection %s: already active, no scheduled end time' % conn.connection_id, system=self.log_system)
                     else:
-                        self.scheduler.scheduleCall(conn.connection_id, conn.end_time, self._doEndtime, conn)
+                        self.scheduler.scheduleBatchCall(conn.connection_id, conn.end_time, self._doEndtimes, conn)
                         td = conn.end_time - now
-                        log.msg('Connection %s: End scheduled for %s UTC (%i seconds) (buildSchedule)' % (conn.connection_id, conn.end_time.replace(microsecond=0), td.total_seconds()), system=self.log_system)
+                        log.msg('Connection %s: already active, scheduling end for %s UTC (%i seconds) (buildSchedule)' % (conn.connection_id, conn.end_time.replace(microsecond=0), td.total_seconds()), system=self.log_system)
+                else:
+                    log.msg('Connection %s: Immediate activate during buildSchedule' % conn.connection_id, system=self.log_system)
+                    return self._doActivate
+            elif conn.provision_state == state.RELEASED:
+                if conn.end_time is None:
+                    log.msg('Connection %s: Currently released, no end scheduled' % conn.connection_id, system=self.log_system)
                 else:
-                    log.msg('Unhandled provision state %s for connection %s in scheduler building' % (conn.provision_state, conn.connection_id))
-
-            elif conn.start_time > now:
-                # start time has not yet passed, we must schedule activate or schedule terminate depending on state
-                if conn.provision_state == state.PROVISIONED and conn.data_plane_active == False:
-                    self.scheduler.scheduleCall(conn.connection_id, conn.start_time, self._doActivate, conn)
-                    td = conn.start_time - now
-                    log.msg('Connection %s: activate scheduled for %s UTC (%i seconds) (buildSchedule)' % (conn.connection_id, conn.end_time.replace(microsecond=0), td.total_seconds()), system=self.log_system)
-                elif conn.provision_state == state.RELEASED:
-                    self.scheduler.scheduleCall(conn.connection_id, conn.end_time, self._doEndtime, conn)
+                    self.scheduler.scheduleBatchCall(conn.connection_id, conn.end_time, self._doEndtimes, conn)
                     td = conn.end_time - now
                     log.msg('Connection %s: End scheduled for %s UTC (%i seconds) (buildSchedule)' % (conn.connection_id, conn.end_time.replace(microsecond=0), td.total_seconds()), system=self.log_system)
-                else:
-                    log.msg('Unhandled provision state %s for connection %s in scheduler building' % (conn.provision_state, conn.connection_id))
-
             else:
-                log.msg('Unhandled start/end time configuration for connection %s' % conn.connection_id, system=self.log_system)
+                log.msg('Unhandled provision state %s for connection %s in scheduler building' % (conn.provision_state, conn.connection_id))
+
+        elif conn.start_time > now:
+            # start time has not yet passed, we must schedule activate or schedule terminate depending on state
+            if conn.provision_state == state.PROVISIONED and conn.data_plane_active == False:
+                self._scheduleActivation(conn, 'buildSchedule')
+            elif conn.provision_state == state.RELEASED:
+                self.scheduler.scheduleBatchCall(conn.connection_id, conn.end_time, self._doEndtimes, conn)
+                td = conn.end_time - now
+                log.msg('Connection %s: End scheduled for %s UTC (%i seconds) (buildSchedule)' % (conn.connection_id, conn.end_time.replace(microsecond=0), td.total_seconds()), system=self.log_system)
+            else:
+                log.msg('Unhandled provision state %s for connection %s in scheduler building' % (conn.provision_state, conn.connection_id))
 
-        log.msg('Scheduled calls restored', system=self.log_system)
-        self.restore_defer.callback(None)
+        else:
+            log.msg('Unhandled start/end time configuration for connection %s' % conn.connection_id, system=self.log_system)
+
+        return None
+
+
+
+    def _addCalendarEntry(self, connection_id, src_resource, dst_resource, start_time, end_time):
+        self.calendar.addReservation(src_resource, start_time, end_time)
+        self.calendar.addReservation(dst_resource, start_time, end_time)
+        self.calendar_entries[connection_id] = (src_resource, dst_resource, start_time, end_time)
+
+
+    def _removeCalendarEntry(self, connection_id):
+        try:
+            src_resource, dst_resource, start_time, end_time = self.calendar_entries.pop(connection_id)
+        except KeyError:
+            raise ValueError('Connection %s does not have a calendar entry. Cannot remove' % connection_id)
+        self.calendar.removeReservation(src_resource, start_time, end_time)
+        self.calendar.removeReservation(dst_resource, start_time, end_time)
+
+
+    @defer.inlineCallbacks
+    def _loadCalendarSnapshot(self):
+        """
+        Load calendar entries from the snapshot file, and restore the
+        connections changed since the snapshot was written.
+
+        Returns a deferred with ( { connection_id : entry }, [ connection_id ], [ (call, conn) ], max_id ), which
+        are the entries from the snapshot that needs to be verified, connections that were restored, immediate
+        calls, and the highest connection id in the database, i.e., the last connection the restore has to walk.
+        If no snapshot could be used, the calendar is unchanged, the first three are empty, and max_id is None.
+        """
+        try:
+            high_water_mark, entries = snapshot.readSnapshot(self.snapshot_file)
+            changed_conns = yield GenericBackendConnections.find(where=['change_seq > ?', high_water_mark])
+            rows = yield Registry.DBPOOL.runQuery('SELECT max(id) FROM generic_backend_connections')
+            max_id = rows[0][0] or 0
+        except Exception as e:
+            log.msg('Could not use calendar snapshot, doing full restore: %s' % e, system=self.log_system)
+            defer.returnValue( ({}, [], [], None) )
+
+        for conn in changed_conns:
+            entries.pop(conn.connection_id, None)
+
+        for connection_id, (src_resource, dst_resource, start_time, end_time) in entries.items():
+            self._addCalendarEntry(connection_id, src_resource, dst_resource, start_time, end_time)
 
+        restored = []
+        immediate_calls = []
+        for conn in changed_conns:
+            restored.append(conn.connection_id)
+            call = self._restoreConnection(conn)
+            if call is not None:
+                immediate_calls.append( (call, conn) )
+
+        log.msg('Calendar snapshot loaded: %i entries, %i changed connections' % (len(entries), len(changed_conns)), system=self.log_system)
+        defer.returnValue( (entries, restored, immediate_calls, max_id) )
+
+
+    @defer.inlineCallbacks
+    def _writeCalendarSnapshot(self):
+        # get the high water mark before copying the entries, connections changed meanwhile will be replayed on load
+        try:
+            rows = yield Registry.DBPOOL.runQuery('SELECT max(change_seq) FROM generic_backend_connections')
+            high_water_mark = rows[0][0] or 0
+            snapshot.writeSnapshot(self.snapshot_file, high_water_mark, self.calendar_entries.copy())
+            logging.debug('Calendar snapshot written (%i entries)', len(self.calendar_entries), system=self.log_system)
+        except Exception as e:
+            log.msg('Error writing calendar snapshot: %s' % e, system=self.log_system)
 
 
     @defer.inlineCallbacks
@@ -198,6 +351,22 @@ class GenericBackend(service.Service):
             raise error.UnauthorizedError('Request does not have any valid credentials for STP %s' % stp_name)
 
 
+    def _findFreeLabel(self, ports, label, start_time, end_time):
+        """
+        Find a label (value) which is available on all the ports in the
+        specified time span. Raises STPUnavailableError if there is none.
+        """
+        if label is None:
+            for port in ports:
+                self.calendar.checkReservation(self.connection_manager.getResource(port, None), start_time, end_time)
+            return None
+
+        label_value = self.calendar.findFreeLabel(self.connection_manager.getResource, ports, label, start_time, end_time)
+        if label_value is None:
+            raise error.STPUnavailableError('No free label value in %s for ports %s in specified time span' % (label, ', '.join(ports)))
+        return nsa.Label(label.type_, label_value)
+
+
     def logStateUpdate(self, conn, state_msg):
         src_target = self.connection_manager.getTarget(conn.source_port, conn.source_label)
         dst_target = self.connection_manager.getTarget(conn.dest_port,   conn.dest_label)
@@ -217,6 +386,10 @@ class GenericBackend(service.Service):
         # should perhaps verify nsa, but not that important
         log.msg('Reserve request. Connection ID: %s' % connection_id, system=self.log_system)
 
+        if not self.calendar_defer.called:
+            log.msg('Reserve request while restoring calendar, waiting for restore to finish', system=self.log_system)
+            yield self.calendar_defer
+
         if connection_id:
             # if connection id is specified it is not allowed to be used a priori
             try:
@@ -280,36 +453,18 @@ class GenericBackend(service.Service):
         if not nsa.Label.canMatch(nrm_dest_port.label, dest_stp.label):
             raise error.TopologyError('Destination port %s cannot match label set %s' % (nrm_dest_port.name, dest_stp.label) )
 
-        labelEnum = lambda label : [None] if label is None else [ nsa.Label(label.type_, lv) for lv in label.enumerateValues() ]
-
         # do the find the label value dance
         if self.connection_manager.canSwapLabel(labelType(source_stp)) and self.connection_manager.canSwapLabel(labelType(dest_stp)):
-            for lv in labelEnum(source_stp.label):
-                src_resource = self.connection_manager.getResource(source_stp.port, lv)
-                try:
-                    self.calendar.checkReservation(src_resource, start_time, end_time)
-                    src_label = lv
-                    break
-                except error.STPUnavailableError:
-                    pass
-            else:
+            try:
+                src_label = self._findFreeLabel( [ source_stp.port ], source_stp.label, start_time, end_time)
+            except error.STPUnavailableError:
                 raise error.STPUnavailableError('STP %s not available in specified time span' % source_stp)
 
-            for lv in labelEnum(dest_stp.label):
-                dst_resource = self.connection_manager.getResource(dest_stp.port, lv)
-                try:
-                    self.calendar.checkReservation(dst_resource, start_time, end_time)
-                    dst_label = lv
-                    break
-                except error.STPUnavailableError:
-                    pass
-            else:
+            try:
+                dst_label = self._findFreeLabel( [ dest_stp.port ], dest_stp.label, start_time, end_time)
+            except error.STPUnavailableError:
                 raise error.STPUnavailableError('STP %s not available in specified time span' % dest_stp)
 
-            # Only add reservations, when src and dest stps are both available
-            self.calendar.addReservation(  src_resource, start_time, end_time)
-            self.calendar.addReservation(  dst_resource, start_time, end_time)
-
         else:
             if source_stp.label is None:
                 label_candidate = dest_stp.label
@@ -321,20 +476,10 @@ class GenericBackend(service.Service):
                 except nsa.EmptyLabelSet:
                     raise error.VLANInterchangeNotSupportedError('VLAN re-write not supported and no possible label intersection')
 
-            for lv in labelEnum(label_candidate):
-                src_resource = self.connection_manager.getResource(source_stp.port, lv)
-                dst_resource = self.connection_manager.getResource(dest_stp.port,   lv)
-                try:
-                    self.calendar.checkReservation(src_resource, start_time, end_time)
-                    self.calendar.checkReservation(dst_resource, start_time, end_time)
-                    self.calendar.addReservation(  src_resource, start_time, end_time)
-                    self.calendar.addReservation(  dst_resource, start_time, end_time)
-                    src_label = lv
-                    dst_label = lv
-                    break
-                except error.STPUnavailableError:
-                    continue
-            else:
+            try:
+                src_label = self._findFreeLabel( [ source_stp.port, dest_stp.port ], label_candidate, start_time, end_time)
+                dst_label = src_label
+            except error.STPUnavailableError:
                 raise error.STPUnavailableError('Link %s and %s not available in specified time span' % (source_stp, dest_stp))
 
         now =  datetime.datetime.utcnow()
@@ -344,6 +489,11 @@ class GenericBackend(service.Service):
         if connection_id is None:
             connection_id = self.connection_manager.createConnectionId(source_target, dest_target)
 
+        # Only add reservations, when src and dest stps are both available
+        src_resource = self.connection_manager.getResource(source_stp.port, src_label)
+        dst_resource = self.connection_manager.getResource(dest_stp.port,   dst_label)
+        self._addCalendarEntry(connection_id, src_resource, dst_resource, start_time, end_time)
+
         # we should check the schedule here
 
         # should we save the requester or provider here?
@@ -380,7 +530,7 @@ class GenericBackend(service.Service):
         # cancel abort and schedule end time call
         self.scheduler.cancelCall(connection_id)
         if conn.end_time is not None:
-            self.scheduler.scheduleCall(conn.connection_id, conn.end_time, self._doEndtime, conn)
+            self.scheduler.scheduleBatchCall(conn.connection_id, conn.end_time, self._doEndtimes, conn)
             td = conn.end_time - datetime.datetime.utcnow()
             log.msg('Connection %s: End and teardown scheduled for %s UTC (%i seconds)' % (conn.connection_id, conn.end_time.replace(microsecond=0), td.total_seconds()), system=self.log_system)
 
@@ -435,10 +585,7 @@ class GenericBackend(service.Service):
         if conn.start_time is None or conn.start_time <= now:
             self._doActivate(conn) # returns a deferred, but it isn't used
         else:
-            self.scheduler.scheduleCall(connection_id, conn.start_time, self._doActivate, conn)
-            td = conn.start_time - now
-            log.msg('Connection %s: activate scheduled for %s UTC (%i seconds) (provision)' % \
-                    (conn.connection_id, conn.start_time.replace(microsecond=0), td.total_seconds()), system=self.log_system)
+            self._scheduleActivation(conn, 'provision')
 
         yield state.provisioned(conn)
         self.logStateUpdate(conn, 'PROVISIONED')
@@ -471,7 +618,7 @@ class GenericBackend(service.Service):
                 log.msg('Connection %s: Error tearing down link: %s' % (conn.connection_id, e))
 
         if conn.end_time is not None:
-            self.scheduler.scheduleCall(connection_id, conn.end_time, self._doEndtime, conn)
+            self.scheduler.scheduleBatchCall(connection_id, conn.end_time, self._doEndtimes, conn)
             td = conn.end_time - datetime.datetime.utcnow()
             log.msg('Connection %s: terminate scheduled for %s UTC (%i seconds)' % (conn.connection_id, conn.end_time.replace(microsecond=0), td.total_seconds()), system=self.log_system)
 
@@ -625,11 +772,7 @@ class GenericBackend(service.Service):
             self.scheduler.cancelCall(conn.connection_id) # we only have this for non-timeout calls, but just cancel
 
             # release the resources
-            src_resource = self.connection_manager.getResource(conn.source_port, conn.source_label)
-            dst_resource = self.connection_manager.getResource(conn.dest_port,   conn.dest_label)
-
-            self.calendar.removeReservation(src_resource, conn.start_time, conn.end_time)
-            self.calendar.removeReservation(dst_resource, conn.start_time, conn.end_time)
+            self._removeCalendarEntry(conn.connection_id)
 
             yield state.reserved(conn) # we only log this, when we haven't passed end time, as it looks wonky with start+end together
 
@@ -639,7 +782,7 @@ class GenericBackend(service.Service):
                 yield self._doEndtime(conn)
             elif conn.end_time is not None:
                 self.logStateUpdate(conn, 'RESERVE START')
-                self.scheduler.scheduleCall(conn.connection_id, conn.end_time, self._doEndtime, conn)
+                self.scheduler.scheduleBatchCall(conn.connection_id, conn.end_time, self._doEndtimes, conn)
                 td = conn.end_time - datetime.datetime.utcnow()
                 log.msg('Connection %s: terminate scheduled for %s UTC (%i seconds)' % (conn.connection_id, conn.end_time.replace(microsecond=0), td.total_seconds()), system=self.log_system)
 
@@ -648,18 +791,66 @@ class GenericBackend(service.Service):
             log.err(e)
 
 
-    @defer.inlineCallbacks
+    def _scheduleActivation(self, conn, source):
+        # schedule data plane activation at start time
+        self.scheduler.scheduleBatchCall(conn.connection_id, conn.start_time, self._doActivates, conn)
+        td = conn.start_time - datetime.datetime.utcnow()
+        log.msg('Connection %s: activate scheduled for %s UTC (%i seconds) (%s)' % \
+                (conn.connection_id, conn.start_time.replace(microsecond=0), td.total_seconds(), source), system=self.log_system)
+
+
+    def _linkOperation(self, conns, link_method, batch_method):
+        """
+        Perform a link operation (setup/teardown) for a number of connections.
+
+        If the connection manager has the batch method, it is used for doing all
+        the links in one go, otherwise the link method is called for each link.
+        Returns a deferred list of (success, result) tuples, one per connection.
+        """
+        links = []
+        for conn in conns:
+            src_target = self.connection_manager.getTarget(conn.source_port, conn.source_label)
+            dst_target = self.connection_manager.getTarget(conn.dest_port,   conn.dest_label)
+            links.append( (conn.connection_id, src_target, dst_target, conn.bandwidth) )
+
+        if len(links) > 1 and hasattr(self.connection_manager, batch_method):
+            # the batch is applied as a unit, so it either works or fails for all links
+            d = defer.maybeDeferred(getattr(self.connection_manager, batch_method), links)
+            d.addCallbacks(lambda r : [ (True, r) ] * len(links), lambda f : [ (False, f) ] * len(links))
+            return d
+        else:
+            dl = [ defer.maybeDeferred(getattr(self.connection_manager, link_method), *link) for link in links ]
+            return defer.DeferredList(dl, consumeErrors=True)
+
+
     def _doActivate(self, conn):
+        # immediate activation, i.e., not at a scheduled start time
+        return self._doActivates( [ conn ], scheduled=False)
 
-        src_target = self.connection_manager.getTarget(conn.source_port, conn.source_label)
-        dst_target = self.connection_manager.getTarget(conn.dest_port,   conn.dest_label)
-        try:
+
+    @defer.inlineCallbacks
+    def _doActivates(self, conns, scheduled=True):
+
+        activation_time = datetime.datetime.utcnow()
+        for conn in conns:
             log.msg('Connection %s: Activating data plane...' % conn.connection_id, system=self.log_system)
-            yield self.connection_manager.setupLink(conn.connection_id, src_target, dst_target, conn.bandwidth)
-        except Exception as e:
+
+        results = yield self._linkOperation(conns, 'setupLink', 'setupLinks')
+
+        dl = []
+        for conn, (success, result) in zip(conns, results):
+            due_time = conn.start_time if scheduled and conn.start_time is not None else activation_time
+            dl.append( self._activated(conn, success, result, due_time) )
+        yield defer.DeferredList(dl)
+
+
+    @defer.inlineCallbacks
+    def _activated(self, conn, success, result, due_time):
+
+        if not success:
             # We need to mark failure in state machine here somehow....
             #log.err(e) # note: this causes error in tests
-            log.msg('Connection %s: Error activating data plane: %s' % (conn.connection_id, str(e)), system=self.log_system)
+            log.msg('Connection %s: Error activating data plane: %s' % (conn.connection_id, result.getErrorMessage()), system=self.log_system)
             # should include stack trace
             conn.data_plane_active = False
             yield conn.save()
@@ -674,7 +865,11 @@ class GenericBackend(service.Service):
         try:
             conn.data_plane_active = True
             yield conn.save()
-            log.msg('Connection %s: Data plane activated' % (conn.connection_id), system=self.log_system)
+
+            # how long after it should have happened, the data plane went active
+            activation_delay = (datetime.datetime.utcnow() - due_time).total_seconds()
+            metrics.sample('backend.activation.delay').add(activation_delay)
+            log.msg('Connection %s: Data plane activated (%.2f seconds after due time)' % (conn.connection_id, activation_delay), system=self.log_system)
 
             # we might have passed end time during activation...
             end_time = conn.end_time
@@ -684,7 +879,7 @@ class GenericBackend(service.Service):
                 end_time = now
 
             if end_time is not None:
-                self.scheduler.scheduleCall(conn.connection_id, end_time, self._doEndtime, conn)
+                self.scheduler.scheduleBatchCall(conn.connection_id, end_time, self._doEndtimes, conn)
                 td = end_time - datetime.datetime.utcnow()
                 log.msg('Connection %s: End and teardown scheduled for %s UTC (%i seconds)' % (conn.connection_id, end_time.replace(microsecond=0), td.total_seconds()), system=self.log_system)
 
@@ -697,18 +892,28 @@ class GenericBackend(service.Service):
             log.err(e)
 
 
-    @defer.inlineCallbacks
     def _doTeardown(self, conn):
         # this one is not used as a stand-alone, just a utility function
+        return self._doTeardowns( [ conn ] )
 
-        src_target = self.connection_manager.getTarget(conn.source_port, conn.source_label)
-        dst_target = self.connection_manager.getTarget(conn.dest_port,   conn.dest_label)
-        try:
+
+    @defer.inlineCallbacks
+    def _doTeardowns(self, conns):
+
+        for conn in conns:
             log.msg('Connection %s: Deactivating data plane...' % conn.connection_id, system=self.log_system)
-            yield self.connection_manager.teardownLink(conn.connection_id, src_target, dst_target, conn.bandwidth)
-        except Exception as e:
+
+        results = yield self._linkOperation(conns, 'teardownLink', 'teardownLinks')
+
+        yield defer.DeferredList( [ self._deactivated(conn, success, result) for conn, (success, result) in zip(conns, results) ] )
+
+
+    @defer.inlineCallbacks
+    def _deactivated(self, conn, success, result):
+
+        if not success:
             # We need to mark failure in state machine here somehow....
-            log.msg('Connection %s: Error deactivating data plane: %s' % (conn.connection_id, str(e)), system=self.log_system)
+            log.msg('Connection %s: Error deactivating data plane: %s' % (conn.connection_id, result.getErrorMessage()), system=self.log_system)
             # should include stack trace
             conn.data_plane_active = False # technically we don't know, but for NSI that means not active
             yield conn.save()
@@ -735,36 +940,57 @@ class GenericBackend(service.Service):
             log.err(e)
 
 
-    @defer.inlineCallbacks
     def _doEndtime(self, conn):
 
         if conn.lifecycle_state != state.CREATED:
-            raise error.InvalidTransitionError('Cannot end connection in state: %s' % conn.lifecycle_state)
-
-        self.scheduler.cancelCall(conn.connection_id) # not sure about this one, there might some cases though
+            return defer.fail( error.InvalidTransitionError('Cannot end connection in state: %s' % conn.lifecycle_state) )
 
-        yield state.passedEndtime(conn)
-        self.logStateUpdate(conn, 'PASSED END TIME')
-        yield self._doFreeResource(conn)
+        return self._doEndtimes( [ conn ] )
 
 
     @defer.inlineCallbacks
+    def _doEndtimes(self, conns):
+
+        ended_conns = []
+        for conn in conns:
+            if conn.lifecycle_state != state.CREATED:
+                log.msg('Connection %s: Cannot end connection in state: %s' % (conn.connection_id, conn.lifecycle_state), system=self.log_system)
+                continue
+
+            self.scheduler.cancelCall(conn.connection_id) # not sure about this one, there might some cases though
+
+            try:
+                yield state.passedEndtime(conn)
+            except Exception as e:
+                # don't let one connection stop the rest of the batch from ending and being freed
+                log.msg('Connection %s: Error passing end time: %s' % (conn.connection_id, e), system=self.log_system)
+                log.err(e)
+                continue
+            self.logStateUpdate(conn, 'PASSED END TIME')
+            ended_conns.append(conn)
+
+        yield self._doFreeResources(ended_conns)
+
+
     def _doFreeResource(self, conn):
+        return self._doFreeResources( [ conn ] )
 
-        if conn.data_plane_active:
+
+    @defer.inlineCallbacks
+    def _doFreeResources(self, conns):
+
+        # free reservation if it was active, allocated or held
+        # we can only remove resource reservation entry if we succesfully shut down the link :-(
+        free_conns   = [ conn for conn in conns if conn.data_plane_active or conn.allocated or conn.reservation_state == state.RESERVE_HELD ]
+        active_conns = [ conn for conn in conns if conn.data_plane_active ]
+
+        if active_conns:
             try:
-                yield self._doTeardown(conn)
-                # we can only remove resource reservation entry if we succesfully shut down the link :-(
-                src_resource = self.connection_manager.getResource(conn.source_port, conn.source_label)
-                dst_resource = self.connection_manager.getResource(conn.dest_port,   conn.dest_label)
-                self.calendar.removeReservation(src_resource, conn.start_time, conn.end_time)
-                self.calendar.removeReservation(dst_resource, conn.start_time, conn.end_time)
+                yield self._doTeardowns(active_conns)
             except Exception as e:
                 log.msg('Error ending connection: %s' % e)
                 raise e
-        elif conn.allocated or conn.reservation_state == state.RESERVE_HELD: # free reservation if it was allocated/held
-            src_resource = self.connection_manager.getResource(conn.source_port, conn.source_label)
-            dst_resource = self.connection_manager.getResource(conn.dest_port,   conn.dest_label)
-            self.calendar.removeReservation(src_resource, conn.start_time, conn.end_time)
-            self.calendar.removeReservation(dst_resource, conn.start_time, conn.end_time)
+
+        for conn in free_conns:
+            self._removeCalendarEntry(conn.connection_id)
 
@@ -1,19 +1,39 @@
 """
 Call scheduler. Handles one future call per connection.
 
+All scheduled calls are kept in a single heap, ordered by transition time, and
+only one timer is armed in the reactor (for the next due call). Cancelling a
+call only marks its heap entry as dead, the entry is dropped when it reaches
+the head of the heap, or when the heap gets compacted.
+
+Calls scheduled with scheduleBatchCall, which become due at the same time, are
+collected and the call is done once with a list of the arguments. This allows
+a backend to do several transitions (e.g., activations) in one go.
+
 Author: Henrik Thostrup Jensen <htj@nordu.net>
 Copyright: NORDUnet (2011)
 """
 
+import heapq
 import datetime
 
 from twisted.python import log
-from twisted.internet import reactor, defer, task
+from twisted.internet import reactor, defer
 
 
 
 LOG_SYSTEM = 'opennsa.Scheduler'
 
+# compact the heap when more than this fraction of the entries are cancelled
+COMPACT_RATIO = 0.5
+COMPACT_MINIMUM = 1000
+
+# calls due within this many seconds of the first due call are run together
+BATCH_WINDOW = 0.1
+
+# heap entry fields, entries are lists so they can be cancelled in place
+DUE_TIME, SEQUENCE, CONNECTION_ID, CALL, ARGS, BATCH = list(range(6))
+
 
 
 def deferTaskFailed(err):
@@ -28,18 +48,30 @@ def deferTaskFailed(err):
 class CallScheduler:
 
     def __init__(self):
-        self.scheduled_calls = {}
+        self.scheduled_calls = {} # connection_id -> heap entry
+        self.call_queue = []      # heap of [ due_time, sequence, connection_id, call, args, batch ]
+        self.sequence = 0
+        self.cancelled = 0
+        self.timer = None
         self.clock = reactor # this is needed in order to test scheduled calls
 
 
     def scheduleCall(self, connection_id, transition_time, call, *args):
-        assert callable(call), 'call argument is not a callable'
+        self._scheduleCall(connection_id, transition_time, call, args, False)
 
-        try:
-            sched_call = self.scheduled_calls[connection_id]
-            assert sched_call.called is True, 'Connection %s: Attempt to schedule transition with existing schedule transition' % connection_id
-        except KeyError:
-            pass # no scheduled call
+
+    def scheduleBatchCall(self, connection_id, transition_time, call, arg):
+        """
+        Schedule a call which can be batched with other calls. When the call
+        is due, it is called with a list of the args of all the batch calls to
+        it which are due at the same time.
+        """
+        self._scheduleCall(connection_id, transition_time, call, arg, True)
+
+
+    def _scheduleCall(self, connection_id, transition_time, call, args, batch):
+        assert callable(call), 'call argument is not a callable'
+        assert connection_id not in self.scheduled_calls, 'Connection %s: Attempt to schedule transition with existing schedule transition' % connection_id
 
         dt_now = datetime.datetime.utcnow()
 
@@ -50,10 +82,12 @@ class CallScheduler:
         transition_delta_seconds = (td.microseconds + (td.seconds + td.days * 24 * 3600) * 10**6) / 10**6.0
         transition_delta_seconds = max(transition_delta_seconds, 0) # if dt_now is passed during calculation
 
-        d = task.deferLater(self.clock, transition_delta_seconds, call, *args)
-        d.addErrback(deferTaskFailed)
-        self.scheduled_calls[connection_id] = d
-        return d
+        entry = [ self.clock.seconds() + transition_delta_seconds, self.sequence, connection_id, call, args, batch ]
+        self.sequence += 1
+
+        heapq.heappush(self.call_queue, entry)
+        self.scheduled_calls[connection_id] = entry
+        self._armTimer()
 
 
     def hasScheduledCall(self, connection_id):
@@ -62,13 +96,79 @@ class CallScheduler:
 
     def cancelCall(self, connection_id):
         try:
-            sched_call = self.scheduled_calls.pop(connection_id)
-            sched_call.cancel()
+            entry = self.scheduled_calls.pop(connection_id)
         except KeyError:
-            pass
+            return
+
+        entry[CALL] = None
+        entry[ARGS] = None
+        self.cancelled += 1
+
+        if self.cancelled > COMPACT_MINIMUM and self.cancelled > len(self.call_queue) * COMPACT_RATIO:
+            self.call_queue = [ e for e in self.call_queue if e[CALL] is not None ]
+            heapq.heapify(self.call_queue)
+            self.cancelled = 0
+
+        self._armTimer()
 
 
     def cancelAllCalls(self):
-        for k in list(self.scheduled_calls.keys()):
-            self.scheduled_calls.pop(k).cancel()
+        self.scheduled_calls = {}
+        self.call_queue = []
+        self.cancelled = 0
+        if self.timer is not None and self.timer.active():
+            self.timer.cancel()
+        self.timer = None
+
+
+    def _armTimer(self):
+        # make sure the reactor timer is set for the first due call (if any)
+
+        while self.call_queue and self.call_queue[0][CALL] is None:
+            heapq.heappop(self.call_queue)
+            self.cancelled -= 1
+
+        timer_active = self.timer is not None and self.timer.active()
+
+        if not self.call_queue:
+            if timer_active:
+                self.timer.cancel()
+            self.timer = None
+            return
+
+        due_time = self.call_queue[0][DUE_TIME]
+        delay = max(due_time - self.clock.seconds(), 0)
+
+        if not timer_active:
+            self.timer = self.clock.callLater(delay, self._runDueCalls)
+        elif self.timer.getTime() != due_time:
+            self.timer.reset(delay)
+
+
+    def _runDueCalls(self):
+
+        self.timer = None
+        now = self.clock.seconds()
+
+        due_entries = []
+        while self.call_queue and self.call_queue[0][DUE_TIME] <= now + BATCH_WINDOW:
+            entry = heapq.heappop(self.call_queue)
+            if entry[CALL] is None:
+                self.cancelled -= 1
+            else:
+                del self.scheduled_calls[entry[CONNECTION_ID]]
+                due_entries.append(entry)
+
+        batches = {} # call -> [ arg ], dicts keep insertion order, so batches are run in due order
+        for entry in due_entries:
+            if entry[BATCH]:
+                batches.setdefault(entry[CALL], []).append(entry[ARGS])
+            else:
+                d = defer.maybeDeferred(entry[CALL], *entry[ARGS])
+                d.addErrback(deferTaskFailed)
+
+        for call, batch_args in batches.items():
+            d = defer.maybeDeferred(call, batch_args)
+            d.addErrback(deferTaskFailed)
 
+        self._armTimer()
@@ -0,0 +1,80 @@
+"""
+Calendar snapshot files.
+
+A snapshot contains the calendar entries of the generic backend, i.e., the
+resources and time span reserved by each connection, along with the database
+change sequence high-water mark at the time the snapshot was taken. On restart
+the entries are loaded from the snapshot, and only connections changed after
+the high-water mark has to be read from the database to get the calendar up
+to date.
+
+The format is zlib compressed json, written atomically (write + rename).
+
+Author: Henrik Thostrup Jensen <htj@nordu.net>
+Copyright: NORDUnet (2017)
+"""
+
+import os
+import json
+import zlib
+import datetime
+
+
+
+SNAPSHOT_VERSION = 1
+
+TIME_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+
+
+
+class SnapshotError(Exception):
+    pass
+
+
+
+def _encodeTime(dt):
+    return None if dt is None else dt.strftime(TIME_FORMAT)
+
+
+def _decodeTime(value):
+    return None if value is None else datetime.datetime.strptime(value, TIME_FORMAT)
+
+
+
+def writeSnapshot(filename, high_water_mark, entries):
+    """
+    Write calendar entries to the snapshot file.
+
+    entries is a dict: { connection_id : (source_resource, dest_resource, start_time, end_time) }
+    """
+    rows = [ (cid, src, dst, _encodeTime(st), _encodeTime(et)) for cid, (src, dst, st, et) in entries.items() ]
+    data = { 'version' : SNAPSHOT_VERSION, 'high_water_mark' : high_water_mark, 'entries' : rows }
+
+    payload = zlib.compress( json.dumps(data, separators=(',', ':')).encode() )
+
+    tmp_filename = filename + '.tmp'
+    with open(tmp_filename, 'wb') as f:
+        f.write(payload)
+    os.rename(tmp_filename, filename)
+
+
+
+def readSnapshot(filename):
+    """
+    Read a snapshot file. Returns (high_water_mark, entries), see writeSnapshot.
+    Raises SnapshotError if the file cannot be read.
+    """
+    try:
+        with open(filename, 'rb') as f:
+            data = json.loads( zlib.decompress(f.read()).decode() )
+    except (IOError, ValueError, zlib.error) as e:
+        raise SnapshotError('Cannot read calendar snapshot %s: %s' % (filename, e))
+
+    if data.get('version') != SNAPSHOT_VERSION:
+        raise SnapshotError('Unsupported calendar snapshot version: %s' % data.get('version'))
+
+    entries = {}
+    for cid, src, dst, st, et in data['entries']:
+        entries[cid] = (src, dst, _decodeTime(st), _decodeTime(et))
+
+    return data['high_water_mark'], entries
@@ -202,6 +202,24 @@ class JUNOSCommandSender:
         return self._sendCommands(commands)
 
 
+    def setupLinks(self, links):
+        # configure all the links in a single commit
+        commands = []
+        for connection_id, source_port, dest_port, bandwidth in links:
+            cg = JUNOSCommandGenerator(connection_id,source_port,dest_port,self.junos_routers,self.network_name,bandwidth)
+            commands += cg.generateActivateCommand()
+        return self._sendCommands(commands)
+
+
+    def teardownLinks(self, links):
+        # remove all the links in a single commit
+        commands = []
+        for connection_id, source_port, dest_port, bandwidth in links:
+            cg = JUNOSCommandGenerator(connection_id,source_port,dest_port,self.junos_routers,self.network_name,bandwidth)
+            commands += cg.generateDeactivateCommand()
+        return self._sendCommands(commands)
+
+
 class JUNOSTarget(object):
 
     def __init__(self, port, original_port,value=None):
@@ -275,6 +293,24 @@ class JUNOSConnectionManager:
         return d
 
 
+    def setupLinks(self, links):
+        def linksUp(_):
+            for _, source_target, dest_target, _ in links:
+                log.msg('Link %s -> %s up' % (source_target, dest_target), system=LOG_SYSTEM)
+        d = self.command_sender.setupLinks(links)
+        d.addCallback(linksUp)
+        return d
+
+
+    def teardownLinks(self, links):
+        def linksDown(_):
+            for _, source_target, dest_target, _ in links:
+                log.msg('Link %s -> %s down' % (source_target, dest_target), system=LOG_SYSTEM)
+        d = self.command_sender.teardownLinks(links)
+        d.addCallback(linksDown)
+        return d
+
+
     def canConnect(self, source_port, dest_port, source_label, dest_label):
         src_label_type = 'port' if source_label is None else source_label.type_
         dst_label_type = 'port' if dest_label is None else dest_label.type_
@@ -37,7 +37,7 @@ import random
 from base64 import b64encode
 from pprint import pprint, pformat
 
-from zope.interface import implements
+from zope.interface import implementer
 
 from twisted.python import log
 from twisted.internet import defer
@@ -79,8 +79,8 @@ class JUNOSSPACERouter(object):
         return "Router name {} deviceId {} loopback ip {}".format(self.router_name,self.router_id,self.router_ip)
 
 
+@implementer(IBodyProducer)
 class JUNOSSPACEPayloadProducer(object):
-    implements(IBodyProducer)
 
     def __init__(self, json_payload):
         self.json_payload = json.dumps(json_payload['payload'])
@@ -21,6 +21,16 @@ DEFAULT_TCP_PORT        = 9080
 DEFAULT_TLS_PORT        = 9443
 DEFAULT_VERIFY          = True
 DEFAULT_CERTIFICATE_DIR = '/etc/ssl/certs' # This will work on most mordern linux distros
+DEFAULT_HTTP_POOL_SIZE  = 2
+DEFAULT_HTTP_IDLE_TIMEOUT = 240 # seconds
+DEFAULT_MAX_PAYLOAD_SIZE  = 4 * 1024 * 1024 # bytes
+DEFAULT_MAX_PAYLOAD_DEPTH = 64
+DEFAULT_MAX_REPLY_SIZE    = 64 * 1024 * 1024 # bytes
+DEFAULT_THREAD_PAYLOAD_SIZE = 0 # disabled
+DEFAULT_NOTIFICATION_TTL = 3600 # seconds
+DEFAULT_RATE_LIMIT      = 0     # requests per second, disabled
+DEFAULT_RATE_BURST      = 10    # requests
+DEFAULT_MAX_INFLIGHT    = 0     # disabled
 
 
 # config blocks and options
@@ -50,6 +60,16 @@ PEERS            = 'peers'
 POLICY           = 'policy'
 PLUGIN           = 'plugin'
 SERVICE_ID_START = 'serviceid_start'
+HTTP_POOL_SIZE   = 'httppoolsize'
+HTTP_IDLE_TIMEOUT = 'httpidletimeout'
+MAX_PAYLOAD_SIZE = 'maxpayloadsize'
+MAX_PAYLOAD_DEPTH = 'maxpayloaddepth'
+MAX_REPLY_SIZE   = 'maxreplysize'
+THREAD_PAYLOAD_SIZE = 'threadpayloadsize'
+NOTIFICATION_TTL = 'notificationttl'
+RATE_LIMIT       = 'ratelimit'
+RATE_BURST       = 'rateburst'
+MAX_INFLIGHT     = 'maxinflight'
 
 # database
 DATABASE                = 'database'    # mandatory
@@ -75,6 +95,9 @@ _SSH_PRIVATE_KEY        = 'privatekey'
 
 AS_NUMBER              = 'asnumber'
 
+# generic backend
+CALENDAR_SNAPSHOT       = 'calendarsnapshot'
+
 # TODO: Don't do backend specifics for everything, it causes confusion, and doesn't really solve anything
 
 # juniper block - same for mx / ex backends
@@ -274,6 +297,56 @@ def readVerifyConfig(cfg):
     except configparser.NoOptionError:
         vc[SERVICE_ID_START] = None
 
+    try:
+        vc[HTTP_POOL_SIZE] = cfg.getint(BLOCK_SERVICE, HTTP_POOL_SIZE)
+    except configparser.NoOptionError:
+        vc[HTTP_POOL_SIZE] = DEFAULT_HTTP_POOL_SIZE
+
+    try:
+        vc[HTTP_IDLE_TIMEOUT] = cfg.getint(BLOCK_SERVICE, HTTP_IDLE_TIMEOUT)
+    except configparser.NoOptionError:
+        vc[HTTP_IDLE_TIMEOUT] = DEFAULT_HTTP_IDLE_TIMEOUT
+
+    try:
+        vc[MAX_PAYLOAD_SIZE] = cfg.getint(BLOCK_SERVICE, MAX_PAYLOAD_SIZE)
+    except configparser.NoOptionError:
+        vc[MAX_PAYLOAD_SIZE] = DEFAULT_MAX_PAYLOAD_SIZE
+
+    try:
+        vc[MAX_PAYLOAD_DEPTH] = cfg.getint(BLOCK_SERVICE, MAX_PAYLOAD_DEPTH)
+    except configparser.NoOptionError:
+        vc[MAX_PAYLOAD_DEPTH] = DEFAULT_MAX_PAYLOAD_DEPTH
+
+    try:
+        vc[MAX_REPLY_SIZE] = cfg.getint(BLOCK_SERVICE, MAX_REPLY_SIZE)
+    except configparser.NoOptionError:
+        vc[MAX_REPLY_SIZE] = DEFAULT_MAX_REPLY_SIZE
+
+    try:
+        vc[THREAD_PAYLOAD_SIZE] = cfg.getint(BLOCK_SERVICE, THREAD_PAYLOAD_SIZE)
+    except configparser.NoOptionError:
+        vc[THREAD_PAYLOAD_SIZE] = DEFAULT_THREAD_PAYLOAD_SIZE
+
+    try:
+        vc[NOTIFICATION_TTL] = cfg.getint(BLOCK_SERVICE, NOTIFICATION_TTL)
+    except configparser.NoOptionError:
+        vc[NOTIFICATION_TTL] = DEFAULT_NOTIFICATION_TTL
+
+    try:
+        vc[RATE_LIMIT] = cfg.getfloat(BLOCK_SERVICE, RATE_LIMIT)
+    except configparser.NoOptionError:
+        vc[RATE_LIMIT] = DEFAULT_RATE_LIMIT
+
+    try:
+        vc[RATE_BURST] = cfg.getint(BLOCK_SERVICE, RATE_BURST)
+    except configparser.NoOptionError:
+        vc[RATE_BURST] = DEFAULT_RATE_BURST
+
+    try:
+        vc[MAX_INFLIGHT] = cfg.getint(BLOCK_SERVICE, MAX_INFLIGHT)
+    except configparser.NoOptionError:
+        vc[MAX_INFLIGHT] = DEFAULT_MAX_INFLIGHT
+
     # we always extract certdir and verify as we need that for performing https requests
     try:
         certdir = cfg.get(BLOCK_SERVICE, CERTIFICATE_DIR)
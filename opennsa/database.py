@@ -101,6 +101,10 @@ class STPAuthz(DBObject):
     TABLENAME = 'stp_authz'
 
 
+class OutboundMessage(DBObject):
+    pass
+
+
 # Not really needed
 class BackendConnectionID(DBObject):
     TABLENAME = 'backend_connection_id'
@@ -128,5 +132,71 @@ def getBackendConnectionId():
 
 
 
+
+SUMMARY_QUERY = """
+SELECT sc.connection_id, sc.global_reservation_id, sc.description, sc.requester_nsa, sc.revision,
+       sc.reservation_state, sc.provision_state, sc.lifecycle_state,
+       sc.source_network, sc.source_port, sc.source_label, sc.dest_network, sc.dest_port, sc.dest_label,
+       sc.start_time, sc.end_time, sc.bandwidth,
+       count(sub.id),
+       bool_and(sub.data_plane_active),
+       coalesce(max(sub.data_plane_version), 0),
+       bool_and(coalesce(sub.data_plane_consistent, false))
+FROM service_connections sc LEFT JOIN sub_connections sub ON sub.service_connection_id = sc.id
+WHERE %s
+GROUP BY sc.id
+ORDER BY sc.id;"""
+
+
+def getConnectionSummaries(requester_nsa, connection_ids=None, global_reservation_ids=None):
+    """
+    Get service connections for a requester, along with the data plane status
+    aggregated from their sub connections, in a single query.
+
+    Returns a deferred with a list of rows, the last four columns being number
+    of sub connections, all active, max version, and all consistent.
+    """
+    where = 'sc.requester_nsa = %s'
+    args = [ requester_nsa ]
+
+    if connection_ids:
+        where += ' AND sc.connection_id IN %s'
+        args.append( tuple(connection_ids) )
+    elif global_reservation_ids:
+        where += ' AND sc.global_reservation_id IN %s'
+        args.append( tuple(global_reservation_ids) )
+
+    return Registry.DBPOOL.runQuery(SUMMARY_QUERY % where, args)
+
+
+
+PORT_USAGE_QUERY = """
+SELECT sub.source_network, sub.source_port, sub.source_label, sub.dest_network, sub.dest_port, sub.dest_label, sc.bandwidth
+FROM sub_connections sub JOIN service_connections sc ON sub.service_connection_id = sc.id
+WHERE (sub.source_network = %%s OR sub.dest_network = %%s) AND sub.lifecycle_state <> %%s AND %s;"""
+
+
+def getPortUsage(network, start_time, end_time, terminated):
+    """
+    Get the ports, labels and bandwidth used by non-terminated sub connections
+    in a network, which overlap the interval start_time - end_time (None being
+    open-ended).
+
+    Returns a deferred with a list of rows (source network, source port, source
+    label, dest network, dest port, dest label, bandwidth).
+    """
+    where = []
+    args = [ network, network, terminated ]
+
+    if end_time is not None:
+        where.append('(sc.start_time IS NULL OR sc.start_time < %s)')
+        args.append(end_time)
+    if start_time is not None:
+        where.append('(sc.end_time IS NULL OR sc.end_time > %s)')
+        args.append(start_time)
+
+    return Registry.DBPOOL.runQuery(PORT_USAGE_QUERY % (' AND '.join(where) or 'true'), args)
+
+
 Registry.register(ServiceConnection, SubConnection)
 
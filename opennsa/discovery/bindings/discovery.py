@@ -2,9 +2,26 @@
 
 from xml.etree import ElementTree as ET
 
+# parse helpers, a single pass over the child elements instead of find/findtext per field
+
+def _children(element):
+    # child elements by tag, the first one wins (like find)
+    elements = {}
+    for e in reversed(element):
+        elements[e.tag] = e
+    return elements
+
+
+def _text(elements, tag):
+    # same as findtext
+    e = elements.get(tag)
+    return None if e is None else e.text or ''
+
+
 # types
 
 class InterfaceType(object):
+    __slots__ = ( 'type_', 'href', 'describedBy' )
     def __init__(self, type_, href, describedBy):
         self.type_ = type_  # string
         self.href = href  # anyURI
@@ -12,10 +29,11 @@ class InterfaceType(object):
 
     @classmethod
     def build(self, element):
+        elements = _children(element)
         return InterfaceType(
-                element.findtext('type'),
-                element.findtext('href'),
-                element.findtext('describedBy') if element.find('describedBy') is not None else None
+                _text(elements, 'type'),
+                _text(elements, 'href'),
+                _text(elements, 'describedBy')
                )
 
     def xml(self, elementName):
@@ -28,6 +46,7 @@ class InterfaceType(object):
 
 
 class NsaType(object):
+    __slots__ = ( 'id_', 'version', 'expires', 'name', 'softwareVersion', 'startTime', 'networkId', 'interface', 'feature', 'peersWith', 'other' )
     def __init__(self, id_, version, expires, name, softwareVersion, startTime, networkId, interface, feature, peersWith, other):
         self.id_ = id_  # anyURI
         self.version = version  # dateTime
@@ -43,18 +62,19 @@ class NsaType(object):
 
     @classmethod
     def build(self, element):
+        elements = _children(element)
         return NsaType(
                 element.get('id'),
                 element.get('version'),
                 element.get('expires'),
-                element.findtext('name') if element.find('name') is not None else None,
-                element.findtext('softwareVersion') if element.find('softwareVersion') is not None else None,
-                element.findtext('startTime') if element.find('startTime') is not None else None,
-                [ e.text for e in element.findall('networkId') ] if element.find('networkId') is not None else [],
-                [ InterfaceType.build(e) for e in element.findall('interface') ] if element.find('interface') is not None else None,
-                [ FeatureType.build(e) for e in element.findall('feature') ] if element.find('feature') is not None else None,
-                element.findtext('peersWith') if element.find('peersWith') is not None else None,
-                [ HolderType.build(e) for e in element.findall('other') ] if element.find('other') is not None else None
+                _text(elements, 'name'),
+                _text(elements, 'softwareVersion'),
+                _text(elements, 'startTime'),
+                [ e.text for e in element.findall('networkId') ] if 'networkId' in elements else [],
+                [ InterfaceType.build(e) for e in element.findall('interface') ] if 'interface' in elements else None,
+                [ FeatureType.build(e) for e in element.findall('feature') ] if 'feature' in elements else None,
+                _text(elements, 'peersWith'),
+                [ HolderType.build(e) for e in element.findall('other') ] if 'other' in elements else None
                )
 
     def xml(self, elementName):
@@ -83,6 +103,7 @@ class NsaType(object):
 
 
 class FeatureType(object):
+    __slots__ = ( 'type_', 'value' )
     def __init__(self, type_, value):
         self.type_ = type_
         self.value = value
@@ -101,14 +122,16 @@ class FeatureType(object):
 
 
 class HolderType(object):
+    __slots__ = ( 'topologyReachability', )
     def __init__(self, topologyReachability):
         self.topologyReachability = topologyReachability # [ Topology ]
 
 
     @classmethod
     def build(self, element):
+        elements = _children(element)
         return HolderType(
-                [ Topology.build(e) for e in element.find(str(topology_reachability)) ] if element.find(str(topology_reachability)) is not None else None
+                [ Topology.build(e) for e in elements[topology_reachability.text] ] if topology_reachability.text in elements else None
                )
 
     def xml(self, elementName):
@@ -123,6 +146,7 @@ class HolderType(object):
 
 # Created manually
 class Topology:
+    __slots__ = ( 'uri', 'cost' )
 
     def __init__(self, uri, cost):
         self.uri = uri   # string
@@ -151,6 +175,11 @@ topology_reachability = ET.QName('{%s}TopologyReachability' % GNS_NS)
 gns_topology = ET.QName('{%s}Topology'   % GNS_NS)
 nml_topology = ET.QName('{%s}Topology'   % NML_NS)
 
+# element tag -> type
+type_map = {
+    str(nsa) : NsaType
+}
+
 
 
 def parse(input_):
@@ -162,10 +191,6 @@ def parse(input_):
 
 def parseElement(element):
 
-    type_map = {
-        '{%s}nsa' % NSI_DISCOVERY_NS : NsaType
-    }
-
     if not element.tag in type_map:
         raise ValueError('No type mapping for tag %s' % element.tag)
 
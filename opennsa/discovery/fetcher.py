@@ -102,7 +102,9 @@ class FetcherService(service.Service):
                 for np in self.nrm_ports:
                     if np.remote_network in network_ids:
                         # this may add the vectors to multiple ports (though not likely)
-                        self.link_vectors.updateVector(np.name, vectors )
+                        changed = self.link_vectors.updateVector(np.name, vectors )
+                        if changed:
+                            log.msg('Vectors via %s changed for: %s' % (np.name, ', '.join(sorted(changed))), system=LOG_SYSTEM)
 
             # there is lots of other stuff in the nsa description but we don't really use it
 
@@ -7,7 +7,7 @@ Copyright: NORDUnet (2011-2012)
 
 import time
 
-from zope.interface import implements
+from zope.interface import implementer
 
 from twisted.python import log
 
@@ -15,11 +15,33 @@ from twisted.python import log
 # almost iso, we dump the T in the middle (makes it more tricky to read imho)
 TIME_FORMAT = "%Y-%m-%d %H:%M:%SZ"
 
+# If debug and payload messages are wanted. Set when logging is setup, so
+# messages which would be dropped are not formatted at all.
+DEBUG   = False
+PAYLOAD = False
 
 
-class DebugLogObserver(log.FileLogObserver):
 
-    implements(log.ILogObserver)
+def debug(message, *args, **kwargs):
+    """
+    Log a debug message. The message is only formatted (message % args) if debug logging is enabled.
+    """
+    if DEBUG:
+        log.msg(message % args if args else message, debug=True, **kwargs)
+
+
+def payload(message, *args, **kwargs):
+    """
+    Log a payload message. The message is only formatted (message % args) if payload logging is enabled.
+    """
+    if PAYLOAD:
+        log.msg(message % args if args else message, payload=True, **kwargs)
+
+
+
+
+@implementer(log.ILogObserver)
+class DebugLogObserver(log.FileLogObserver):
 
     def __init__(self, file_, debug=False, profile=False, payload=False):
         log.FileLogObserver.__init__(self, file_)
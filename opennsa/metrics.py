@@ -0,0 +1,145 @@
+"""
+Simple in-process metrics for OpenNSA.
+
+Counters count events, samples keep count/total/min/max for a measured value
+(usually a duration in seconds), and gauges are callables which are evaluated
+when a snapshot is taken. Metrics are named with dotted names, and created on
+first use.
+
+The reactor lag monitor measures how late the reactor runs a timed call, i.e.,
+how long the reactor has been blocked, e.g., by encoding large payloads.
+
+Author: Henrik Thostrup Jensen <htj@nordu.net>
+Copyright: NORDUnet (2017)
+"""
+
+from twisted.application import service
+
+
+
+class Counter(object):
+
+    def __init__(self):
+        self.value = 0
+
+    def increment(self, amount=1):
+        self.value += amount
+
+    def snapshot(self):
+        return self.value
+
+
+
+class Sample(object):
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.min   = None
+        self.max   = None
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def mean(self):
+        return self.total / float(self.count) if self.count else None
+
+    def snapshot(self):
+        return { 'count' : self.count, 'mean' : self.mean(), 'min' : self.min, 'max' : self.max }
+
+
+
+class Gauge(object):
+
+    def __init__(self, func):
+        self.func = func
+
+    def snapshot(self):
+        return self.func()
+
+
+
+class MetricsRegistry(object):
+
+    def __init__(self):
+        self.metrics = {} # name -> metric
+
+
+    def _getMetric(self, name, metric_type, *args):
+        try:
+            metric = self.metrics[name]
+        except KeyError:
+            metric = self.metrics[name] = metric_type(*args)
+        assert type(metric) is metric_type, 'Metric %s is a %s, not a %s' % (name, type(metric).__name__, metric_type.__name__)
+        return metric
+
+
+    def counter(self, name):
+        return self._getMetric(name, Counter)
+
+
+    def sample(self, name):
+        return self._getMetric(name, Sample)
+
+
+    def gauge(self, name, func):
+        # registering a gauge again replaces the callable
+        gauge = self._getMetric(name, Gauge, func)
+        gauge.func = func
+        return gauge
+
+
+    def snapshot(self):
+        return dict( [ (name, metric.snapshot()) for name, metric in self.metrics.items() ] )
+
+
+
+# module wide registry, this is the one which should normally be used
+registry = MetricsRegistry()
+
+counter  = registry.counter
+sample   = registry.sample
+gauge    = registry.gauge
+snapshot = registry.snapshot
+
+
+
+class ReactorLagMonitor(service.Service):
+
+    INTERVAL = 0.1 # seconds
+
+    def __init__(self, clock=None):
+        if clock is None:
+            from twisted.internet import reactor
+            clock = reactor
+        self.clock    = clock
+        self.call     = None
+        self.last_lag = 0
+
+        gauge('reactor.lag_last', lambda : self.last_lag)
+
+
+    def startService(self):
+        service.Service.startService(self)
+        self._schedule()
+
+
+    def stopService(self):
+        service.Service.stopService(self)
+        if self.call is not None and self.call.active():
+            self.call.cancel()
+        self.call = None
+
+
+    def _schedule(self):
+        self.expected = self.clock.seconds() + self.INTERVAL
+        self.call = self.clock.callLater(self.INTERVAL, self._check)
+
+
+    def _check(self):
+        self.last_lag = max(0, self.clock.seconds() - self.expected)
+        sample('reactor.lag').add(self.last_lag)
+        self._schedule()
@@ -7,7 +7,7 @@ Author: Henrik Thostrup Jensen < htj at nordu dot net >
 Copyright: NORDUnet A/S (2017)
 """
 
-from zope.interface import implements
+from zope.interface import implementer
 
 from twisted.internet import defer
 from twisted.python import log
@@ -20,8 +20,8 @@ from opennsa.interface import IPlugin
 LOG_SYSTEM = 'Canarie'
 
 
+@implementer(IPlugin)
 class CanariePlugin(plugin.BasePlugin):
-    implements(IPlugin)
 
     @defer.inlineCallbacks
     def createConnectionId(self):
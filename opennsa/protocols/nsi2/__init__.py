@@ -14,15 +14,16 @@ from opennsa.protocols.nsi2 import providerservice, providerclient, provider, \
 
 
 
-def setupProvider(child_provider, top_resource, tls=False, ctx_factory=None, allowed_hosts=None):
+def setupProvider(child_provider, top_resource, tls=False, ctx_factory=None, allowed_hosts=None, delivery_queue=None, notification_ttl=None,
+                  limiter=None, provider_nsa=None):
 
-    soap_resource = soapresource.setupSOAPResource(top_resource, 'CS2', allowed_hosts=allowed_hosts)
+    soap_resource = soapresource.setupSOAPResource(top_resource, 'CS2', allowed_hosts=allowed_hosts, limiter=limiter)
 
-    provider_client = providerclient.ProviderClient(ctx_factory)
+    provider_client = providerclient.ProviderClient(ctx_factory, delivery_queue)
 
-    nsi2_provider = provider.Provider(child_provider, provider_client)
+    nsi2_provider = provider.Provider(child_provider, provider_client, notification_ttl)
 
-    providerservice.ProviderService(soap_resource, nsi2_provider)
+    providerservice.ProviderService(soap_resource, nsi2_provider, provider_nsa)
 
     return nsi2_provider
 
@@ -42,7 +43,7 @@ def setupRequesterPair(top_resource, host, port, service_endpoint, nsi_requester
 
     requester_client = setupRequesterClient(top_resource, host, port, service_endpoint, resource_name=resource_name, tls=tls, ctx_factory=ctx_factory)
 
-    soap_resource = soapresource.setupSOAPResource(top_resource, resource_name)
+    soap_resource = soapresource.setupSOAPResource(top_resource, resource_name, replies=True)
     requesterservice.RequesterService(soap_resource, nsi_requester)
 
     return requester_client
@@ -58,7 +59,7 @@ def createRequester(host, port, service_endpoint, resource_name=None, tls=False,
 
     nsi_requester = requester.Requester(requester_client, callback_timeout=callback_timeout)
 
-    soap_resource = soapresource.setupSOAPResource(top_resource, resource_name)
+    soap_resource = soapresource.setupSOAPResource(top_resource, resource_name, replies=True)
     requesterservice.RequesterService(soap_resource, nsi_requester)
 
     site = server.Site(top_resource, logPath='/dev/null')
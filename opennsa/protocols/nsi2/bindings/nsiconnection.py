@@ -2,9 +2,26 @@
 
 from xml.etree import ElementTree as ET
 
+# parse helpers, a single pass over the child elements instead of find/findtext per field
+
+def _children(element):
+    # child elements by tag, the first one wins (like find)
+    elements = {}
+    for e in reversed(element):
+        elements[e.tag] = e
+    return elements
+
+
+def _text(elements, tag):
+    # same as findtext
+    e = elements.get(tag)
+    return None if e is None else e.text or ''
+
+
 # types
 
 class DataPlaneStatusType(object):
+    __slots__ = ( 'active', 'version', 'versionConsistent' )
     def __init__(self, active, version, versionConsistent):
         self.active = active  # boolean
         self.version = version  # int
@@ -12,10 +29,11 @@ class DataPlaneStatusType(object):
 
     @classmethod
     def build(self, element):
+        elements = _children(element)
         return DataPlaneStatusType(
-                True if element.findtext('active') == 'true' else False,
-                int(element.findtext('version')),
-                True if element.findtext('versionConsistent') == 'true' else False
+                True if _text(elements, 'active') == 'true' else False,
+                int(_text(elements, 'version')),
+                True if _text(elements, 'versionConsistent') == 'true' else False
                )
 
     def xml(self, elementName):
@@ -27,6 +45,7 @@ class DataPlaneStatusType(object):
 
 
 class GenericErrorType(object):
+    __slots__ = ( 'serviceException', )
     def __init__(self, serviceException):
         self.serviceException = serviceException  # ServiceExceptionType
 
@@ -44,6 +63,7 @@ class GenericErrorType(object):
 
 
 class ReserveType(object):
+    __slots__ = ( 'connectionId', 'globalReservationId', 'description', 'criteria' )
     def __init__(self, connectionId, globalReservationId, description, criteria):
         self.connectionId = connectionId  # ConnectionIdType -> string
         self.globalReservationId = globalReservationId  # GlobalReservationIdType -> anyURI
@@ -52,11 +72,12 @@ class ReserveType(object):
 
     @classmethod
     def build(self, element):
+        elements = _children(element)
         return ReserveType(
-                element.findtext('connectionId') if element.find('connectionId') is not None else None,
-                element.findtext('globalReservationId') if element.find('globalReservationId') is not None else None,
-                element.findtext('description') if element.find('description') is not None else None,
-                ReservationRequestCriteriaType.build(element.find('criteria'))
+                _text(elements, 'connectionId'),
+                _text(elements, 'globalReservationId'),
+                _text(elements, 'description'),
+                ReservationRequestCriteriaType.build(elements.get('criteria'))
                )
 
     def xml(self, elementName):
@@ -72,6 +93,7 @@ class ReserveType(object):
 
 
 class MessageDeliveryTimeoutRequestType(object):
+    __slots__ = ( 'connectionId', 'notificationId', 'timeStamp', 'correlationId' )
     def __init__(self, connectionId, notificationId, timeStamp, correlationId):
         self.connectionId = connectionId  # ConnectionIdType -> string
         self.notificationId = notificationId  # NotificationIdType -> long
@@ -80,11 +102,12 @@ class MessageDeliveryTimeoutRequestType(object):
 
     @classmethod
     def build(self, element):
+        elements = _children(element)
         return MessageDeliveryTimeoutRequestType(
-                element.findtext('connectionId'),
-                int(element.findtext('notificationId')),
-                element.findtext('timeStamp'),
-                element.findtext('correlationId')
+                _text(elements, 'connectionId'),
+                int(_text(elements, 'notificationId')),
+                _text(elements, 'timeStamp'),
+                _text(elements, 'correlationId')
                )
 
     def xml(self, elementName):
@@ -97,6 +120,7 @@ class MessageDeliveryTimeoutRequestType(object):
 
 
 class GenericConfirmedType(object):
+    __slots__ = ( 'connectionId', )
     def __init__(self, connectionId):
         self.connectionId = connectionId  # ConnectionIdType -> string
 
@@ -113,6 +137,7 @@ class GenericConfirmedType(object):
 
 
 class ConnectionStatesType(object):
+    __slots__ = ( 'reservationState', 'provisionState', 'lifecycleState', 'dataPlaneStatus' )
     def __init__(self, reservationState, provisionState, lifecycleState, dataPlaneStatus):
         self.reservationState = reservationState  # ReservationStateEnumType -> string
         self.provisionState = provisionState  # ProvisionStateEnumType -> string
@@ -121,11 +146,12 @@ class ConnectionStatesType(object):
 
     @classmethod
     def build(self, element):
+        elements = _children(element)
         return ConnectionStatesType(
-                element.findtext('reservationState'),
-                element.findtext('provisionState') if element.find('provisionState') is not None else None,
-                element.findtext('lifecycleState'),
-                DataPlaneStatusType.build(element.find('dataPlaneStatus'))
+                _text(elements, 'reservationState'),
+                _text(elements, 'provisionState'),
+                _text(elements, 'lifecycleState'),
+                DataPlaneStatusType.build(elements.get('dataPlaneStatus'))
                )
 
     def xml(self, elementName):
@@ -138,6 +164,7 @@ class ConnectionStatesType(object):
 
 
 class ReservationRequestCriteriaType(object):
+    __slots__ = ( 'version', 'schedule', 'serviceType', 'serviceDefinition' )
     def __init__(self, version, schedule, serviceType, serviceDefinition):
         self.version = version  # int
         self.schedule = schedule  # ScheduleType
@@ -150,10 +177,11 @@ class ReservationRequestCriteriaType(object):
         # we do some manual stuff here
         from . import p2pservices
         service_defs = [ p2pservices.parseElement(e) for e in element if e.tag not in ('schedule', 'serviceType') ]
+        elements = _children(element)
         return ReservationRequestCriteriaType(
                 element.get('version'),
-                ScheduleType.build(element.find('schedule')) if element.find('schedule') is not None else None,
-                element.findtext('serviceType') if element.find('serviceType') is not None else None,
+                ScheduleType.build(elements['schedule']) if 'schedule' in elements else None,
+                _text(elements, 'serviceType'),
                 service_defs[0]
                )
 
@@ -170,6 +198,7 @@ class ReservationRequestCriteriaType(object):
 
 
 class QuerySummaryResultType(object):
+    __slots__ = ( 'connectionId', 'globalReservationId', 'description', 'criteria', 'requesterNSA', 'connectionStates', 'notificationId', 'resultId' )
     def __init__(self, connectionId, globalReservationId, description, criteria, requesterNSA, connectionStates, notificationId, resultId):
         self.connectionId = connectionId  # ConnectionIdType -> string
         self.globalReservationId = globalReservationId  # GlobalReservationIdType -> anyURI
@@ -182,15 +211,16 @@ class QuerySummaryResultType(object):
 
     @classmethod
     def build(self, element):
+        elements = _children(element)
         return QuerySummaryResultType(
-                element.findtext('connectionId'),
-                element.findtext('globalReservationId') if element.find('globalReservationId') is not None else None,
-                element.findtext('description') if element.find('description') is not None else None,
-                [ QuerySummaryResultCriteriaType.build(e) for e in element.findall('criteria') ] if element.find('criteria') is not None else None,
-                element.findtext('requesterNSA'),
-                ConnectionStatesType.build(element.find('connectionStates')),
-                int(element.findtext('notificationId')) if element.find('notificationId') is not None else None,
-                int(element.findtext('resultId')) if element.find('resultId') is not None else None
+                _text(elements, 'connectionId'),
+                _text(elements, 'globalReservationId'),
+                _text(elements, 'description'),
+                [ QuerySummaryResultCriteriaType.build(e) for e in element.findall('criteria') ] if 'criteria' in elements else None,
+                _text(elements, 'requesterNSA'),
+                ConnectionStatesType.build(elements.get('connectionStates')),
+                int(_text(elements, 'notificationId')) if 'notificationId' in elements else None,
+                int(_text(elements, 'resultId')) if 'resultId' in elements else None
                )
 
     def xml(self, elementName):
@@ -214,6 +244,7 @@ class QuerySummaryResultType(object):
 
 
 class QuerySummaryConfirmedType(object):
+    __slots__ = ( 'reservations', )
     def __init__(self, reservations):
         self.reservations = reservations  # [ QuerySummaryResultType  ]
 
@@ -232,6 +263,7 @@ class QuerySummaryConfirmedType(object):
 
 
 class QueryRecursiveConfirmedType(object):
+    __slots__ = ( 'reservations', )
     def __init__(self, reservations):
         self.reservations = reservations  # [ QueryRecursiveResultType  ]
 
@@ -250,6 +282,7 @@ class QueryRecursiveConfirmedType(object):
 
 
 class ReserveConfirmedType(object):
+    __slots__ = ( 'connectionId', 'globalReservationId', 'description', 'criteria' )
     def __init__(self, connectionId, globalReservationId, description, criteria):
         self.connectionId = connectionId  # ConnectionIdType -> string
         self.globalReservationId = globalReservationId  # GlobalReservationIdType -> anyURI
@@ -258,11 +291,12 @@ class ReserveConfirmedType(object):
 
     @classmethod
     def build(self, element):
+        elements = _children(element)
         return ReserveConfirmedType(
-                element.findtext('connectionId'),
-                element.findtext('globalReservationId') if element.find('globalReservationId') is not None else None,
-                element.findtext('description') if element.find('description') is not None else None,
-                ReservationConfirmCriteriaType.build(element.find('criteria'))
+                _text(elements, 'connectionId'),
+                _text(elements, 'globalReservationId'),
+                _text(elements, 'description'),
+                ReservationConfirmCriteriaType.build(elements.get('criteria'))
                )
 
     def xml(self, elementName):
@@ -277,6 +311,7 @@ class ReserveConfirmedType(object):
 
 
 class GenericAcknowledgmentType(object):
+    __slots__ = ()
     def __init__(self):
         pass
 
@@ -290,6 +325,7 @@ class GenericAcknowledgmentType(object):
 
 
 class ReserveResponseType(object):
+    __slots__ = ( 'connectionId', )
     def __init__(self, connectionId):
         self.connectionId = connectionId  # ConnectionIdType -> string
 
@@ -306,6 +342,7 @@ class ReserveResponseType(object):
 
 
 class DataPlaneStateChangeRequestType(object):
+    __slots__ = ( 'connectionId', 'notificationId', 'timeStamp', 'dataPlaneStatus' )
     def __init__(self, connectionId, notificationId, timeStamp, dataPlaneStatus):
         self.connectionId = connectionId  # ConnectionIdType -> string
         self.notificationId = notificationId  # NotificationIdType -> long
@@ -314,11 +351,12 @@ class DataPlaneStateChangeRequestType(object):
 
     @classmethod
     def build(self, element):
+        elements = _children(element)
         return DataPlaneStateChangeRequestType(
-                element.findtext('connectionId'),
-                int(element.findtext('notificationId')),
-                element.findtext('timeStamp'),
-                DataPlaneStatusType.build(element.find('dataPlaneStatus'))
+                _text(elements, 'connectionId'),
+                int(_text(elements, 'notificationId')),
+                _text(elements, 'timeStamp'),
+                DataPlaneStatusType.build(elements.get('dataPlaneStatus'))
                )
 
     def xml(self, elementName):
@@ -331,6 +369,7 @@ class DataPlaneStateChangeRequestType(object):
 
 
 class ErrorEventType(object):
+    __slots__ = ( 'connectionId', 'notificationId', 'timeStamp', 'event', 'originatingConnectionId', 'originatingNSA', 'additionalInfo', 'serviceException' )
     def __init__(self, connectionId, notificationId, timeStamp, event, originatingConnectionId, originatingNSA, additionalInfo, serviceException):
         self.connectionId = connectionId  # ConnectionIdType -> string
         self.notificationId = notificationId  # NotificationIdType -> long
@@ -343,15 +382,16 @@ class ErrorEventType(object):
 
     @classmethod
     def build(self, element):
+        elements = _children(element)
         return ErrorEventType(
-                element.findtext('connectionId'),
-                int(element.findtext('notificationId')),
-                element.findtext('timeStamp'),
-                element.findtext('event'),
-                element.findtext('originatingConnectionId'),
-                element.findtext('originatingNSA'),
-                [ TypeValuePairType.build(e) for e in element.find('additionalInfo') ] if element.find('additionalInfo') is not None else None,
-                ServiceExceptionType.build(element.find('serviceException')) if element.find('serviceException') is not None else None
+                _text(elements, 'connectionId'),
+                int(_text(elements, 'notificationId')),
+                _text(elements, 'timeStamp'),
+                _text(elements, 'event'),
+                _text(elements, 'originatingConnectionId'),
+                _text(elements, 'originatingNSA'),
+                [ TypeValuePairType.build(e) for e in elements['additionalInfo'] ] if 'additionalInfo' in elements else None,
+                ServiceExceptionType.build(elements['serviceException']) if 'serviceException' in elements else None
                )
 
     def xml(self, elementName):
@@ -363,13 +403,14 @@ class ErrorEventType(object):
         ET.SubElement(r, 'originatingConnectionId').text = self.originatingConnectionId
         ET.SubElement(r, 'originatingNSA').text = str(self.originatingNSA)
         if self.additionalInfo is not None:
-            ET.SubElement(r, 'additionalInfo').extend( [ e.xml(ET.QName('http://schemas.ogf.org/nsi/2013/12/framework/types', 'additionalInfo')) for e in self.additionalInfo ] )
+            ET.SubElement(r, 'additionalInfo').extend( [ e.xml(additionalInfo) for e in self.additionalInfo ] )
         if self.serviceException is not None:
             r.append(self.serviceException.xml('serviceException'))
         return r
 
 
 class QueryResultResponseType(object):
+    __slots__ = ( 'resultId', 'correlationId', 'timeStamp', 'reserveConfirmed', 'reserveFailed', 'reserveCommitConfirmed', 'reserveCommitFailed', 'reserveAbortConfirmed', 'provisionConfirmed', 'releaseConfirmed', 'terminateConfirmed', 'error' )
     def __init__(self, resultId, correlationId, timeStamp, reserveConfirmed, reserveFailed, reserveCommitConfirmed, reserveCommitFailed, reserveAbortConfirmed, provisionConfirmed, releaseConfirmed, terminateConfirmed, error):
         self.resultId = resultId  # ResultIdType -> long
         self.correlationId = correlationId  # UuidType -> anyURI
@@ -386,19 +427,20 @@ class QueryResultResponseType(object):
 
     @classmethod
     def build(self, element):
+        elements = _children(element)
         return QueryResultResponseType(
-                int(element.findtext('resultId')),
-                element.findtext('correlationId'),
-                element.findtext('timeStamp'),
-                ReserveConfirmedType.build(element.find('reserveConfirmed')),
-                GenericFailedType.build(element.find('reserveFailed')),
-                GenericConfirmedType.build(element.find('reserveCommitConfirmed')),
-                GenericFailedType.build(element.find('reserveCommitFailed')),
-                GenericConfirmedType.build(element.find('reserveAbortConfirmed')),
-                GenericConfirmedType.build(element.find('provisionConfirmed')),
-                GenericConfirmedType.build(element.find('releaseConfirmed')),
-                GenericConfirmedType.build(element.find('terminateConfirmed')),
-                GenericErrorType.build(element.find('error'))
+                int(_text(elements, 'resultId')),
+                _text(elements, 'correlationId'),
+                _text(elements, 'timeStamp'),
+                ReserveConfirmedType.build(elements.get('reserveConfirmed')),
+                GenericFailedType.build(elements.get('reserveFailed')),
+                GenericConfirmedType.build(elements.get('reserveCommitConfirmed')),
+                GenericFailedType.build(elements.get('reserveCommitFailed')),
+                GenericConfirmedType.build(elements.get('reserveAbortConfirmed')),
+                GenericConfirmedType.build(elements.get('provisionConfirmed')),
+                GenericConfirmedType.build(elements.get('releaseConfirmed')),
+                GenericConfirmedType.build(elements.get('terminateConfirmed')),
+                GenericErrorType.build(elements.get('error'))
                )
 
     def xml(self, elementName):
@@ -419,6 +461,7 @@ class QueryResultResponseType(object):
 
 
 class QueryNotificationType(object):
+    __slots__ = ( 'connectionId', 'startNotificationId', 'endNotificationId' )
     def __init__(self, connectionId, startNotificationId, endNotificationId):
         self.connectionId = connectionId  # ConnectionIdType -> string
         self.startNotificationId = startNotificationId  # NotificationIdType -> long
@@ -426,10 +469,11 @@ class QueryNotificationType(object):
 
     @classmethod
     def build(self, element):
+        elements = _children(element)
         return QueryNotificationType(
-                element.findtext('connectionId'),
-                int(element.findtext('startNotificationId')) if element.find('startNotificationId') is not None else None,
-                int(element.findtext('endNotificationId')) if element.find('endNotificationId') is not None else None
+                _text(elements, 'connectionId'),
+                int(_text(elements, 'startNotificationId')) if 'startNotificationId' in elements else None,
+                int(_text(elements, 'endNotificationId')) if 'endNotificationId' in elements else None
                )
 
     def xml(self, elementName):
@@ -443,6 +487,7 @@ class QueryNotificationType(object):
 
 
 class ReserveTimeoutRequestType(object):
+    __slots__ = ( 'connectionId', 'notificationId', 'timeStamp', 'timeoutValue', 'originatingConnectionId', 'originatingNSA' )
     def __init__(self, connectionId, notificationId, timeStamp, timeoutValue, originatingConnectionId, originatingNSA):
         self.connectionId = connectionId  # ConnectionIdType -> string
         self.notificationId = notificationId  # NotificationIdType -> long
@@ -453,13 +498,14 @@ class ReserveTimeoutRequestType(object):
 
     @classmethod
     def build(self, element):
+        elements = _children(element)
         return ReserveTimeoutRequestType(
-                element.findtext('connectionId'),
-                int(element.findtext('notificationId')),
-                element.findtext('timeStamp'),
-                int(element.findtext('timeoutValue')),
-                element.findtext('originatingConnectionId'),
-                element.findtext('originatingNSA')
+                _text(elements, 'connectionId'),
+                int(_text(elements, 'notificationId')),
+                _text(elements, 'timeStamp'),
+                int(_text(elements, 'timeoutValue')),
+                _text(elements, 'originatingConnectionId'),
+                _text(elements, 'originatingNSA')
                )
 
     def xml(self, elementName):
@@ -474,15 +520,17 @@ class ReserveTimeoutRequestType(object):
 
 
 class ScheduleType(object):
+    __slots__ = ( 'startTime', 'endTime' )
     def __init__(self, startTime, endTime):
         self.startTime = startTime  # DateTimeType -> dateTime
         self.endTime = endTime  # DateTimeType -> dateTime
 
     @classmethod
     def build(self, element):
+        elements = _children(element)
         return ScheduleType(
-                element.findtext('startTime') if element.find('startTime') is not None else None,
-                element.findtext('endTime') if element.find('endTime') is not None else None
+                _text(elements, 'startTime'),
+                _text(elements, 'endTime')
                )
 
     def xml(self, elementName):
@@ -495,6 +543,7 @@ class ScheduleType(object):
 
 
 class ChildSummaryType(object):
+    __slots__ = ( 'order', 'connectionId', 'providerNSA', 'serviceType' )
     def __init__(self, order, connectionId, providerNSA, serviceType):
         self.order = order  # int
         self.connectionId = connectionId  # ConnectionIdType -> string
@@ -503,11 +552,12 @@ class ChildSummaryType(object):
 
     @classmethod
     def build(self, element):
+        elements = _children(element)
         return ChildSummaryType(
                 element.get('order'),
-                element.findtext('connectionId'),
-                element.findtext('providerNSA'),
-                element.findtext('serviceType')
+                _text(elements, 'connectionId'),
+                _text(elements, 'providerNSA'),
+                _text(elements, 'serviceType')
                )
 
     def xml(self, elementName):
@@ -519,6 +569,7 @@ class ChildSummaryType(object):
 
 
 class QueryResultType(object):
+    __slots__ = ( 'connectionId', 'startResultId', 'endResultId' )
     def __init__(self, connectionId, startResultId, endResultId):
         self.connectionId = connectionId  # ConnectionIdType -> string
         self.startResultId = startResultId  # ResultIdType -> long
@@ -526,10 +577,11 @@ class QueryResultType(object):
 
     @classmethod
     def build(self, element):
+        elements = _children(element)
         return QueryResultType(
-                element.findtext('connectionId'),
-                int(element.findtext('startResultId')) if element.find('startResultId') is not None else None,
-                int(element.findtext('endResultId')) if element.find('endResultId') is not None else None
+                _text(elements, 'connectionId'),
+                int(_text(elements, 'startResultId')) if 'startResultId' in elements else None,
+                int(_text(elements, 'endResultId')) if 'endResultId' in elements else None
                )
 
     def xml(self, elementName):
@@ -543,6 +595,7 @@ class QueryResultType(object):
 
 
 class ReservationConfirmCriteriaType(object):
+    __slots__ = ( 'version', 'schedule', 'serviceType', 'serviceDefinitionTag', 'serviceDefinition' )
     def __init__(self, version, schedule, serviceType, serviceDefinitionTag, serviceDefinition):
         self.version = version  # int
         self.schedule = schedule  # ScheduleType
@@ -556,10 +609,11 @@ class ReservationConfirmCriteriaType(object):
         # However only a single service is currently supported, so this works
         from . import p2pservices
         service_defs = [ p2pservices.parseElement(e) for e in element if e.tag not in ('schedule', 'serviceType') ]
+        elements = _children(element)
         return ReservationConfirmCriteriaType(
                 element.get('version'),
-                ScheduleType.build(element.find('schedule')),
-                element.findtext('serviceType'),
+                ScheduleType.build(elements.get('schedule')),
+                _text(elements, 'serviceType'),
                 str(p2pservices.p2ps),
                 service_defs[0]
                )
@@ -574,6 +628,7 @@ class ReservationConfirmCriteriaType(object):
 
 
 class GenericRequestType(object):
+    __slots__ = ( 'connectionId', )
     def __init__(self, connectionId):
         self.connectionId = connectionId  # ConnectionIdType -> string
 
@@ -590,6 +645,7 @@ class GenericRequestType(object):
 
 
 class TypeValuePairType(object):
+    __slots__ = ( 'type', 'namespace', 'value' )
     def __init__(self, type, namespace, value):
         self.type = type  # string
         self.namespace = namespace  # anyURI
@@ -612,6 +668,7 @@ class TypeValuePairType(object):
 
 
 class QueryRecursiveResultType(object):
+    __slots__ = ( 'connectionId', 'globalReservationId', 'description', 'criteria', 'requesterNSA', 'connectionStates', 'notificationId', 'resultId' )
     def __init__(self, connectionId, globalReservationId, description, criteria, requesterNSA, connectionStates, notificationId, resultId):
         self.connectionId = connectionId  # ConnectionIdType -> string
         self.globalReservationId = globalReservationId  # GlobalReservationIdType -> anyURI
@@ -624,15 +681,16 @@ class QueryRecursiveResultType(object):
 
     @classmethod
     def build(self, element):
+        elements = _children(element)
         return QueryRecursiveResultType(
-                element.findtext('connectionId'),
-                element.findtext('globalReservationId') if element.find('globalReservationId') is not None else None,
-                element.findtext('description') if element.find('description') is not None else None,
-                [ QueryRecursiveResultCriteriaType.build(e) for e in element.findall('criteria') ] if element.find('criteria') is not None else None,
-                element.findtext('requesterNSA'),
-                ConnectionStatesType.build(element.find('connectionStates')),
-                int(element.findtext('notificationId')) if element.find('notificationId') is not None else None,
-                int(element.findtext('resultId')) if element.find('resultId') is not None else None
+                _text(elements, 'connectionId'),
+                _text(elements, 'globalReservationId'),
+                _text(elements, 'description'),
+                [ QueryRecursiveResultCriteriaType.build(e) for e in element.findall('criteria') ] if 'criteria' in elements else None,
+                _text(elements, 'requesterNSA'),
+                ConnectionStatesType.build(elements.get('connectionStates')),
+                int(_text(elements, 'notificationId')) if 'notificationId' in elements else None,
+                int(_text(elements, 'resultId')) if 'resultId' in elements else None
                )
 
     def xml(self, elementName):
@@ -654,6 +712,7 @@ class QueryRecursiveResultType(object):
 
 
 class ServiceExceptionType(object):
+    __slots__ = ( 'nsaId', 'connectionId', 'serviceType', 'errorId', 'text', 'variables', 'childException' )
     def __init__(self, nsaId, connectionId, serviceType, errorId, text, variables, childException):
         self.nsaId = nsaId  # NsaIdType -> anyURI
         self.connectionId = connectionId  # ConnectionIdType -> string
@@ -665,14 +724,15 @@ class ServiceExceptionType(object):
 
     @classmethod
     def build(self, element):
+        elements = _children(element)
         return ServiceExceptionType(
-                element.findtext('nsaId'),
-                element.findtext('connectionId') if element.find('connectionId') is not None else None,
-                element.findtext('serviceType') if element.find('serviceType') is not None else None,
-                element.findtext('errorId'),
-                element.findtext('text'),
-                [ TypeValuePairType.build(e) for e in element.find('variables') ] if element.find('variables') is not None else None,
-                [ ServiceExceptionType.build(e) for e in element.findall('childException') ] if element.find('childException') is not None else None
+                _text(elements, 'nsaId'),
+                _text(elements, 'connectionId'),
+                _text(elements, 'serviceType'),
+                _text(elements, 'errorId'),
+                _text(elements, 'text'),
+                [ TypeValuePairType.build(e) for e in elements['variables'] ] if 'variables' in elements else None,
+                [ ServiceExceptionType.build(e) for e in element.findall('childException') ] if 'childException' in elements else None
                )
 
     def xml(self, elementName):
@@ -693,6 +753,7 @@ class ServiceExceptionType(object):
 
 
 class QueryNotificationConfirmedType(object):
+    __slots__ = ( 'errorEvent', 'reserveTimeout', 'dataPlaneStateChange', 'messageDeliveryTimeout' )
     def __init__(self, errorEvent, reserveTimeout, dataPlaneStateChange, messageDeliveryTimeout):
         self.errorEvent = errorEvent  # ErrorEventType
         self.reserveTimeout = reserveTimeout  # ReserveTimeoutRequestType
@@ -701,11 +762,12 @@ class QueryNotificationConfirmedType(object):
 
     @classmethod
     def build(self, element):
+        elements = _children(element)
         return QueryNotificationConfirmedType(
-                ErrorEventType.build(element.find('errorEvent')),
-                ReserveTimeoutRequestType.build(element.find('reserveTimeout')),
-                DataPlaneStateChangeRequestType.build(element.find('dataPlaneStateChange')),
-                MessageDeliveryTimeoutRequestType.build(element.find('messageDeliveryTimeout'))
+                ErrorEventType.build(elements.get('errorEvent')),
+                ReserveTimeoutRequestType.build(elements.get('reserveTimeout')),
+                DataPlaneStateChangeRequestType.build(elements.get('dataPlaneStateChange')),
+                MessageDeliveryTimeoutRequestType.build(elements.get('messageDeliveryTimeout'))
                )
 
     def xml(self, elementName):
@@ -718,6 +780,7 @@ class QueryNotificationConfirmedType(object):
 
 
 class QueryRecursiveResultCriteriaType(object):
+    __slots__ = ( 'version', 'schedule', 'serviceType', 'children', 'serviceDefinition' )
     def __init__(self, version, schedule, serviceType, children, serviceDefinition):
         self.version = version  # int
         self.schedule = schedule  # ScheduleType
@@ -729,11 +792,12 @@ class QueryRecursiveResultCriteriaType(object):
     def build(self, element):
         from . import p2pservices
         service_defs = [ p2pservices.parseElement(e) for e in element if e.tag not in ('schedule', 'serviceType', 'children') ]
+        elements = _children(element)
         return QueryRecursiveResultCriteriaType(
                 element.get('version'),
-                ScheduleType.build(element.find('schedule')),
-                element.findtext('serviceType'),
-                [ ChildRecursiveType.build(e) for e in element.find('children') ] if element.find('children') is not None else None,
+                ScheduleType.build(elements.get('schedule')),
+                _text(elements, 'serviceType'),
+                [ ChildRecursiveType.build(e) for e in elements['children'] ] if 'children' in elements else None,
                 service_defs[0]
                )
 
@@ -748,6 +812,7 @@ class QueryRecursiveResultCriteriaType(object):
 
 
 class GenericFailedType(object):
+    __slots__ = ( 'connectionId', 'connectionStates', 'serviceException' )
     def __init__(self, connectionId, connectionStates, serviceException):
         self.connectionId = connectionId  # ConnectionIdType -> string
         self.connectionStates = connectionStates  # ConnectionStatesType
@@ -755,10 +820,11 @@ class GenericFailedType(object):
 
     @classmethod
     def build(self, element):
+        elements = _children(element)
         return GenericFailedType(
-                element.findtext('connectionId'),
-                ConnectionStatesType.build(element.find('connectionStates')),
-                ServiceExceptionType.build(element.find('serviceException'))
+                _text(elements, 'connectionId'),
+                ConnectionStatesType.build(elements.get('connectionStates')),
+                ServiceExceptionType.build(elements.get('serviceException'))
                )
 
     def xml(self, elementName):
@@ -770,6 +836,7 @@ class GenericFailedType(object):
 
 
 class ChildRecursiveType(object):
+    __slots__ = ( 'order', 'connectionId', 'providerNSA', 'connectionStates', 'criteria' )
     def __init__(self, order, connectionId, providerNSA, connectionStates, criteria):
         self.order = order  # int
         self.connectionId = connectionId  # ConnectionIdType -> string
@@ -779,12 +846,13 @@ class ChildRecursiveType(object):
 
     @classmethod
     def build(self, element):
+        elements = _children(element)
         return ChildRecursiveType(
                 element.get('order'),
-                element.findtext('connectionId'),
-                element.findtext('providerNSA'),
-                ConnectionStatesType.build(element.find('connectionStates')),
-                [ QueryRecursiveResultCriteriaType.build(e) for e in element.findall('criteria') ] if element.find('criteria') is not None else None
+                _text(elements, 'connectionId'),
+                _text(elements, 'providerNSA'),
+                ConnectionStatesType.build(elements.get('connectionStates')),
+                [ QueryRecursiveResultCriteriaType.build(e) for e in element.findall('criteria') ] if 'criteria' in elements else None
                )
 
     def xml(self, elementName):
@@ -798,6 +866,7 @@ class ChildRecursiveType(object):
 
 
 class QueryType(object):
+    __slots__ = ( 'connectionId', 'globalReservationId' )
     def __init__(self, connectionId, globalReservationId):
         self.connectionId = connectionId  # [ ConnectionIdType -> string ]
         self.globalReservationId = globalReservationId  # [ GlobalReservationIdType -> anyURI ]
@@ -821,6 +890,7 @@ class QueryType(object):
 
 
 class QuerySummaryResultCriteriaType(object):
+    __slots__ = ( 'version', 'schedule', 'serviceType', 'children', 'serviceDefinition' )
     def __init__(self, version, schedule, serviceType, children, serviceDefinition):
         self.version = version  # int
         self.schedule = schedule  # ScheduleType
@@ -832,11 +902,12 @@ class QuerySummaryResultCriteriaType(object):
     def build(self, element):
         from . import p2pservices
         service_defs = [ p2pservices.parseElement(e) for e in element if e.tag not in ('schedule', 'serviceType', 'children') ]
+        elements = _children(element)
         return QuerySummaryResultCriteriaType(
                 element.get('version'),
-                ScheduleType.build(element.find('schedule')),
-                element.findtext('serviceType'),
-                [ ChildSummaryType.build(e) for e in element.find('children') ] if element.find('children') is not None else None,
+                ScheduleType.build(elements.get('schedule')),
+                _text(elements, 'serviceType'),
+                [ ChildSummaryType.build(e) for e in elements['children'] ] if 'children' in elements else None,
                 service_defs[0]
                )
 
@@ -851,6 +922,7 @@ class QuerySummaryResultCriteriaType(object):
 
 
 class NotificationBaseType(object):
+    __slots__ = ( 'connectionId', 'notificationId', 'timeStamp' )
     def __init__(self, connectionId, notificationId, timeStamp):
         self.connectionId = connectionId  # ConnectionIdType -> string
         self.notificationId = notificationId  # NotificationIdType -> long
@@ -858,10 +930,11 @@ class NotificationBaseType(object):
 
     @classmethod
     def build(self, element):
+        elements = _children(element)
         return NotificationBaseType(
-                element.findtext('connectionId'),
-                int(element.findtext('notificationId')),
-                element.findtext('timeStamp')
+                _text(elements, 'connectionId'),
+                int(_text(elements, 'notificationId')),
+                _text(elements, 'timeStamp')
                )
 
     def xml(self, elementName):
@@ -909,6 +982,49 @@ queryResultSync = ET.QName('http://schemas.ogf.org/nsi/2013/12/connection/types'
 queryRecursive = ET.QName('http://schemas.ogf.org/nsi/2013/12/connection/types', 'queryRecursive')
 querySummarySyncConfirmed = ET.QName('http://schemas.ogf.org/nsi/2013/12/connection/types', 'querySummarySyncConfirmed')
 reservation = ET.QName('http://schemas.ogf.org/nsi/2013/12/connection/types', 'reservation')
+additionalInfo = ET.QName('http://schemas.ogf.org/nsi/2013/12/framework/types', 'additionalInfo')
+
+
+# element tag -> type
+type_map = {
+    '{http://schemas.ogf.org/nsi/2013/12/connection/types}reserveCommitFailed' : GenericFailedType,
+    '{http://schemas.ogf.org/nsi/2013/12/connection/types}terminate' : GenericRequestType,
+    '{http://schemas.ogf.org/nsi/2013/12/connection/types}provisionConfirmed' : GenericConfirmedType,
+    '{http://schemas.ogf.org/nsi/2013/12/connection/types}provision' : GenericRequestType,
+    '{http://schemas.ogf.org/nsi/2013/12/framework/types}serviceException' : ServiceExceptionType, # does this even belong here?
+    '{http://schemas.ogf.org/nsi/2013/12/connection/types}serviceException' : ServiceExceptionType,
+    '{http://schemas.ogf.org/nsi/2013/12/connection/types}release' : GenericRequestType,
+    '{http://schemas.ogf.org/nsi/2013/12/connection/types}queryResult' : QueryResultType,
+    '{http://schemas.ogf.org/nsi/2013/12/connection/types}reserve' : ReserveType,
+    '{http://schemas.ogf.org/nsi/2013/12/connection/types}messageDeliveryTimeout' : MessageDeliveryTimeoutRequestType,
+    '{http://schemas.ogf.org/nsi/2013/12/connection/types}reserveAbortConfirmed' : GenericConfirmedType,
+    '{http://schemas.ogf.org/nsi/2013/12/connection/types}reserveResponse' : ReserveResponseType,
+    '{http://schemas.ogf.org/nsi/2013/12/connection/types}querySummarySync' : QueryType,
+    '{http://schemas.ogf.org/nsi/2013/12/connection/types}querySummary' : QueryType,
+    '{http://schemas.ogf.org/nsi/2013/12/connection/types}dataPlaneStateChange' : DataPlaneStateChangeRequestType,
+    '{http://schemas.ogf.org/nsi/2013/12/connection/types}queryNotification' : QueryNotificationType,
+    '{http://schemas.ogf.org/nsi/2013/12/connection/types}terminateConfirmed' : GenericConfirmedType,
+    '{http://schemas.ogf.org/nsi/2013/12/connection/types}error' : GenericErrorType,
+    '{http://schemas.ogf.org/nsi/2013/12/connection/types}reserveAbort' : GenericRequestType,
+    '{http://schemas.ogf.org/nsi/2013/12/connection/types}reserveFailed' : GenericFailedType,
+    '{http://schemas.ogf.org/nsi/2013/12/connection/types}reserveCommitConfirmed' : GenericConfirmedType,
+    '{http://schemas.ogf.org/nsi/2013/12/connection/types}reserveCommit' : GenericRequestType,
+    '{http://schemas.ogf.org/nsi/2013/12/connection/types}acknowledgment' : GenericAcknowledgmentType,
+    '{http://schemas.ogf.org/nsi/2013/12/connection/types}releaseConfirmed' : GenericConfirmedType,
+    '{http://schemas.ogf.org/nsi/2013/12/connection/types}reserveConfirmed' : ReserveConfirmedType,
+    '{http://schemas.ogf.org/nsi/2013/12/connection/types}queryNotificationSync' : QueryNotificationType,
+    '{http://schemas.ogf.org/nsi/2013/12/connection/types}queryNotificationSyncConfirmed' : QueryNotificationConfirmedType,
+    '{http://schemas.ogf.org/nsi/2013/12/connection/types}errorEvent' : ErrorEventType,
+    '{http://schemas.ogf.org/nsi/2013/12/connection/types}queryNotificationConfirmed' : QueryNotificationConfirmedType,
+    '{http://schemas.ogf.org/nsi/2013/12/connection/types}reserveTimeout' : ReserveTimeoutRequestType,
+    '{http://schemas.ogf.org/nsi/2013/12/connection/types}queryResultSync' : QueryResultType,
+    '{http://schemas.ogf.org/nsi/2013/12/connection/types}queryRecursive' : QueryType,
+    '{http://schemas.ogf.org/nsi/2013/12/connection/types}querySummarySyncConfirmed' : QuerySummaryConfirmedType,
+    '{http://schemas.ogf.org/nsi/2013/12/connection/types}querySummaryConfirmed' : QuerySummaryConfirmedType,
+    '{http://schemas.ogf.org/nsi/2013/12/connection/types}queryRecursiveConfirmed' : QueryRecursiveConfirmedType
+}
+
+
 
 def parse(input_):
 
@@ -919,44 +1035,6 @@ def parse(input_):
 
 def parseElement(element):
 
-    type_map = {
-        '{http://schemas.ogf.org/nsi/2013/12/connection/types}reserveCommitFailed' : GenericFailedType,
-        '{http://schemas.ogf.org/nsi/2013/12/connection/types}terminate' : GenericRequestType,
-        '{http://schemas.ogf.org/nsi/2013/12/connection/types}provisionConfirmed' : GenericConfirmedType,
-        '{http://schemas.ogf.org/nsi/2013/12/connection/types}provision' : GenericRequestType,
-        '{http://schemas.ogf.org/nsi/2013/12/framework/types}serviceException' : ServiceExceptionType, # does this even belong here?
-        '{http://schemas.ogf.org/nsi/2013/12/connection/types}serviceException' : ServiceExceptionType,
-        '{http://schemas.ogf.org/nsi/2013/12/connection/types}release' : GenericRequestType,
-        '{http://schemas.ogf.org/nsi/2013/12/connection/types}queryResult' : QueryResultType,
-        '{http://schemas.ogf.org/nsi/2013/12/connection/types}reserve' : ReserveType,
-        '{http://schemas.ogf.org/nsi/2013/12/connection/types}messageDeliveryTimeout' : MessageDeliveryTimeoutRequestType,
-        '{http://schemas.ogf.org/nsi/2013/12/connection/types}reserveAbortConfirmed' : GenericConfirmedType,
-        '{http://schemas.ogf.org/nsi/2013/12/connection/types}reserveResponse' : ReserveResponseType,
-        '{http://schemas.ogf.org/nsi/2013/12/connection/types}querySummarySync' : QueryType,
-        '{http://schemas.ogf.org/nsi/2013/12/connection/types}querySummary' : QueryType,
-        '{http://schemas.ogf.org/nsi/2013/12/connection/types}dataPlaneStateChange' : DataPlaneStateChangeRequestType,
-        '{http://schemas.ogf.org/nsi/2013/12/connection/types}queryNotification' : QueryNotificationType,
-        '{http://schemas.ogf.org/nsi/2013/12/connection/types}terminateConfirmed' : GenericConfirmedType,
-        '{http://schemas.ogf.org/nsi/2013/12/connection/types}error' : GenericErrorType,
-        '{http://schemas.ogf.org/nsi/2013/12/connection/types}reserveAbort' : GenericRequestType,
-        '{http://schemas.ogf.org/nsi/2013/12/connection/types}reserveFailed' : GenericFailedType,
-        '{http://schemas.ogf.org/nsi/2013/12/connection/types}reserveCommitConfirmed' : GenericConfirmedType,
-        '{http://schemas.ogf.org/nsi/2013/12/connection/types}reserveCommit' : GenericRequestType,
-        '{http://schemas.ogf.org/nsi/2013/12/connection/types}acknowledgment' : GenericAcknowledgmentType,
-        '{http://schemas.ogf.org/nsi/2013/12/connection/types}releaseConfirmed' : GenericConfirmedType,
-        '{http://schemas.ogf.org/nsi/2013/12/connection/types}reserveConfirmed' : ReserveConfirmedType,
-        '{http://schemas.ogf.org/nsi/2013/12/connection/types}queryNotificationSync' : QueryNotificationType,
-        '{http://schemas.ogf.org/nsi/2013/12/connection/types}queryNotificationSyncConfirmed' : QueryNotificationConfirmedType,
-        '{http://schemas.ogf.org/nsi/2013/12/connection/types}errorEvent' : ErrorEventType,
-        '{http://schemas.ogf.org/nsi/2013/12/connection/types}queryNotificationConfirmed' : QueryNotificationConfirmedType,
-        '{http://schemas.ogf.org/nsi/2013/12/connection/types}reserveTimeout' : ReserveTimeoutRequestType,
-        '{http://schemas.ogf.org/nsi/2013/12/connection/types}queryResultSync' : QueryResultType,
-        '{http://schemas.ogf.org/nsi/2013/12/connection/types}queryRecursive' : QueryType,
-        '{http://schemas.ogf.org/nsi/2013/12/connection/types}querySummarySyncConfirmed' : QuerySummaryConfirmedType,
-        '{http://schemas.ogf.org/nsi/2013/12/connection/types}querySummaryConfirmed' : QuerySummaryConfirmedType,
-        '{http://schemas.ogf.org/nsi/2013/12/connection/types}queryRecursiveConfirmed' : QueryRecursiveConfirmedType
-    }
-
     if not element.tag in type_map:
         raise ValueError('No type mapping for tag %s' % element.tag)
 
@@ -2,9 +2,26 @@
 
 from xml.etree import ElementTree as ET
 
+# parse helpers, a single pass over the child elements instead of find/findtext per field
+
+def _children(element):
+    # child elements by tag, the first one wins (like find)
+    elements = {}
+    for e in reversed(element):
+        elements[e.tag] = e
+    return elements
+
+
+def _text(elements, tag):
+    # same as findtext
+    e = elements.get(tag)
+    return None if e is None else e.text or ''
+
+
 # types
 
 class OrderedStpType(object):
+    __slots__ = ( 'order', 'stp' )
     def __init__(self, order, stp):
         self.order = order  # int
         self.stp = stp  # StpIdType -> string
@@ -23,6 +40,7 @@ class OrderedStpType(object):
 
 
 class TypeValueType(object):
+    __slots__ = ( 'type_', 'value' )
     def __init__(self, type_, value):
         self.type_ = type_
         self.value = value
@@ -41,6 +59,7 @@ class TypeValueType(object):
 
 
 class P2PServiceBaseType(object):
+    __slots__ = ( 'capacity', 'directionality', 'symmetricPath', 'sourceSTP', 'destSTP', 'ero', 'parameter' )
     def __init__(self, capacity, directionality, symmetricPath, sourceSTP, destSTP, ero, parameter):
         self.capacity = capacity  # long
         self.directionality = directionality  # DirectionalityType -> string
@@ -52,14 +71,15 @@ class P2PServiceBaseType(object):
 
     @classmethod
     def build(self, element):
+        elements = _children(element)
         return P2PServiceBaseType(
-                int(element.findtext('capacity')),
-                element.findtext('directionality'),
-                True if element.findtext('symmetricPath') == 'true' else False if element.find('symmetricPath') is not None else None,
-                element.findtext('sourceSTP'),
-                element.findtext('destSTP'),
-                [ OrderedStpType.build(e) for e in element.find('ero') ] if element.find('ero') is not None else None,
-                [ TypeValueType.build(e) for e in element.findall('parameter') ] if element.find('parameter') is not None else None
+                int(_text(elements, 'capacity')),
+                _text(elements, 'directionality'),
+                True if _text(elements, 'symmetricPath') == 'true' else False if 'symmetricPath' in elements else None,
+                _text(elements, 'sourceSTP'),
+                _text(elements, 'destSTP'),
+                [ OrderedStpType.build(e) for e in elements['ero'] ] if 'ero' in elements else None,
+                [ TypeValueType.build(e) for e in element.findall('parameter') ] if 'parameter' in elements else None
                )
 
     def xml(self, elementName):
@@ -84,6 +104,14 @@ p2ps        = ET.QName(POINT2POINT_NS, 'p2ps')
 capacity    = ET.QName(POINT2POINT_NS, 'capacity')
 parameter   = ET.QName(POINT2POINT_NS, 'parameter')
 
+# element tag -> type
+type_map = {
+    str(p2ps)       : P2PServiceBaseType,
+    str(parameter)  : TypeValueType
+}
+
+
+
 def parse(input_):
 
     root = ET.fromstring(input_)
@@ -93,11 +121,6 @@ def parse(input_):
 
 def parseElement(element):
 
-    type_map = {
-        str(p2ps)       : P2PServiceBaseType,
-        str(parameter)  : TypeValueType
-    }
-
     if not element.tag in type_map:
         raise ValueError('No type mapping for tag %s' % element.tag)
 
@@ -11,6 +11,7 @@ from twisted.python import log, failure
 
 from opennsa import constants as cnt, nsa, error
 from opennsa.protocols.shared import minisoap
+from opennsa.protocols.nsi2 import templates
 from opennsa.protocols.nsi2.bindings import nsiframework, nsiconnection
 
 
@@ -74,6 +75,10 @@ def createRequesterHeader(requester_nsa_urn, provider_nsa_urn, reply_to=None, co
 def _createGenericAcknowledgement(header, protocol_type=None):
 
     # we do not put reply to, security attributes or connection traces in the acknowledgement
+    payload = templates.genericAcknowledgement(protocol_type, header.requester_nsa, header.provider_nsa, header.correlation_id)
+    if payload is not None:
+        return payload
+
     soap_header_element = _createHeader(header.requester_nsa, header.provider_nsa, correlation_id=header.correlation_id, protocol_type=protocol_type)
 
     generic_confirm = nsiconnection.GenericAcknowledgmentType()
@@ -101,7 +106,7 @@ def createServiceException(err, provider_nsa, connection_id=None, service_type=N
         # use values from error
         variables = [ nsiframework.TypeValuePairType(variable, None, [ str(value) ]) for (variable, value) in err.variables ] if err.variables else None
         return nsiframework.ServiceExceptionType(err.nsaId or provider_nsa, err.connectionId or connection_id,
-                                                 service_type, err.errorId, err.message, variables, None)
+                                                 service_type, err.errorId, str(err), variables, None)
     else:
         log.msg('Got a non NSIError exception: %s : %s' % (err.__class__.__name__, str(err)), system=LOG_SYSTEM)
         log.msg('Cannot create detailed service exception, defaulting to NSI InternalServerError (00500)', system=LOG_SYSTEM)
@@ -126,9 +131,10 @@ def createException(service_exception, provider_nsa):
 
 
 
-def parseRequest(soap_data):
+def parseRequest(soap_data, max_size=None):
+    # max_size defaults to the maximum request size, use minisoap.MAX_REPLY_SIZE for replies/confirmations
 
-    headers, bodies = minisoap.parseSoapPayload(soap_data)
+    headers, bodies = minisoap.parseSoapPayload(soap_data, max_size)
 
     if headers is None:
         raise ValueError('No header specified in payload')
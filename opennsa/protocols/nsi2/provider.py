@@ -1,9 +1,11 @@
-from zope.interface import implements
+from zope.interface import implementer
 
 from twisted.python import log
 from twisted.internet import defer, error
 
+from opennsa import error as nsaerror
 from opennsa.interface import INSIRequester
+from opennsa.shared import cache
 
 
 LOG_SYSTEM = 'nsi2.Provider'
@@ -19,6 +21,8 @@ TERMINATE_RESPONSE      = 'terminate_response'
 QUERY_SUMMARY_RESPONSE  = 'query_summary_response'
 QUERY_RECURSIVE_RESPONSE = 'query_recursive_response'
 
+DEFAULT_NOTIFICATION_TTL = 3600 # seconds, entries for confirmations which never arrive are dropped after this
+
 
 
 def logError(err, message_type):
@@ -29,18 +33,27 @@ def logError(err, message_type):
 
 
 
+@implementer(INSIRequester)
 class Provider:
     # This is part of the provider side of the protocol, and usually sits on top of the aggregator
     # As it sits on top of the aggregator - which is a provider - it implements the Requester interface
     # So it is Provider, that implements the Requester interface. If this doesn't confuse you, continue reading
 
-    implements(INSIRequester)
-
-    def __init__(self, service_provider, provider_client):
+    def __init__(self, service_provider, provider_client, notification_ttl=None, clock=None):
 
         self.service_provider = service_provider
         self.provider_client  = provider_client
-        self.notifications = {}
+        # (connection_id / correlation_id, response type) -> nsi header / deferred
+        self.notifications = cache.ExpiringDict(notification_ttl or DEFAULT_NOTIFICATION_TTL, clock=clock,
+                                                name='provider.notifications', on_expire=self._notificationExpired)
+
+
+    def _notificationExpired(self, key, value):
+
+        id_, response_type = key
+        log.msg('No %s for %s within %i seconds, dropping notification entry' % (response_type, id_, self.notifications.ttl), system=LOG_SYSTEM)
+        if isinstance(value, defer.Deferred):
+            value.errback( nsaerror.CallbackTimeoutError('No %s for %s within %i seconds' % (response_type, id_, self.notifications.ttl)) )
 
 
     def reserve(self, nsi_header, connection_id, global_reservation_id, description, criteria, request_info):
@@ -9,33 +9,44 @@ Copyright: NORDUnet (2011-2013)
 
 from opennsa import constants as cnt
 from opennsa.shared import xmlhelper
-from opennsa.protocols.shared import minisoap, httpclient
-from opennsa.protocols.nsi2 import helper, queryhelper
+from opennsa.protocols.shared import minisoap, httpclient, offload
+from opennsa.protocols.nsi2 import helper, queryhelper, templates
 from opennsa.protocols.nsi2.bindings import actions, nsiconnection, p2pservices
 
 
 
 class ProviderClient:
 
-    def __init__(self, ctx_factory=None):
+    def __init__(self, ctx_factory=None, delivery_queue=None):
 
         self.ctx_factory = ctx_factory
+        self.delivery_queue = delivery_queue
+
+
+    def _send(self, url, action, payload):
+        # with a delivery queue, the deferred fires when the message is queued, not when it is delivered, and
+        # delivery errors are handled (retried) by the queue. without a queue, it fires when the message is delivered
+        if self.delivery_queue is not None:
+            return self.delivery_queue.send(url, action, payload)
+        return httpclient.soapRequest(url, action, payload, ctx_factory=self.ctx_factory)
 
 
     def _genericConfirm(self, element_name, requester_url, action, correlation_id, requester_nsa, provider_nsa, connection_id):
 
-        header_element = helper.createRequesterHeader(requester_nsa, provider_nsa, correlation_id=correlation_id)
+        payload = templates.genericConfirmed(cnt.CS2_REQUESTER, element_name, requester_nsa, provider_nsa, correlation_id, connection_id)
+        if payload is None:
+            header_element = helper.createRequesterHeader(requester_nsa, provider_nsa, correlation_id=correlation_id)
 
-        confirm = nsiconnection.GenericConfirmedType(connection_id)
-        body_element   = confirm.xml(element_name)
+            confirm = nsiconnection.GenericConfirmedType(connection_id)
+            body_element   = confirm.xml(element_name)
 
-        payload = minisoap.createSoapPayload(body_element, header_element)
+            payload = minisoap.createSoapPayload(body_element, header_element)
 
         def gotReply(data):
             # for now we just ignore this, as long as we get an okay
             return
 
-        d = httpclient.soapRequest(requester_url, action, payload, ctx_factory=self.ctx_factory)
+        d = self._send(requester_url, action, payload)
         d.addCallbacks(gotReply) #, errReply)
         return d
 
@@ -61,7 +72,7 @@ class ProviderClient:
             # for now we just ignore this, as long as we get an okay
             return
 
-        d = httpclient.soapRequest(requester_url, action, payload, ctx_factory=self.ctx_factory)
+        d = self._send(requester_url, action, payload)
         d.addCallbacks(gotReply) #, errReply)
         return d
 
@@ -91,7 +102,7 @@ class ProviderClient:
             # we don't really do anything about these
             return ""
 
-        d = httpclient.soapRequest(nsi_header.reply_to, actions.RESERVE_CONFIRMED, payload, ctx_factory=self.ctx_factory)
+        d = self._send(nsi_header.reply_to, actions.RESERVE_CONFIRMED, payload)
         d.addCallbacks(gotReply) #, errReply)
         return d
 
@@ -152,7 +163,7 @@ class ProviderClient:
 
         payload = minisoap.createSoapPayload(body_element, header_element)
 
-        d = httpclient.soapRequest(requester_url, actions.RESERVE_TIMEOUT, payload, ctx_factory=self.ctx_factory)
+        d = self._send(requester_url, actions.RESERVE_TIMEOUT, payload)
         return d
 
 
@@ -168,7 +179,7 @@ class ProviderClient:
 
         payload = minisoap.createSoapPayload(body_element, header_element)
 
-        d = httpclient.soapRequest(requester_url, actions.DATA_PLANE_STATE_CHANGE, payload, ctx_factory=self.ctx_factory)
+        d = self._send(requester_url, actions.DATA_PLANE_STATE_CHANGE, payload)
         return d
 
 
@@ -193,31 +204,37 @@ class ProviderClient:
 
         payload = minisoap.createSoapPayload(body_element, header_element)
 
-        d = httpclient.soapRequest(requester_url, actions.ERROR_EVENT, payload, ctx_factory=self.ctx_factory)
+        d = self._send(requester_url, actions.ERROR_EVENT, payload)
         return d
 
 
     def querySummaryConfirmed(self, requester_url, requester_nsa, provider_nsa, correlation_id, reservations):
 
-        header_element = helper.createRequesterHeader(requester_nsa, provider_nsa, correlation_id=correlation_id)
+        def createPayload(reservations):
+            header_element = helper.createRequesterHeader(requester_nsa, provider_nsa, correlation_id=correlation_id)
+
+            qs_reservations = queryhelper.buildQuerySummaryResultType(reservations)
+            qsct = nsiconnection.QuerySummaryConfirmedType(qs_reservations)
 
-        qs_reservations = queryhelper.buildQuerySummaryResultType(reservations)
-        qsct = nsiconnection.QuerySummaryConfirmedType(qs_reservations)
+            return minisoap.createSoapPayload(qsct.xml(nsiconnection.querySummaryConfirmed), header_element)
 
-        payload = minisoap.createSoapPayload(qsct.xml(nsiconnection.querySummaryConfirmed), header_element)
-        d = httpclient.soapRequest(requester_url, actions.QUERY_SUMMARY_CONFIRMED, payload, ctx_factory=self.ctx_factory)
+        d = offload.encodeResults(createPayload, reservations)
+        d.addCallback(lambda payload : self._send(requester_url, actions.QUERY_SUMMARY_CONFIRMED, payload))
         return d
 
 
     def queryRecursiveConfirmed(self, requester_url, requester_nsa, provider_nsa, correlation_id, reservations):
 
-        header_element = helper.createRequesterHeader(requester_nsa, provider_nsa, correlation_id=correlation_id)
+        def createPayload(reservations):
+            header_element = helper.createRequesterHeader(requester_nsa, provider_nsa, correlation_id=correlation_id)
+
+            qr_reservations = queryhelper.buildQueryRecursiveResultType(reservations)
+            qrct = nsiconnection.QueryRecursiveConfirmedType(qr_reservations)
 
-        qr_reservations = queryhelper.buildQueryRecursiveResultType(reservations)
-        qrct = nsiconnection.QueryRecursiveConfirmedType(qr_reservations)
+            return minisoap.createSoapPayload(qrct.xml(nsiconnection.queryRecursiveConfirmed), header_element)
 
-        payload = minisoap.createSoapPayload(qrct.xml(nsiconnection.queryRecursiveConfirmed), header_element)
-        d = httpclient.soapRequest(requester_url, actions.QUERY_RECURSIVE_CONFIRMED, payload, ctx_factory=self.ctx_factory)
+        d = offload.encodeResults(createPayload, reservations)
+        d.addCallback(lambda payload : self._send(requester_url, actions.QUERY_RECURSIVE_CONFIRMED, payload))
         return d
 
 
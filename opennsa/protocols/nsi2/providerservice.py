@@ -13,7 +13,7 @@ from twisted.python import log, failure
 
 from opennsa import nsa, error
 from opennsa.shared import xmlhelper
-from opennsa.protocols.shared import minisoap, soapresource
+from opennsa.protocols.shared import minisoap, soapresource, offload
 from opennsa.protocols.nsi2 import helper, queryhelper
 from opennsa.protocols.nsi2.bindings import actions, nsiconnection, p2pservices
 
@@ -25,9 +25,10 @@ LOG_SYSTEM = 'NSI2.ProviderService'
 
 class ProviderService:
 
-    def __init__(self, soap_resource, provider):
+    def __init__(self, soap_resource, provider, provider_nsa=None):
 
         self.provider = provider
+        self.provider_nsa = provider_nsa
 
         soap_resource.registerDecoder(actions.RESERVE,          self.reserve)
         soap_resource.registerDecoder(actions.RESERVE_COMMIT,   self.reserveCommit)
@@ -43,6 +44,9 @@ class ProviderService:
 
         # Some actions still missing
 
+        # rejected requests (rate limiting) are not parsed, so the service exception is from this nsa
+        soap_resource.registerFaultEncoder(lambda err : self._createSOAPFault(failure.Failure(err), self.provider_nsa))
+
 
     def _createSOAPFault(self, err, provider_nsa, connection_id=None, service_type=None):
 
@@ -181,8 +185,7 @@ class ProviderService:
 
     def querySummarySync(self, soap_data, request_info):
 
-        def gotReservations(reservations, header):
-            # do reply inline
+        def createPayload(reservations, header):
             soap_header_element = helper.createProviderHeader(header.requester_nsa, header.provider_nsa, correlation_id=header.correlation_id)
 
             qs_reservations = queryhelper.buildQuerySummaryResultType(reservations)
@@ -192,6 +195,10 @@ class ProviderService:
             payload = minisoap.createSoapPayload(qsct.xml(nsiconnection.querySummarySyncConfirmed), soap_header_element)
             return payload
 
+        def gotReservations(reservations, header):
+            # do reply inline
+            return offload.encodeResults(createPayload, reservations, header)
+
         header, query = helper.parseRequest(soap_data)
         d = self.provider.querySummarySync(header, query.connectionId, query.globalReservationId, request_info)
         d.addCallbacks(gotReservations, self._createSOAPFault, callbackArgs=(header,), errbackArgs=(header.provider_nsa,))
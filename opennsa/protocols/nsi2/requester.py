@@ -1,15 +1,17 @@
-from zope.interface import implements
+from zope.interface import implementer
 
 from twisted.python import log, failure
-from twisted.internet import reactor, defer
+from twisted.internet import defer
 
-from opennsa import error
+from opennsa import error, logging, metrics
 from opennsa.interface import INSIProvider
+from opennsa.shared import timerwheel
 
 
 LOG_SYSTEM = 'nsi2.Requester'
 
 DEFAULT_CALLBACK_TIMEOUT = 60 # 1 minute
+MAX_PENDING_NOTIFICATIONS = 1000 # notifications not consumed, oldest are dropped beyond this
 
 RESERVE         = 'reserve'
 RESERVE_COMMIT  = 'reserve_commit'
@@ -18,21 +20,34 @@ RELEASE         = 'release'
 TERMINATE       = 'terminate'
 QUERY_RECURSIVE = 'query_recursive'
 
+# callback timeouts for all requesters, timeouts are not exact so a resolution of a second is fine
+callback_timeouts = timerwheel.TimerWheel(resolution=1)
 
 
+
+@implementer(INSIProvider)
 class Requester:
 
     # In OpenNSA the requester is something that acts as a provider :-)
-    implements(INSIProvider)
-
-    def __init__(self, requester_client, callback_timeout=None):
+    def __init__(self, requester_client, callback_timeout=None, timeout_wheel=None):
 
         self.requester_client = requester_client
 
         self.callback_timeout = callback_timeout or DEFAULT_CALLBACK_TIMEOUT
+        self.timeout_wheel = timeout_wheel if timeout_wheel is not None else callback_timeouts
         self.calls = {}
         self.notifications = defer.DeferredQueue()
 
+        metrics.gauge('requester.outstanding_calls', self.outstandingCalls)
+
+
+    def outstandingCalls(self):
+        # provider nsa -> number of calls waiting for a callback
+        counts = {}
+        for provider_nsa, _ in self.calls:
+            counts[provider_nsa] = counts.get(provider_nsa, 0) + 1
+        return counts
+
 
     def addCall(self, provider_nsa, correlation_id, action):
 
@@ -40,13 +55,14 @@ class Requester:
         assert key not in self.calls, 'Cannot have multiple calls with same NSA / correlationId'
 
         d = defer.Deferred()
-        call = reactor.callLater(self.callback_timeout, self.callbackTimeout, provider_nsa, correlation_id, action)
-        self.calls[key] = (action, d, call)
+        timeout = self.timeout_wheel.add(self.callback_timeout, self.callbackTimeout, provider_nsa, correlation_id, action)
+        self.calls[key] = (action, d, timeout)
         return d
 
 
     def callbackTimeout(self, provider_nsa, correlation_id, action):
 
+        metrics.counter('requester.callback_timeouts').increment()
         err = error.CallbackTimeoutError('Callback for call %s/%s from %s timed out.' % (correlation_id, action, provider_nsa))
         self.triggerCall(provider_nsa, correlation_id, action, err)
 
@@ -60,12 +76,11 @@ class Requester:
             log.msg('Got callback for unknown call. Action: %s. NSA: %s' % (action, provider_nsa), system=LOG_SYSTEM)
             return
 
-        ract, d, call = acd
+        ract, d, timeout = acd
         assert ract == action, "Mismatching actions for corrolation id %s. Expected: %s. Received: %s" % (correlation_id, ract, action)
 
-        # cancel the timeout call if it is still scheduled
-        if call.active():
-            call.cancel()
+        # cancel the timeout if it is still pending
+        self.timeout_wheel.cancel(timeout)
 
         if isinstance(result, BaseException) or isinstance(result, failure.Failure):
             d.errback(result)
@@ -77,7 +92,7 @@ class Requester:
 
         def reserveRequestFailed(err):
             # invocation failed, so we error out immediately
-            log.msg('Reserve invocation failed: %s' % err.getErrorMessage(), debug=True, system=LOG_SYSTEM)
+            logging.debug('Reserve invocation failed: %s', err.getErrorMessage(), system=LOG_SYSTEM)
             self.triggerCall(header.provider_nsa, header.correlation_id, RESERVE, err.value)
 
         rd = self.addCall(header.provider_nsa, header.correlation_id, RESERVE)
@@ -101,7 +116,7 @@ class Requester:
 
         def reserveCommitFailed(err):
             # invocation failed, so we error out immediately
-            log.msg('ReserveCommit invocation failed: %s' % err.getErrorMessage(), debug=True, system=LOG_SYSTEM)
+            logging.debug('ReserveCommit invocation failed: %s', err.getErrorMessage(), system=LOG_SYSTEM)
             self.triggerCall(header.provider_nsa, header.correlation_id, RESERVE_COMMIT, err.value)
 
         rd = self.addCall(header.provider_nsa, header.correlation_id, RESERVE_COMMIT)
@@ -219,26 +234,35 @@ class Requester:
         self.triggerCall(header.provider_nsa, header.correlation_id, QUERY_RECURSIVE, err)
 
 
+    def _notify(self, notification):
+
+        # nothing may be consuming notifications, so only keep the latest ones
+        if len(self.notifications.pending) >= MAX_PENDING_NOTIFICATIONS:
+            self.notifications.pending.pop(0)
+            metrics.counter('requester.notifications_dropped').increment()
+        self.notifications.put(notification)
+
+
     def error(self, header, nsa_id, connection_id, service_type, error_id, text, variables, child_ex):
 
         se = (nsa_id, connection_id, service_type, error_id, text, variables, child_ex)
-        return self.notifications.put( ('error', header, se) )
+        return self._notify( ('error', header, se) )
 
 
     def errorEvent(self, header, connection_id, notification_id, timestamp, event, info, service_ex):
 
         data = (connection_id, notification_id, timestamp, event, info, service_ex)
-        return self.notifications.put( ('errorEvent', header, data) )
+        return self._notify( ('errorEvent', header, data) )
 
 
     def dataPlaneStateChange(self, header, connection_id, notification_id, timestamp, data_plane_status):
 
         data = (connection_id, notification_id, timestamp, data_plane_status)
-        return self.notifications.put( ('dataPlaneStateChange', header, data) )
+        return self._notify( ('dataPlaneStateChange', header, data) )
 
 
     def reserveTimeout(self, header, connection_id, notification_id, timestamp, timeout_value, org_connection_id, org_nsa):
 
         data = (connection_id, notification_id, timestamp, timeout_value, org_connection_id, org_nsa)
-        return self.notifications.put( ('reserveTimeout', header, data) )
+        return self._notify( ('reserveTimeout', header, data) )
 
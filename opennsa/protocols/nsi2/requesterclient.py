@@ -8,7 +8,7 @@ Author: Henrik Thostrup Jensen <htj@nordu.net>
 Copyright: NORDUnet (2011)
 """
 
-from zope.interface import implements
+from zope.interface import implementer
 
 from twisted.python import log, failure
 from twisted.web.error import Error as WebError
@@ -17,7 +17,7 @@ from twisted.internet.error import ConnectionRefusedError
 from opennsa.interface import INSIProvider
 from opennsa import nsa, error
 from opennsa.shared.xmlhelper import UTC
-from opennsa.protocols.shared import minisoap, httpclient
+from opennsa.protocols.shared import minisoap, httpclient, offload
 from opennsa.protocols.nsi2 import helper, queryhelper
 from opennsa.protocols.nsi2.bindings import actions, nsiconnection, p2pservices
 
@@ -26,10 +26,9 @@ LOG_SYSTEM  = 'nsi2.RequesterClient'
 
 
 
+@implementer(INSIProvider)
 class RequesterClient:
 
-    implements(INSIProvider)
-
     def __init__(self, service_url, reply_to, ctx_factory=None, authz_header=None):
 
         assert type(service_url) in (str,bytes), 'Service URL must be of type string or bytes'
@@ -69,7 +68,7 @@ class RequesterClient:
                 # cannot handle it here
                 return err
 
-        if err.value.status != '500':
+        if err.value.status != b'500':
             log.msg("Got error with non-500 status. Message: %s" % err.getErrorMessage(), system=LOG_SYSTEM)
             return err
 
@@ -131,7 +130,7 @@ class RequesterClient:
         payload = minisoap.createSoapPayload(body_payload, header_element)
 
         def _handleAck(soap_data):
-            header, ack = helper.parseRequest(soap_data)
+            header, ack = helper.parseRequest(soap_data, minisoap.MAX_REPLY_SIZE)
             return ack.connectionId
 
         d = httpclient.soapRequest(self.service_url, actions.RESERVE, payload, ctx_factory=self.ctx_factory, headers=self.http_headers)
@@ -211,10 +210,13 @@ class RequesterClient:
 
     def querySummarySync(self, header, connection_ids=None, global_reservation_ids=None, request_info=None):
 
-        def gotReply(soap_data):
-            header, query_confirmed = helper.parseRequest(soap_data)
+        def parseReply(soap_data):
+            header, query_confirmed = helper.parseRequest(soap_data, minisoap.MAX_REPLY_SIZE)
             return [ queryhelper.buildQueryResult(resv, header.provider_nsa) for resv in query_confirmed.reservations ]
 
+        def gotReply(soap_data):
+            return offload.decode(parseReply, soap_data)
+
         # don't need to check header here
         header_element = helper.convertProviderHeader(header, self.reply_to)
 
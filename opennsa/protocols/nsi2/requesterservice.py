@@ -7,6 +7,7 @@ Copyright: NORDUnet (2011)
 
 from opennsa import nsa
 from opennsa.shared import xmlhelper
+from opennsa.protocols.shared import minisoap, offload
 from opennsa.protocols.nsi2 import helper, queryhelper
 from opennsa.protocols.nsi2.bindings import actions, p2pservices
 
@@ -50,7 +51,7 @@ class RequesterService:
 
     def _parseGenericFailure(self, soap_data):
 
-        header, generic_failure = helper.parseRequest(soap_data)
+        header, generic_failure = helper.parseRequest(soap_data, minisoap.MAX_REPLY_SIZE)
 
         rc = generic_failure.connectionStates
         rd = rc.dataPlaneStatus
@@ -64,7 +65,7 @@ class RequesterService:
 
     def reserveConfirmed(self, soap_data, request_info):
 
-        header, reservation = helper.parseRequest(soap_data)
+        header, reservation = helper.parseRequest(soap_data, minisoap.MAX_REPLY_SIZE)
 
         criteria = reservation.criteria
 
@@ -101,7 +102,7 @@ class RequesterService:
 
 
     def reserveCommitConfirmed(self, soap_data, request_info):
-        header, generic_confirm = helper.parseRequest(soap_data)
+        header, generic_confirm = helper.parseRequest(soap_data, minisoap.MAX_REPLY_SIZE)
         self.requester.reserveCommitConfirmed(header, generic_confirm.connectionId)
         return helper.createGenericRequesterAcknowledgement(header)
 
@@ -113,25 +114,25 @@ class RequesterService:
 
 
     def reserveAbortConfirmed(self, soap_data, request_info):
-        header, generic_confirm = helper.parseRequest(soap_data)
+        header, generic_confirm = helper.parseRequest(soap_data, minisoap.MAX_REPLY_SIZE)
         self.requester.reserveAbortConfirmed(header, generic_confirm.connectionId)
         return helper.createGenericRequesterAcknowledgement(header)
 
 
     def provisionConfirmed(self, soap_data, request_info):
-        header, generic_confirm = helper.parseRequest(soap_data)
+        header, generic_confirm = helper.parseRequest(soap_data, minisoap.MAX_REPLY_SIZE)
         self.requester.provisionConfirmed(header, generic_confirm.connectionId)
         return helper.createGenericRequesterAcknowledgement(header)
 
 
     def releaseConfirmed(self, soap_data, request_info):
-        header, generic_confirm = helper.parseRequest(soap_data)
+        header, generic_confirm = helper.parseRequest(soap_data, minisoap.MAX_REPLY_SIZE)
         self.requester.releaseConfirmed(header, generic_confirm.connectionId)
         return helper.createGenericRequesterAcknowledgement(header)
 
 
     def terminateConfirmed(self, soap_data, request_info):
-        header, generic_confirm = helper.parseRequest(soap_data)
+        header, generic_confirm = helper.parseRequest(soap_data, minisoap.MAX_REPLY_SIZE)
         self.requester.terminateConfirmed(header, generic_confirm.connectionId)
         return helper.createGenericRequesterAcknowledgement(header)
 
@@ -142,31 +143,40 @@ class RequesterService:
         return helper.createGenericRequesterAcknowledgement(header)
 
 
-    def querySummaryConfirmed(self, soap_data, request_info):
+    def _parseQueryResult(self, soap_data, include_children=False):
 
-        header, query_result = helper.parseRequest(soap_data)
+        header, query_result = helper.parseRequest(soap_data, minisoap.MAX_REPLY_SIZE)
+        reservations = [ queryhelper.buildQueryResult(res, header.provider_nsa, include_children=include_children) for res in query_result.reservations ]
+        return header, reservations
 
-        reservations = [ queryhelper.buildQueryResult(res, header.provider_nsa) for res in query_result.reservations ]
 
-        self.requester.querySummaryConfirmed(header, reservations)
+    def querySummaryConfirmed(self, soap_data, request_info):
 
-        return helper.createGenericRequesterAcknowledgement(header)
+        def gotResult(result):
+            header, reservations = result
+            self.requester.querySummaryConfirmed(header, reservations)
+            return helper.createGenericRequesterAcknowledgement(header)
 
+        d = offload.decode(self._parseQueryResult, soap_data)
+        d.addCallback(gotResult)
+        return d
 
-    def queryRecursiveConfirmed(self, soap_data, request_info):
 
-        header, query_result = helper.parseRequest(soap_data)
-
-        reservations = [ queryhelper.buildQueryResult(res, header.provider_nsa, include_children=True) for res in query_result.reservations ]
+    def queryRecursiveConfirmed(self, soap_data, request_info):
 
-        self.requester.queryRecursiveConfirmed(header, reservations)
+        def gotResult(result):
+            header, reservations = result
+            self.requester.queryRecursiveConfirmed(header, reservations)
+            return helper.createGenericRequesterAcknowledgement(header)
 
-        return helper.createGenericRequesterAcknowledgement(header)
+        d = offload.decode(self._parseQueryResult, soap_data, include_children=True)
+        d.addCallback(gotResult)
+        return d
 
 
     def error(self, soap_data, request_info):
 
-        header, error = helper.parseRequest(soap_data)
+        header, error = helper.parseRequest(soap_data, minisoap.MAX_REPLY_SIZE)
         se = error.serviceException
         # service exception fields, we are not quite there yet...
         # nsaId  # NsaIdType -> anyURI
@@ -186,7 +196,7 @@ class RequesterService:
 
     def errorEvent(self, soap_data, request_info):
 
-        header, error_event = helper.parseRequest(soap_data)
+        header, error_event = helper.parseRequest(soap_data, minisoap.MAX_REPLY_SIZE)
 
         #connection_id, notification_id, timestamp, event, info, service_ex = 
         ee = error_event
@@ -204,7 +214,7 @@ class RequesterService:
 
     def dataPlaneStateChange(self, soap_data, request_info):
 
-        header, data_plane_state_change = helper.parseRequest(soap_data)
+        header, data_plane_state_change = helper.parseRequest(soap_data, minisoap.MAX_REPLY_SIZE)
 
         dpsc = data_plane_state_change
         dps = dpsc.dataPlaneStatus
@@ -216,7 +226,7 @@ class RequesterService:
 
     def reserveTimeout(self, soap_data, request_info):
 
-        header, reserve_timeout = helper.parseRequest(soap_data)
+        header, reserve_timeout = helper.parseRequest(soap_data, minisoap.MAX_REPLY_SIZE)
 
         rt = reserve_timeout
         timestamp = xmlhelper.parseXMLTimestamp(rt.timeStamp)
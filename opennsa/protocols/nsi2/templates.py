@@ -0,0 +1,105 @@
+"""
+Payload templates for fixed-shape NSI messages.
+
+Generic acknowledgements and confirmations (provisionConfirmed,
+releaseConfirmed, etc.) only differ in a few values (correlation id, nsa ids,
+connection id). Instead of building and serializing element trees for each
+message, a template is created once with the bindings, using marker values,
+and the escaped values are filled into it. The result is byte-identical to
+what the bindings produce.
+
+Templates are only used for compact payloads, and when all values are
+non-empty strings, as the bindings serialize empty elements differently.
+Otherwise None is returned, and the caller should use the bindings.
+
+Author: Henrik Thostrup Jensen <htj@nordu.net>
+Copyright: NORDUnet (2017)
+"""
+
+from opennsa.protocols.shared import minisoap
+from opennsa.protocols.nsi2.bindings import nsiframework, nsiconnection
+
+
+# markers are filled into the template payloads, so they must not contain characters needing escaping
+CORRELATION_ID  = b'@@correlationId@@'
+REQUESTER_NSA   = b'@@requesterNSA@@'
+PROVIDER_NSA    = b'@@providerNSA@@'
+CONNECTION_ID   = b'@@connectionId@@'
+
+_templates = {} # key -> PayloadTemplate
+
+
+
+def _escape(value):
+    # same escaping as ElementTree does for element text
+    return value.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;').encode('utf-8')
+
+
+
+class PayloadTemplate(object):
+
+    def __init__(self, payload, markers):
+        # split the payload into constant parts and markers, in the order they occur
+        self.parts = [] # bytes or marker
+        while True:
+            positions = [ (payload.find(m), m) for m in markers if m in payload ]
+            if not positions:
+                break
+            idx, marker = min(positions)
+            self.parts.append(payload[:idx])
+            self.parts.append(marker)
+            payload = payload[idx+len(marker):]
+        self.parts.append(payload)
+        self.markers = set(markers)
+
+
+    def fill(self, values):
+        """
+        Fill in values (marker -> string) into the template.
+        """
+        escaped = dict( [ (m, _escape(v)) for m, v in values.items() ] )
+        return b''.join( [ escaped[p] if p in self.markers else p for p in self.parts ] )
+
+
+
+def _createHeaderElement(protocol_type, correlation_id, requester_nsa, provider_nsa):
+    # same as helper._createHeader with no reply to, security attributes, or connection trace
+    header = nsiframework.CommonHeaderType(protocol_type, correlation_id, requester_nsa, provider_nsa, None, [], None)
+    return header.xml(nsiframework.nsiHeader)
+
+
+def _getTemplate(key, create_body):
+    try:
+        return _templates[key]
+    except KeyError:
+        protocol_type = key[0]
+        header_element = _createHeaderElement(protocol_type, CORRELATION_ID.decode(), REQUESTER_NSA.decode(), PROVIDER_NSA.decode())
+        payload = minisoap.createSoapPayload(create_body(), header_element, pretty_print=False)
+        template = PayloadTemplate(payload, [ CORRELATION_ID, REQUESTER_NSA, PROVIDER_NSA, CONNECTION_ID ] )
+        _templates[key] = template
+        return template
+
+
+def _usable(*values):
+    return not minisoap.PRETTY_PRINT and all( [ type(v) is str and v for v in values ] )
+
+
+
+def genericAcknowledgement(protocol_type, requester_nsa, provider_nsa, correlation_id):
+
+    if not _usable(requester_nsa, provider_nsa, correlation_id):
+        return None
+
+    template = _getTemplate( (protocol_type, 'acknowledgment'),
+                             lambda : nsiconnection.GenericAcknowledgmentType().xml(nsiconnection.acknowledgment) )
+    return template.fill( { CORRELATION_ID : correlation_id, REQUESTER_NSA : requester_nsa, PROVIDER_NSA : provider_nsa } )
+
+
+def genericConfirmed(protocol_type, element_name, requester_nsa, provider_nsa, correlation_id, connection_id):
+
+    if not _usable(requester_nsa, provider_nsa, correlation_id, connection_id):
+        return None
+
+    template = _getTemplate( (protocol_type, element_name),
+                             lambda : nsiconnection.GenericConfirmedType(CONNECTION_ID.decode()).xml(element_name) )
+    return template.fill( { CORRELATION_ID : correlation_id, REQUESTER_NSA : requester_nsa, PROVIDER_NSA : provider_nsa, CONNECTION_ID : connection_id } )
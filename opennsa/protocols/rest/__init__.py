@@ -4,9 +4,9 @@ from . import resource
 CONNECTIONS = 'connections'
 PATH = '/' + CONNECTIONS
 
-def setupService(provider, top_resource, allowed_hosts=None):
+def setupService(provider, top_resource, allowed_hosts=None, limiter=None):
 
-    r = resource.P2PBaseResource(provider, PATH, allowed_hosts)
+    r = resource.P2PBaseResource(provider, PATH, allowed_hosts, limiter)
 
     top_resource.putChild(CONNECTIONS, r)
 
@@ -14,7 +14,7 @@ from twisted.web import resource, server
 
 from opennsa import nsa, error, state, constants as cnt, database
 from opennsa.shared import xmlhelper
-from opennsa.protocols.shared import requestauthz
+from opennsa.protocols.shared import requestauthz, ratelimit
 from opennsa.protocols.nsi2 import helper
 
 
@@ -105,17 +105,23 @@ class P2PBaseResource(resource.Resource):
     """
     Resource for creating connections. Also creates sub-resources for connections.
     """
-    def __init__(self, provider, base_path, allowed_hosts=None):
+    def __init__(self, provider, base_path, allowed_hosts=None, limiter=None):
         resource.Resource.__init__(self)
         self.provider = provider
         self.base_path = base_path
         self.allowed_hosts = allowed_hosts
+        self.limiter = limiter
 
 
     def getChild(self, path, request):
         return P2PConnectionResource(self.provider, path, self.allowed_hosts)
 
 
+    def _releaseRequest(self, result, requester_key):
+        self.limiter.release(requester_key)
+        return result
+
+
     def render_GET(self, request):
         # this should return a list of authZed connections with some usefull information
         # we cannot really do any meaningfull authz at the moment though...
@@ -212,7 +218,16 @@ class P2PBaseResource(resource.Resource):
 
             header = nsa.NSIHeader('rest-dud-requester', 'rest-dud-provider') # completely bogus header
 
+            if self.limiter is not None:
+                requester_key = ratelimit.requesterKey(request, request_info)
+                err = self.limiter.acquire(requester_key)
+                if err is not None:
+                    payload = str(err) + RN
+                    return _requestResponse(request, 429, payload, { 'Retry-After' : str(err.retry_after) }) # Too Many Requests
+
             d = self.provider.reserve(header, None, None, None, criteria, request_info) # nones are connection_id, global resv id, description
+            if self.limiter is not None:
+                d.addBoth(self._releaseRequest, requester_key)
             d.addCallbacks(createResponse, _createErrorResponse, errbackArgs=(request,))
 
             if auto_commit:
@@ -0,0 +1,210 @@
+"""
+Outbound delivery queue for SOAP messages (confirmations and notifications).
+
+Messages are queued per destination URL, and each queue is drained with a
+bounded number of requests in flight, reusing the pooled HTTP connection to
+the requester. If delivery fails due to the requester being unreachable or
+overloaded, the queue for that URL is paused with exponential backoff, and
+the message is retried. SOAP faults and other definite errors are not
+retried.
+
+If persistent, messages are also stored in the database until delivered or
+given up on, so queued messages survive restarts. Storing is best effort: the
+message is queued in memory first, and if it cannot be stored (database down),
+it is still delivered, but not kept across restarts.
+
+Author: Henrik Thostrup Jensen <htj@nordu.net>
+Copyright: NORDUnet (2017)
+"""
+
+import collections
+import datetime
+
+from twisted.python import log
+from twisted.internet import defer
+from twisted.application import service
+from twisted.web.error import Error as WebError
+
+from opennsa import database, metrics
+from opennsa.protocols.shared import httpclient
+
+
+LOG_SYSTEM = 'DeliveryQueue'
+
+RETRY_STATUSES = ( b'502', b'503', b'504' ) # http statuses indicating the requester is temporarily unavailable
+
+
+
+class _Message(object):
+
+    def __init__(self, url, action, payload, queued, attempts=0, db_message=None):
+        self.url        = url
+        self.action     = action
+        self.payload    = payload
+        self.queued     = queued # reactor time, for latency
+        self.attempts   = attempts
+        self.db_message = db_message
+        self.done       = False # delivered or given up on
+
+
+
+def _retryable(err):
+    if err.check(WebError):
+        return err.value.status in RETRY_STATUSES
+    if err.check(httpclient.HTTPRequestError):
+        return False
+    return True # connection refused, timeout, etc.
+
+
+
+class DeliveryQueue(service.Service):
+
+    MAX_IN_FLIGHT   = 4     # per url
+    MAX_ATTEMPTS    = 12
+    RETRY_DELAY     = 2     # seconds, doubled on every attempt
+    MAX_RETRY_DELAY = 600   # seconds
+
+    def __init__(self, ctx_factory=None, persistent=True, clock=None):
+        if clock is None:
+            from twisted.internet import reactor
+            clock = reactor
+        self.ctx_factory = ctx_factory
+        self.persistent  = persistent
+        self.clock       = clock
+
+        self.queues      = {} # url -> deque of messages
+        self.in_flight   = {} # url -> number of requests in flight
+        self.retry_calls = {} # url -> delayed call, for urls backing off
+
+        metrics.gauge('delivery.queue_depth', self.queueDepth)
+
+
+    def startService(self):
+        service.Service.startService(self)
+        if self.persistent:
+            return self._loadMessages()
+
+
+    def stopService(self):
+        service.Service.stopService(self)
+        for call in self.retry_calls.values():
+            call.cancel()
+        self.retry_calls = {}
+
+
+    def queueDepth(self):
+        return sum( [ len(q) for q in self.queues.values() ] ) + sum(self.in_flight.values())
+
+
+    @defer.inlineCallbacks
+    def _loadMessages(self):
+        db_messages = yield database.OutboundMessage.find(orderby='id')
+        now = self.clock.seconds()
+        for dbm in db_messages:
+            message = _Message(dbm.url, dbm.action, dbm.payload, now, dbm.attempts, dbm)
+            self.queues.setdefault(dbm.url, collections.deque()).append(message)
+
+        log.msg('Loaded %i queued messages for %i requesters' % (len(db_messages), len(self.queues)), system=LOG_SYSTEM)
+        for url in list(self.queues):
+            self._process(url)
+
+
+    def send(self, url, action, payload):
+        """
+        Queue a message for delivery. The returned deferred fires when the
+        message has been queued, not when it has been delivered. Delivery
+        errors are retried by the queue, and are not reported to the caller.
+        """
+        message = _Message(url, action, payload, self.clock.seconds())
+        self.queues.setdefault(url, collections.deque()).append(message)
+        if self.persistent:
+            self._storeMessage(message)
+        self._process(url)
+        return defer.succeed(None)
+
+
+    def _saveMessage(self, message):
+        payload = message.payload
+        if type(payload) is bytes:
+            payload = payload.decode('utf-8')
+        dbm = database.OutboundMessage(url=message.url, action=message.action, payload=payload, attempts=message.attempts, created=datetime.datetime.utcnow())
+        return dbm.save()
+
+
+    def _storeMessage(self, message):
+        # store in the background, a database error must not stop delivery
+
+        def stored(dbm):
+            if message.done:
+                return dbm.delete() # finished while being stored
+            message.db_message = dbm
+
+        def storeFailed(err):
+            log.msg('Could not store %s message to %s, it will not survive a restart: %s' % (message.action, message.url, err.getErrorMessage()), system=LOG_SYSTEM)
+            metrics.counter('delivery.store_failed').increment()
+
+        d = self._saveMessage(message)
+        d.addCallbacks(stored, storeFailed)
+        d.addErrback(log.err, system=LOG_SYSTEM)
+
+
+    def _sendRequest(self, message):
+        return httpclient.soapRequest(message.url, message.action, message.payload, ctx_factory=self.ctx_factory)
+
+
+    def _process(self, url):
+        queue = self.queues.get(url)
+        while queue and self.in_flight.get(url, 0) < self.MAX_IN_FLIGHT and not url in self.retry_calls:
+            message = queue.popleft()
+            self.in_flight[url] = self.in_flight.get(url, 0) + 1
+            d = self._sendRequest(message)
+            d.addCallbacks(self._delivered, self._deliveryFailed, callbackArgs=(message,), errbackArgs=(message,))
+            d.addErrback(log.err, system=LOG_SYSTEM)
+
+        if not queue and not self.in_flight.get(url):
+            self.queues.pop(url, None)
+            self.in_flight.pop(url, None)
+
+
+    def _delivered(self, _, message):
+        self.in_flight[message.url] -= 1
+        metrics.counter('delivery.delivered').increment()
+        metrics.sample('delivery.latency').add(self.clock.seconds() - message.queued)
+        self._removeMessage(message)
+        self._process(message.url)
+
+
+    def _deliveryFailed(self, err, message):
+        url = message.url
+        self.in_flight[url] -= 1
+        message.attempts += 1
+
+        if not _retryable(err) or message.attempts >= self.MAX_ATTEMPTS:
+            log.msg('Giving up delivering %s to %s after %i attempt(s): %s' % (message.action, url, message.attempts, err.getErrorMessage()), system=LOG_SYSTEM)
+            metrics.counter('delivery.dropped').increment()
+            self._removeMessage(message)
+            self._process(url)
+            return
+
+        delay = min(self.RETRY_DELAY * 2 ** (message.attempts - 1), self.MAX_RETRY_DELAY)
+        log.msg('Error delivering %s to %s (attempt %i), retrying in %i seconds: %s' % (message.action, url, message.attempts, delay, err.getErrorMessage()), system=LOG_SYSTEM)
+        metrics.counter('delivery.retries').increment()
+
+        self.queues.setdefault(url, collections.deque()).appendleft(message)
+        if not url in self.retry_calls:
+            self.retry_calls[url] = self.clock.callLater(delay, self._retry, url)
+
+        if message.db_message is not None:
+            message.db_message.attempts = message.attempts
+            message.db_message.save().addErrback(log.err, system=LOG_SYSTEM)
+
+
+    def _retry(self, url):
+        self.retry_calls.pop(url, None)
+        self._process(url)
+
+
+    def _removeMessage(self, message):
+        message.done = True
+        if message.db_message is not None:
+            message.db_message.delete().addErrback(log.err, system=LOG_SYSTEM)
@@ -1,21 +1,42 @@
 """
 A nice handy HTTP client.
 
+Requests are done with a twisted.web Agent, with persistent connections kept
+in a pool, so consecutive requests to the same host reuse the connection
+(and TLS session) instead of connecting for each request.
+
 Author: Henrik Thostrup Jensen <htj@nordu.net>
 Copyright: NORDUnet (2011-2012)
 """
 
+import io
+
+from zope.interface import implementer
+
+from OpenSSL import SSL
+
 from twisted.python import log
-from twisted.internet import reactor, defer
-from twisted.web import client as twclient, http as twhttp
+from twisted.internet import reactor, defer, interfaces
+from twisted.web import client as twclient, http_headers, iweb
 from twisted.web.error import Error as WebError
 from twisted.internet.error import ConnectionClosed, ConnectionRefusedError
 
+from opennsa import logging
+
 
 LOG_SYSTEM = 'HTTPClient'
 
 DEFAULT_TIMEOUT = 30 # seconds
 
+# connection pool settings, see configurePool
+DEFAULT_POOL_SIZE       = 2   # persistent connections per host
+DEFAULT_IDLE_TIMEOUT    = 240 # seconds
+
+_pool_size      = DEFAULT_POOL_SIZE
+_idle_timeout   = DEFAULT_IDLE_TIMEOUT
+_agents         = {} # ctx_factory -> agent
+_pools          = [] # all pools, for closing connections
+
 
 
 class HTTPRequestError(Exception):
@@ -24,6 +45,79 @@ class HTTPRequestError(Exception):
     """
 
 
+
+@implementer(interfaces.IOpenSSLClientConnectionCreator)
+class _ContextConnectionCreator:
+    """
+    Creates TLS connections from an OpenSSL context factory (see ctxfactory).
+    """
+    def __init__(self, ctx_factory, hostname):
+        self.ctx_factory = ctx_factory
+        self.hostname = hostname
+
+
+    def clientConnectionForTLS(self, tls_protocol):
+        connection = SSL.Connection(self.ctx_factory.getContext(), None)
+        connection.set_app_data(tls_protocol)
+        connection.set_tlsext_host_name(self.hostname)
+        connection.set_connect_state()
+        return connection
+
+
+
+@implementer(iweb.IPolicyForHTTPS)
+class _ContextFactoryPolicy:
+
+    def __init__(self, ctx_factory):
+        self.ctx_factory = ctx_factory
+
+
+    def creatorForNetloc(self, hostname, port):
+        return _ContextConnectionCreator(self.ctx_factory, hostname)
+
+
+
+def configurePool(pool_size=DEFAULT_POOL_SIZE, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+    """
+    Set the number of persistent connections kept per host, and how long an
+    idle connection is kept open. Only affects agents created afterwards.
+    """
+    global _pool_size, _idle_timeout
+    _pool_size = pool_size
+    _idle_timeout = idle_timeout
+
+
+
+def getAgent(ctx_factory=None):
+    """
+    Get the agent for requests with the given context factory. Each agent has
+    its own connection pool, so connections are only reused with the same TLS
+    setup.
+    """
+    try:
+        return _agents[ctx_factory]
+    except KeyError:
+        pool = twclient.HTTPConnectionPool(reactor, persistent=True)
+        pool.maxPersistentPerHost = _pool_size
+        pool.cachedConnectionTimeout = _idle_timeout
+        if ctx_factory is None:
+            agent = twclient.Agent(reactor, pool=pool)
+        else:
+            agent = twclient.Agent(reactor, _ContextFactoryPolicy(ctx_factory), pool=pool)
+        _agents[ctx_factory] = agent
+        _pools.append(pool)
+        return agent
+
+
+
+def closeConnections():
+    """
+    Close all cached connections. Returns a deferred firing when done.
+    """
+    return defer.DeferredList( [ pool.closeCachedConnections() for pool in _pools ] )
+
+
+
 def soapRequest(url, soap_action, soap_envelope, timeout=DEFAULT_TIMEOUT, ctx_factory=None, headers=None):
 
     if not headers:
@@ -32,13 +126,11 @@ def soapRequest(url, soap_action, soap_envelope, timeout=DEFAULT_TIMEOUT, ctx_fa
     headers['Content-Type'] = 'text/xml; charset=utf-8' # CXF will complain if this is not set
     headers['soapaction'] = soap_action
 
-    return httpRequest(url, soap_envelope, headers, ctx_factory=ctx_factory)
+    return httpRequest(url, soap_envelope, headers, timeout=timeout, ctx_factory=ctx_factory)
 
 
 
 def httpRequest(url, payload, headers, method='POST', timeout=DEFAULT_TIMEOUT, ctx_factory=None):
-    # copied from twisted.web.client in order to get access to the
-    # factory (which contains response codes, headers, etc)
 
     if type(url) is not str:
         e = HTTPRequestError('URL must be string, not %s' % type(url))
@@ -48,52 +140,52 @@ def httpRequest(url, payload, headers, method='POST', timeout=DEFAULT_TIMEOUT, c
         e = HTTPRequestError('URL does not start with http (URL %s)' % (url))
         return defer.fail(e)
 
-    log.msg(" -- Sending Payload to %s --\n%s\n -- END. Sending Payload --" % (url, payload), system=LOG_SYSTEM, payload=True)
+    logging.payload(" -- Sending Payload to %s --\n%s\n -- END. Sending Payload --", url, payload, system=LOG_SYSTEM)
 
-    scheme, netloc, _ , _, _, _ = twhttp.urlparse(url)
-    if not ':' in netloc:
-        host = netloc
-        port = 80 if scheme == 'http' else 443
-    else:
-        host, s_port = netloc.split(':',1)
-        port = int(s_port)
+    scheme = url.split(':', 1)[0]
+    if scheme == 'https' and ctx_factory is None:
+        return defer.fail(HTTPRequestError('Cannot perform https request without context factory'))
 
-    factory = twclient.HTTPClientFactory(url, method, postdata=payload, timeout=timeout)
-    factory.noisy = False # stop spewing about factory start/stop
-    factory.protocol.handleStatus_204 = lambda _ : None # 204 is an ok reply, needed by NCS VPN backend
+    request_headers = http_headers.Headers( { 'User-Agent' : [ 'OpenNSA/Twisted' ] } )
+    for header, value in list(headers.items()):
+        request_headers.setRawHeaders(header, [ value ] )
 
-    # fix missing port in header (bug in twisted.web.client)
-    factory.headers['host'] = host + ':' + str(port)
-    factory.headers['User-Agent'] = 'OpenNSA/Twisted'
+    body_producer = None
+    if payload:
+        if type(payload) is str:
+            payload = payload.encode('utf-8')
+        body_producer = twclient.FileBodyProducer(io.BytesIO(payload))
 
-    for header, value in list(headers.items()):
-        factory.headers[header] = value
+    agent = getAgent(ctx_factory if scheme == 'https' else None)
+    d = agent.request(method.encode(), url.encode(), request_headers, body_producer)
 
-    if scheme == 'https':
-        if ctx_factory is None:
-            return defer.fail(HTTPRequestError('Cannot perform https request without context factory'))
-        reactor.connectSSL(host, port, factory, ctx_factory)
-    else:
-        reactor.connectTCP(host, port, factory)
+    def gotResponse(response):
+        d = twclient.readBody(response)
+        if 200 <= response.code < 300: # includes 204, needed by NCS VPN backend
+            return d
+        else:
+            d.addCallback(lambda data : defer.fail(WebError(response.code, response.phrase, data)))
+            return d
 
     def invocationError(err):
         if isinstance(err.value, ConnectionClosed): # note: this also includes ConnectionDone and ConnectionLost
             pass # these are pretty common when the remote shuts down
         elif isinstance(err.value, WebError):
             data = err.value.response
-            log.msg(' -- Received Reply (fault) --\n%s\n -- END. Received Reply (fault) --' % data, system=LOG_SYSTEM, payload=True)
+            logging.payload(' -- Received Reply (fault) --\n%s\n -- END. Received Reply (fault) --', data, system=LOG_SYSTEM)
             return err
         elif isinstance(err.value, ConnectionRefusedError):
-            log.msg('Connection refused for %s:%i. Request URL: %s' % (host, port, url), system=LOG_SYSTEM)
+            log.msg('Connection refused for request URL: %s' % url, system=LOG_SYSTEM)
             return err
         else:
             return err
 
     def logReply(data):
-        log.msg(" -- Received Reply --\n%s\n -- END. Received Reply --" % data, system=LOG_SYSTEM, payload=True)
+        logging.payload(" -- Received Reply --\n%s\n -- END. Received Reply --", data, system=LOG_SYSTEM)
         return data
 
-    factory.deferred.addCallbacks(logReply, invocationError)
-
-    return factory.deferred
+    d.addCallback(gotResponse)
+    d.addTimeout(timeout, reactor)
+    d.addCallbacks(logReply, invocationError)
 
+    return d
@@ -23,10 +23,29 @@ DETAIL                  = 'detail'
 
 FAULTCODE_SERVER        = 'soap:Server' # must match with the namespace below
 
+# indent created payloads, makes payload logs readable, but costs cpu and bandwidth
+PRETTY_PRINT            = False
+
+# limits for parsed payloads
+MAX_PAYLOAD_SIZE        = 4 * 1024 * 1024 # bytes, requests
+MAX_REPLY_SIZE          = 64 * 1024 * 1024 # bytes, replies and confirmations from peers, e.g., query results
+MAX_PAYLOAD_DEPTH       = 64 # element nesting
+PARSE_CHUNK_SIZE        = 64 * 1024
+
+# dtds are not allowed in soap, and is how entity expansion attacks are done
+FORBIDDEN_MARKUP        = ( b'<!DOCTYPE', b'<!ENTITY' )
+
 ET.register_namespace('soap', SOAP_ENVELOPE_NS)
 
 
 
+class PayloadError(ValueError):
+    """
+    Raised when a payload exceeds the size/depth limits, or contains forbidden markup.
+    """
+
+
+
 def _indent(elem, level=0):
     i = "\n" + level*"   "
     if len(elem):
@@ -54,7 +73,7 @@ def createSoapEnvelope():
 
 
 
-def createSoapPayload(body_element=None, header_element=None):
+def createSoapPayload(body_element=None, header_element=None, pretty_print=None):
 
     envelope, header, body = createSoapEnvelope()
 
@@ -66,7 +85,8 @@ def createSoapPayload(body_element=None, header_element=None):
         else:
             body.append(body_element)
 
-    _indent(envelope)
+    if pretty_print or (pretty_print is None and PRETTY_PRINT):
+        _indent(envelope)
     payload = ET.tostring(envelope, 'utf-8')
 
     return payload
@@ -102,9 +122,63 @@ def createSoapFault(fault_msg, detail_element=None):
 
 
 
-def parseSoapPayload(payload):
+def parsePayload(payload, max_size=None, max_depth=None):
+    """
+    Parse an xml payload incrementally, checking for size, depth, and forbidden
+    markup while parsing, so hostile payloads are rejected early.
+    Returns the root element.
+    """
+    max_size  = max_size  or MAX_PAYLOAD_SIZE
+    max_depth = max_depth or MAX_PAYLOAD_DEPTH
+
+    if type(payload) is str:
+        payload = payload.encode('utf-8')
+
+    if len(payload) > max_size:
+        raise PayloadError('Payload size %i exceeds maximum size of %i bytes' % (len(payload), max_size))
+
+    parser = ET.XMLPullParser(events=('start', 'end'))
+    root = None
+    depth = 0
+    overlap = max( [ len(m) for m in FORBIDDEN_MARKUP ] ) - 1
+
+    for offset in range(0, len(payload), PARSE_CHUNK_SIZE):
+        chunk = payload[offset : offset + PARSE_CHUNK_SIZE]
+        # include the end of the previous chunk, in case markup is split over two chunks
+        scan = payload[max(0, offset - overlap) : offset + PARSE_CHUNK_SIZE]
+        for markup in FORBIDDEN_MARKUP:
+            if markup in scan:
+                raise PayloadError('Payload contains forbidden markup (%s)' % markup.decode())
+
+        try:
+            parser.feed(chunk)
+            for event, element in parser.read_events():
+                if event == 'start':
+                    depth += 1
+                    if depth > max_depth:
+                        raise PayloadError('Payload exceeds maximum element depth of %i' % max_depth)
+                    if root is None:
+                        root = element
+                else:
+                    depth -= 1
+        except ET.ParseError as e:
+            raise PayloadError('Invalid xml in payload: %s' % e)
+
+    try:
+        parser.close()
+    except ET.ParseError as e:
+        raise PayloadError('Invalid xml in payload: %s' % e)
+
+    if root is None:
+        raise PayloadError('Empty payload')
+
+    return root
+
+
+
+def parseSoapPayload(payload, max_size=None):
 
-    envelope = ET.fromstring(payload)
+    envelope = parsePayload(payload, max_size)
 
     assert envelope.tag == SOAP_ENV, 'Top element in soap payload is not SOAP:Envelope (got %s)' % envelope.tag
 
@@ -126,7 +200,7 @@ def parseSoapPayload(payload):
 
 def parseFault(payload):
 
-    envelope = ET.fromstring(payload)
+    envelope = parsePayload(payload)
 
     if envelope.tag != SOAP_ENV:
         raise ValueError('Top element in soap payload is not SOAP:Envelope')
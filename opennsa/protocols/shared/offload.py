@@ -0,0 +1,48 @@
+"""
+Offloading of XML decoding/encoding of large payloads to the reactor thread pool.
+
+Decoding or encoding a query result with thousands of connections takes tens
+to hundreds of milliseconds, during which the reactor cannot serve other
+requests. If a payload size threshold is set, decoding/encoding of payloads
+above it is done with deferToThread. The functions run must not touch shared
+state, i.e., only turn payloads into objects and back.
+
+For encoding, the payload size is not known in advance, so it is estimated
+from the number of connections in the result.
+
+Author: Henrik Thostrup Jensen <htj@nordu.net>
+Copyright: NORDUnet (2017)
+"""
+
+from twisted.internet import defer, threads
+
+from opennsa import metrics
+
+
+THREAD_PAYLOAD_SIZE     = 0     # bytes, payloads of this size or larger are decoded/encoded in a thread, 0 disables
+ESTIMATED_RESULT_SIZE   = 1024  # bytes per connection in query results
+
+
+
+def _run(size, func, *args, **kwargs):
+    if THREAD_PAYLOAD_SIZE and size >= THREAD_PAYLOAD_SIZE:
+        metrics.counter('offload.threaded').increment()
+        return threads.deferToThread(func, *args, **kwargs)
+    else:
+        return defer.maybeDeferred(func, *args, **kwargs)
+
+
+def decode(func, soap_data, *args, **kwargs):
+    """
+    Run func(soap_data, *args, **kwargs), in a thread if the payload is large.
+    Returns a deferred.
+    """
+    return _run(len(soap_data), func, soap_data, *args, **kwargs)
+
+
+def encodeResults(func, results, *args, **kwargs):
+    """
+    Run func(results, *args, **kwargs), in a thread if the payload created
+    from the query results is estimated to be large. Returns a deferred.
+    """
+    return _run(len(results) * ESTIMATED_RESULT_SIZE, func, results, *args, **kwargs)
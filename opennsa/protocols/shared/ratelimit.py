@@ -0,0 +1,124 @@
+"""
+Admission control for incoming requests.
+
+Requests are limited per requester, identified by the host DN of the client
+certificate, or the client address if no certificate was presented. Each
+requester has a token bucket, refilled with rate tokens per second up to
+burst tokens, and a maximum number of requests in flight, i.e., requests that
+have been admitted, but not answered yet.
+
+Rejections are counted in the metrics, both in total (ratelimit.rejected) and
+per requester (ratelimit.rejected.<requester>).
+
+Author: Henrik Thostrup Jensen <htj@nordu.net>
+Copyright: NORDUnet (2017)
+"""
+
+import math
+
+from twisted.python import log
+
+from opennsa import error, metrics
+from opennsa.shared import cache
+
+
+LOG_SYSTEM = 'RateLimiter'
+
+
+
+class RateLimitExceeded(error.ResourceUnavailableError):
+    """
+    Raised/returned when a request is rejected by the rate limiter. Retry
+    after is the number of seconds until the request would be admitted.
+    """
+    def __init__(self, message, retry_after=1):
+        error.ResourceUnavailableError.__init__(self, message)
+        self.retry_after = retry_after
+
+
+
+class Bucket(object):
+
+    __slots__ = ( 'tokens', 'updated', 'inflight' )
+
+    def __init__(self, tokens, updated):
+        self.tokens   = tokens
+        self.updated  = updated
+        self.inflight = 0
+
+
+
+def requesterKey(request, request_info):
+    """
+    Key to identify a requester by, the certificate host dn if available,
+    otherwise the client address.
+    """
+    if request_info.cert_host_dn is not None:
+        return request_info.cert_host_dn
+    address = request.getClientAddress()
+    return getattr(address, 'host', None) or str(address) # unix sockets have no host
+
+
+
+class RateLimiter(object):
+
+    MAX_REQUESTERS = 10000 # number of requesters to keep state for, requesters with requests in flight are kept regardless
+
+    def __init__(self, rate=0, burst=1, max_inflight=0, clock=None):
+        # rate is requests per second, 0 disables the rate limit, max_inflight 0 disables the in-flight limit
+        if clock is None:
+            from twisted.internet import reactor
+            clock = reactor
+        self.rate         = rate
+        self.burst        = max(1, burst)
+        self.max_inflight = max_inflight
+        self.clock        = clock
+        self.buckets      = cache.LRUCache(self.MAX_REQUESTERS, pinned=lambda b : b.inflight > 0, name='ratelimit.requesters')
+        self.rejected     = metrics.counter('ratelimit.rejected')
+
+
+    def _reject(self, key, message, retry_after):
+        log.msg('Rejecting request from %s: %s' % (key, message), system=LOG_SYSTEM)
+        self.rejected.increment()
+        metrics.counter('ratelimit.rejected.' + key).increment()
+        return RateLimitExceeded(message, retry_after)
+
+
+    def acquire(self, key):
+        """
+        Try to admit a request from requester key. Returns None if admitted, in
+        which case release must be called when the request has been answered.
+        Otherwise a RateLimitExceeded error is returned.
+        """
+        now = self.clock.seconds()
+
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = Bucket(self.burst, now)
+            self.buckets[key] = bucket
+
+        if self.max_inflight and bucket.inflight >= self.max_inflight:
+            return self._reject(key, 'Too many requests in progress (max %i)' % self.max_inflight, 1)
+
+        if self.rate:
+            bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+            bucket.updated = now
+            if bucket.tokens < 1:
+                retry_after = int(math.ceil( (1 - bucket.tokens) / self.rate ))
+                return self._reject(key, 'Request rate exceeded (%s requests per second)' % self.rate, retry_after)
+            bucket.tokens -= 1
+
+        bucket.inflight += 1
+        return None
+
+
+    def release(self, key):
+        """
+        Mark an admitted request from requester key as answered.
+        """
+        bucket = self.buckets.pop(key)
+        if bucket is None:
+            return
+        bucket.inflight = max(0, bucket.inflight - 1)
+        self.buckets[key] = bucket
+
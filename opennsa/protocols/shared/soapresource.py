@@ -9,8 +9,9 @@ from twisted.python import log
 from twisted.internet import defer
 from twisted.web import resource, server
 
+from opennsa import logging
 from opennsa.shared.requestinfo import RequestInfo
-from opennsa.protocols.shared import minisoap
+from opennsa.protocols.shared import minisoap, ratelimit
 
 
 
@@ -35,10 +36,13 @@ class SOAPResource(resource.Resource):
 
     isLeaf = True
 
-    def __init__(self, allowed_hosts=None):
+    def __init__(self, allowed_hosts=None, limiter=None, replies=False):
         resource.Resource.__init__(self)
         self.soap_actions = {}
         self.allowed_hosts = allowed_hosts # certificate dns
+        self.limiter = limiter
+        self.replies = replies # resource receives replies/confirmations from peers, which can be larger than requests
+        self.fault_encoder = None
 
 
     def registerDecoder(self, soap_action, decoder):
@@ -46,6 +50,29 @@ class SOAPResource(resource.Resource):
         self.soap_actions[soap_action] = decoder
 
 
+    def registerFaultEncoder(self, fault_encoder):
+        # fault_encoder: error -> SOAPFault, used for errors raised before a decoder is invoked
+        self.fault_encoder = fault_encoder
+
+
+    def _rejectRequest(self, request, err):
+
+        fault = self.fault_encoder(err) if self.fault_encoder is not None else SOAPFault(str(err))
+        error_payload = fault.createPayload()
+
+        logging.payload(" -- Sending response (fault) --\n%s\n -- END: Sending response (fault) --", error_payload, system=LOG_SYSTEM)
+
+        request.setResponseCode(429) # Too Many Requests
+        request.setHeader('Retry-After', str(err.retry_after))
+        request.setHeader('Content-Type', 'text/xml')
+        return error_payload
+
+
+    def _releaseRequest(self, result, requester_key):
+        self.limiter.release(requester_key)
+        return result
+
+
     def render_POST(self, request):
 
         if self.allowed_hosts is not None:
@@ -87,15 +114,34 @@ class SOAPResource(resource.Resource):
 
         soap_action = request.requestHeaders.getRawHeaders('soapaction',[None])[0]
 
-        soap_data = request.content.read()
-        log.msg(" -- Received payload --\n%s\n -- END. Received payload --" % soap_data, system=LOG_SYSTEM, payload=True)
+        # check size before reading the payload, content-length might be missing (chunked encoding)
+        max_size = minisoap.MAX_REPLY_SIZE if self.replies else minisoap.MAX_PAYLOAD_SIZE
+        content_length = request.getHeader('content-length')
+        if content_length is not None and content_length.isdigit() and int(content_length) > max_size:
+            log.msg('Rejecting request, content length %s exceeds maximum payload size' % content_length, system=LOG_SYSTEM)
+            request.setResponseCode(413) # Request Entity Too Large
+            return b'Payload too large\r\n'
+
+        soap_data = request.content.read(max_size + 1)
+        if len(soap_data) > max_size:
+            log.msg('Rejecting request, payload exceeds maximum payload size', system=LOG_SYSTEM)
+            request.setResponseCode(413) # Request Entity Too Large
+            return b'Payload too large\r\n'
+
+        logging.payload(" -- Received payload --\n%s\n -- END. Received payload --", soap_data, system=LOG_SYSTEM)
 
         if not soap_action in self.soap_actions:
             log.msg('Got request with unknown SOAP action: %s' % soap_action, system=LOG_SYSTEM)
             request.setResponseCode(406) # Not acceptable
             return 'Invalid SOAP Action for this resource\r\n'
 
-        log.msg('Received SOAP request. Action: %s. Length: %i' % (soap_action, len(soap_data)), system=LOG_SYSTEM, debug=True)
+        logging.debug('Received SOAP request. Action: %s. Length: %i', soap_action, len(soap_data), system=LOG_SYSTEM)
+
+        if self.limiter is not None:
+            requester_key = ratelimit.requesterKey(request, request_info)
+            err = self.limiter.acquire(requester_key)
+            if err is not None:
+                return self._rejectRequest(request, err)
 
         def reply(reply_data):
 
@@ -106,7 +152,7 @@ class SOAPResource(resource.Resource):
             if reply_data is None or len(reply_data) == 0:
                 log.msg('None/empty reply data supplied for SOAPResource. This is probably wrong', system=LOG_SYSTEM)
             else:
-                log.msg(" -- Sending response --\n%s\n -- END: Sending response --" % reply_data, system=LOG_SYSTEM, payload=True)
+                logging.payload(" -- Sending response --\n%s\n -- END: Sending response --", reply_data, system=LOG_SYSTEM)
 
             request.setHeader('Content-Type', 'text/xml') # Keeps some SOAP implementations happy
             request.write(reply_data)
@@ -115,11 +161,12 @@ class SOAPResource(resource.Resource):
         def errorReply(err, soap_data):
 
             log.msg('Failure during SOAP decoding/dispatch: %s' % err.getErrorMessage(), system=LOG_SYSTEM)
-            log.err(err)
-            log.msg('SOAP Payload that caused error:\n%s\n' % soap_data)
+            if not err.check(minisoap.PayloadError): # no need for trace and payload dump for rejected payloads
+                log.err(err)
+                log.msg('SOAP Payload that caused error:\n%s\n' % soap_data)
             error_payload = SOAPFault(err.getErrorMessage()).createPayload()
 
-            log.msg(" -- Sending response (fault) --\n%s\n -- END: Sending response (fault) --" % error_payload, system=LOG_SYSTEM, payload=True)
+            logging.payload(" -- Sending response (fault) --\n%s\n -- END: Sending response (fault) --", error_payload, system=LOG_SYSTEM)
 
             request.setResponseCode(500) # Internal server error
             request.setHeader('Content-Type', 'text/xml')
@@ -128,13 +175,15 @@ class SOAPResource(resource.Resource):
 
         decoder = self.soap_actions[soap_action]
         d = defer.maybeDeferred(decoder, soap_data, request_info)
+        if self.limiter is not None:
+            d.addBoth(self._releaseRequest, requester_key)
         d.addCallbacks(reply, errorReply, errbackArgs=(soap_data,))
 
         return server.NOT_DONE_YET
 
 
 
-def setupSOAPResource(top_resource, resource_name, subpath=None, allowed_hosts=None):
+def setupSOAPResource(top_resource, resource_name, subpath=None, allowed_hosts=None, limiter=None, replies=False):
 
     # Default path: NSI/services/{resource_name}
     if subpath is None:
@@ -153,7 +202,7 @@ def setupSOAPResource(top_resource, resource_name, subpath=None, allowed_hosts=N
     if resource_name in ir.children:
         raise AssertionError('Trying to insert several SOAP resource in same leaf. Go away.')
 
-    soap_resource = SOAPResource(allowed_hosts=allowed_hosts)
+    soap_resource = SOAPResource(allowed_hosts=allowed_hosts, limiter=limiter, replies=replies)
     ir.putChild(resource_name, soap_resource)
     return soap_resource
 
@@ -11,10 +11,10 @@ from twisted.application import internet, service as twistedservice
 
 from opennsa import __version__ as version
 
-from opennsa import config, logging, constants as cnt, nsa, provreg, database, aggregator, viewresource
+from opennsa import config, logging, constants as cnt, nsa, provreg, database, aggregator, viewresource, metrics
 from opennsa.topology import nrm, nml, linkvector, service as nmlservice
 from opennsa.protocols import rest, nsi2
-from opennsa.protocols.shared import httplog
+from opennsa.protocols.shared import httplog, httpclient, deliveryqueue, minisoap, offload, ratelimit
 from opennsa.discovery import service as discoveryservice, fetcher
 
 
@@ -76,6 +76,12 @@ def setupBackend(backend_cfg, network_name, nrm_ports, parent_requester):
         raise config.ConfigurationError('No backend specified')
 
     b = BackendConstructer(network_name, nrm_ports, parent_requester, bc)
+
+    if config.CALENDAR_SNAPSHOT in bc:
+        if not hasattr(b, 'snapshot_file'):
+            raise config.ConfigurationError('Backend type %s does not support calendar snapshots' % backend_type)
+        b.snapshot_file = bc[config.CALENDAR_SNAPSHOT]
+
     return b
 
 
@@ -188,6 +194,11 @@ class OpenNSAService(twistedservice.MultiService):
 
         # ssl/tls context
         ctx_factory = setupTLSContext(vc) # May be None
+        httpclient.configurePool(vc[config.HTTP_POOL_SIZE], vc[config.HTTP_IDLE_TIMEOUT])
+        minisoap.MAX_PAYLOAD_SIZE  = vc[config.MAX_PAYLOAD_SIZE]
+        minisoap.MAX_PAYLOAD_DEPTH = vc[config.MAX_PAYLOAD_DEPTH]
+        minisoap.MAX_REPLY_SIZE    = vc[config.MAX_REPLY_SIZE]
+        offload.THREAD_PAYLOAD_SIZE = vc[config.THREAD_PAYLOAD_SIZE]
 
         # plugin
         if vc[config.PLUGIN]:
@@ -207,7 +218,17 @@ class OpenNSAService(twistedservice.MultiService):
 
         requester_creator.aggregator = aggr
 
-        pc = nsi2.setupProvider(aggr, top_resource, ctx_factory=ctx_factory, allowed_hosts=vc.get(config.ALLOWED_HOSTS))
+        delivery_queue = deliveryqueue.DeliveryQueue(ctx_factory)
+        delivery_queue.setServiceParent(self)
+
+        # admission control, shared by the nsi and rest interface
+        if vc[config.RATE_LIMIT] or vc[config.MAX_INFLIGHT]:
+            limiter = ratelimit.RateLimiter(vc[config.RATE_LIMIT], vc[config.RATE_BURST], vc[config.MAX_INFLIGHT])
+        else:
+            limiter = None
+
+        pc = nsi2.setupProvider(aggr, top_resource, ctx_factory=ctx_factory, allowed_hosts=vc.get(config.ALLOWED_HOSTS), delivery_queue=delivery_queue,
+                                notification_ttl=vc[config.NOTIFICATION_TTL], limiter=limiter, provider_nsa=ns_agent.urn())
         aggr.parent_requester = pc
 
         # setup backend(s) - for now we only support one
@@ -252,11 +273,18 @@ class OpenNSAService(twistedservice.MultiService):
         vr = viewresource.ConnectionListResource()
         top_resource.children['NSI'].putChild('connections', vr)
 
+        lag_monitor = metrics.ReactorLagMonitor()
+        lag_monitor.setServiceParent(self)
+
+        mr = viewresource.MetricsResource()
+        top_resource.children['NSI'].putChild('metrics', mr)
+        service_endpoints.append( ('Metrics', base_url + '/NSI/metrics') )
+
         # rest service
         if vc[config.REST]:
             rest_url = base_url + '/connections'
 
-            rest.setupService(aggr, top_resource, vc.get(config.ALLOWED_HOSTS))
+            rest.setupService(aggr, top_resource, vc.get(config.ALLOWED_HOSTS), limiter)
 
             service_endpoints.append( ('REST', rest_url) )
             interfaces.append( (cnt.OPENNSA_REST, rest_url, None) )
@@ -326,6 +354,10 @@ def createApplication(config_file=config.DEFAULT_CONFIG_FILE, debug=False, paylo
         nsa_service = OpenNSAService(vc)
         nsa_service.setServiceParent(application)
 
+        # only format debug/payload messages and indent payloads if they are going to be logged
+        logging.DEBUG   = debug
+        logging.PAYLOAD = payload
+        minisoap.PRETTY_PRINT = payload
         application.setComponent(log.ILogObserver, logging.DebugLogObserver(log_file, debug, payload=payload).emit)
         return application
 
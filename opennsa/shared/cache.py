@@ -0,0 +1,155 @@
+"""
+Bounded caches.
+
+LRUCache is a size bounded cache with least recently used eviction. Entries
+for which the pinned function returns true are never evicted, so the cache
+can temporarily grow beyond its maximum size.
+
+ExpiringDict is a dict where entries expire a fixed time after they have been
+inserted. Expiry is done lazily when the dict is modified or iterated, in a
+single sweep from the oldest entry. An on_expire function can be given, which
+is called with the key and value of expired entries.
+
+Both keep hit/miss/eviction counters and a size gauge in the metrics
+registry, if given a name.
+
+Author: Henrik Thostrup Jensen <htj@nordu.net>
+Copyright: NORDUnet (2017)
+"""
+
+from collections import OrderedDict
+
+from opennsa import metrics
+
+
+
+def _counter(name, suffix):
+    # unnamed caches gets private counters
+    return metrics.counter(name + '.' + suffix) if name else metrics.Counter()
+
+
+
+class LRUCache(object):
+
+    def __init__(self, max_size, pinned=None, name=None):
+        self.max_size = max_size
+        self.pinned   = pinned # value -> bool, pinned entries are not evicted
+        self.entries  = OrderedDict()
+
+        self.hits       = _counter(name, 'hits')
+        self.misses     = _counter(name, 'misses')
+        self.evictions  = _counter(name, 'evictions')
+        if name:
+            metrics.gauge(name + '.size', self.__len__)
+
+
+    def __len__(self):
+        return len(self.entries)
+
+
+    def __contains__(self, key):
+        return key in self.entries
+
+
+    def get(self, key, default=None):
+        try:
+            value = self.entries[key]
+        except KeyError:
+            self.misses.increment()
+            return default
+        self.hits.increment()
+        self.entries.move_to_end(key)
+        return value
+
+
+    def __setitem__(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        self._evict()
+
+
+    def pop(self, key, default=None):
+        return self.entries.pop(key, default)
+
+
+    def _evict(self):
+        # check each entry at most once, pinned entries are moved to the end, as they are in use
+        for _ in range(len(self.entries)):
+            if len(self.entries) <= self.max_size:
+                break
+            key, value = self.entries.popitem(last=False)
+            if self.pinned is not None and self.pinned(value):
+                self.entries[key] = value
+            else:
+                self.evictions.increment()
+
+
+
+class ExpiringDict(object):
+
+    def __init__(self, ttl, clock=None, name=None, on_expire=None):
+        if clock is None:
+            from twisted.internet import reactor
+            clock = reactor
+        self.ttl       = ttl
+        self.clock     = clock
+        self.on_expire = on_expire
+        self.entries   = OrderedDict() # key -> (expire_time, value), in order of insertion
+
+        self.expired = _counter(name, 'expired')
+        if name:
+            metrics.gauge(name + '.size', self.__len__)
+
+
+    def __len__(self):
+        return len(self.entries)
+
+
+    def __contains__(self, key):
+        try:
+            expire_time, _ = self.entries[key]
+        except KeyError:
+            return False
+        return expire_time > self.clock.seconds()
+
+
+    def __getitem__(self, key):
+        if not key in self:
+            raise KeyError(key)
+        return self.entries[key][1]
+
+
+    def __setitem__(self, key, value):
+        self.expire()
+        self.entries.pop(key, None) # keep insertion order == expiry order
+        self.entries[key] = (self.clock.seconds() + self.ttl, value)
+
+
+    def pop(self, key, *args):
+        if not key in self:
+            if args:
+                return args[0]
+            raise KeyError(key)
+        return self.entries.pop(key)[1]
+
+
+    def values(self):
+        self.expire()
+        return [ value for _, value in self.entries.values() ]
+
+
+    def items(self):
+        self.expire()
+        return [ (key, value) for key, (_, value) in self.entries.items() ]
+
+
+    def expire(self):
+        now = self.clock.seconds()
+        while self.entries:
+            key, (expire_time, value) = next(iter(self.entries.items()))
+            if expire_time > now:
+                break
+            del self.entries[key]
+            self.expired.increment()
+            if self.on_expire is not None:
+                self.on_expire(key, value)
@@ -0,0 +1,98 @@
+"""
+Timer wheel for large numbers of timeouts.
+
+Instead of a reactor DelayedCall per timeout, timeouts are put into buckets
+by their expiry time, rounded up to the resolution of the wheel. A single
+DelayedCall, running while there are timeouts, expires the buckets. Adding and
+cancelling a timeout is a dict operation. Timeouts fire at most one resolution
+late, never early.
+
+Author: Henrik Thostrup Jensen <htj@nordu.net>
+Copyright: NORDUnet (2017)
+"""
+
+import math
+
+from twisted.python import log
+
+
+LOG_SYSTEM = 'TimerWheel'
+
+
+
+class Timeout(object):
+
+    __slots__ = ( 'tick', 'func', 'args' )
+
+    def __init__(self, tick, func, args):
+        self.tick = tick
+        self.func = func
+        self.args = args
+
+
+
+class TimerWheel(object):
+
+    def __init__(self, resolution=1, clock=None):
+        if clock is None:
+            from twisted.internet import reactor
+            clock = reactor
+        self.resolution = resolution
+        self.clock      = clock
+        self.buckets    = {} # tick -> set of timeouts
+        self.call       = None
+
+
+    def __len__(self):
+        return sum( [ len(b) for b in self.buckets.values() ] )
+
+
+    def add(self, timeout, func, *args):
+        """
+        Call func(*args) in timeout seconds, unless cancelled. Returns a Timeout,
+        which can be given to cancel.
+        """
+        tick = int(math.ceil( (self.clock.seconds() + timeout) / self.resolution ))
+        t = Timeout(tick, func, args)
+        self.buckets.setdefault(tick, set()).add(t)
+        self._schedule()
+        return t
+
+
+    def cancel(self, timeout):
+        """
+        Cancel a timeout. Returns True if the timeout was pending, False if it
+        has already fired or been cancelled.
+        """
+        bucket = self.buckets.get(timeout.tick)
+        if bucket is None or not timeout in bucket:
+            return False
+        bucket.remove(timeout)
+        if not bucket:
+            del self.buckets[timeout.tick]
+        return True
+
+
+    def _schedule(self):
+        if self.call is None and self.buckets:
+            self.call = self.clock.callLater(self.resolution, self._expire)
+
+
+    def _expire(self):
+        self.call = None
+        now_tick = int(math.floor( self.clock.seconds() / self.resolution ))
+        for tick in sorted( [ tick for tick in self.buckets if tick <= now_tick ] ):
+            for t in self.buckets.pop(tick, ()): # callbacks may cancel timeouts
+                try:
+                    t.func(*t.args)
+                except Exception:
+                    log.err(system=LOG_SYSTEM)
+        self._schedule()
+
+
+    def stop(self):
+        # drop all timeouts without firing them
+        if self.call is not None:
+            self.call.cancel()
+            self.call = None
+        self.buckets = {}
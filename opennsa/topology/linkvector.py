@@ -4,6 +4,14 @@ OpenNSA Link vector path finder.
 For each demarcation port in the network, a vector is kept of remote networks
 that can be reached from the link. Somewhat BGP like.
 
+Updates are incremental: only the paths of the networks in an updated vector
+are recalculated, and subscribers are only notified if the exported vectors
+change.
+
+Multiple ports can lead to the same network (parallel links). For each
+network, up to max_ports ports with a cost within cost_slack of the shortest
+path are kept, so alternatives can be tried.
+
 Author: Henrik Thostrup Jensen <htj@nordu.net>
 
 Copyright: NORDUnet (2011-2015)
@@ -11,36 +19,48 @@ Copyright: NORDUnet (2011-2015)
 
 from twisted.python import log
 
+from opennsa import logging
+
 
 
 LOG_SYSTEM = 'topology.linkvector'
 
-DEFAULT_MAX_COST = 5
+DEFAULT_MAX_COST    = 5
+DEFAULT_MAX_PORTS   = 4 # ports kept per network
+DEFAULT_COST_SLACK  = 0 # ports with cost up to the cost of the shortest path + slack are kept, 0 is equal-cost only
 
 
 
 class LinkVector:
 
-    def __init__(self, local_networks, blacklist_networks=None, max_cost=DEFAULT_MAX_COST):
+    def __init__(self, local_networks, blacklist_networks=None, max_cost=DEFAULT_MAX_COST, max_ports=DEFAULT_MAX_PORTS, cost_slack=DEFAULT_COST_SLACK):
 
         # networks hosted by the local nsa, we want these in the vectors (though not used),
         # but don't want to export/use them in reachability
         self.local_networks = local_networks
         self.blacklist_networks = blacklist_networks if not blacklist_networks is None else []
         self.max_cost = max_cost
+        self.max_ports = max_ports
+        self.cost_slack = cost_slack
 
         # this is a set of vectors we keep for each peer
         self.vectors = {} # port name -> { network : cost }
 
-        # this is the calculated shortest paths, should be recalculated when new information gets available
-        self._shortest_paths = {} # network -> ( port name, cost)
+        # the calculated paths, recalculated for the networks in a vector when it is updated
+        self._paths = {} # network -> [ ( port name, cost) ], shortest first
 
         self.subscribers = []
+        self.path_subscribers = []
 
     # -- updates
 
-    def callOnUpdate(self, f):
-        self.subscribers.append(f)
+    def callOnUpdate(self, f, paths=False):
+        # f is called when the exported vectors (see listVectors) change, or if paths is true,
+        # with the set of changed networks when the paths (see vectorPorts) to any networks change
+        if paths:
+            self.path_subscribers.append(f)
+        else:
+            self.subscribers.append(f)
 
 
     def updated(self):
@@ -50,60 +70,99 @@ class LinkVector:
     # -- vector stuff
 
     def updateVector(self, port, vectors):
+        """
+        Update the vectors for a port. Only the networks in the update are
+        recalculated. Returns the set of networks for which the paths (ports or
+        costs) changed.
+        """
+        port_vectors = self.vectors.setdefault(port, {})
+        affected = [ network for network, cost in vectors.items() if port_vectors.get(network) != cost ]
+        port_vectors.update(vectors)
 
-        if port in self.vectors:
-            self.vectors[port].update(vectors)
-        else:
-            self.vectors[port] = vectors
-
-        self._calculateVectors()
-        self.updated()
+        return self._updateNetworks(affected)
 
 
     def deleteVector(self, port):
         try:
-            self.vectors.pop(port)
-            self._calculateVectors()
+            port_vectors = self.vectors.pop(port)
         except KeyError:
             log.msg('Tried to delete non-existing vector for %s' % port)
+            return set()
+
+        return self._updateNetworks(port_vectors)
+
+
+    def _updateNetworks(self, networks):
+        # recalculate paths for the networks, notify subscribers if the exported vectors changed
+        changed = set()
+        exported_changed = False
 
+        for network in networks:
+            old_paths = self._paths.get(network)
+            new_paths = self._calculateNetwork(network)
+            if new_paths == old_paths:
+                continue
 
-    def _calculateVectors(self):
+            changed.add(network)
+            if new_paths is None:
+                self._paths.pop(network)
+            else:
+                self._paths[network] = new_paths
+            if old_paths is None or new_paths is None or old_paths[0][1] != new_paths[0][1]:
+                exported_changed = True # only the cost of the shortest path is visible in the exported vectors
 
-        log.msg('* Calculating shortest-path vectors', debug=True, system=LOG_SYSTEM)
-        paths = {}
-        for port, vectors in list(self.vectors.items()):
+        if changed:
+            for f in self.path_subscribers:
+                f(changed)
+        if exported_changed:
+            self.updated()
+        return changed
 
-            for network, cost in list(vectors.items()):
-                if network in self.local_networks:
-                    continue # skip local networks
-                if network in self.blacklist_networks:
-                    log.msg('Skipping network %s in vector calculation, is blacklisted' % network, system=LOG_SYSTEM)
-                    continue
-                if cost > self.max_cost:
-                    log.msg('Skipping network %s in vector calculation, cost %i exceeds max cost %i' % (network, cost, self.max_cost), system=LOG_SYSTEM)
-                    continue
-                if not network in paths:
-                    paths[network] = (port, cost)
-                    log.msg('Added path to %s via %s. Cost %i' % (network, port, cost), debug=True, system=LOG_SYSTEM)
-                elif cost < paths[network][1]:
-                    paths[network] = (port, cost) # overwrite
-                    log.msg('Updated path to %s via %s. Cost %i' % (network, port, cost), debug=True, system=LOG_SYSTEM)
-                # no else, it means we have a cheaper path
 
-        self._shortest_paths = paths
+    def _calculateNetwork(self, network):
+        # returns the paths [ (port, cost) ] to a network, shortest first, or None if there is no (usable) path
+
+        if network in self.local_networks:
+            return None # skip local networks
+        if network in self.blacklist_networks:
+            log.msg('Skipping network %s in vector calculation, is blacklisted' % network, system=LOG_SYSTEM)
+            return None
+
+        paths = []
+        for port, vectors in self.vectors.items():
+            cost = vectors.get(network)
+            if cost is None:
+                continue
+            if cost > self.max_cost:
+                log.msg('Skipping network %s in vector calculation, cost %i exceeds max cost %i' % (network, cost, self.max_cost), system=LOG_SYSTEM)
+                continue
+            paths.append( (port, cost) )
+
+        if not paths:
+            return None
+
+        paths.sort(key=lambda path : path[1]) # stable, first port wins on equal cost
+        max_cost = paths[0][1] + self.cost_slack
+        paths = [ path for path in paths if path[1] <= max_cost ][:self.max_ports]
+
+        logging.debug('Paths to %s (port, cost): %s', network, paths, system=LOG_SYSTEM)
+        return paths
 
 
     def vector(self, network):
         # typical usage for path finding
         try:
-            port, cost = self._shortest_paths[network]
+            port, cost = self._paths[network][0]
             return port
         except KeyError:
             return None # or do we need an exception here?
 
 
+    def vectorPorts(self, network):
+        # all ports to a network, within cost slack of the shortest path, shortest first
+        return [ port for port, _ in self._paths.get(network, []) ]
+
+
     def listVectors(self):
         # needed for exporting topologies
-        return { network : cost for (network, (_, cost) ) in list(self._shortest_paths.items()) }
-
+        return { network : paths[0][1] for (network, paths) in list(self._paths.items()) }
@@ -6,6 +6,7 @@ Author: Henrik Thostrup Jensen <htj@nordu.net>
 Copyright: NORDUnet (2011-2013)
 """
 
+import heapq
 import itertools
 import datetime
 
@@ -37,7 +38,11 @@ class Port(object):
 
 
     def canMatchLabel(self, label):
-        return nsa.Label.canMatch(self, label)
+        return nsa.Label.canMatch(self._label, label)
+
+
+    def canProvideBandwidth(self, desired_bandwidth):
+        return True # bandwidth not known, see InternalPort
 
 
     def isBidirectional(self):
@@ -142,11 +147,20 @@ class Network(object):
         self.bidirectional_ports = bidirectional_ports or []
         self.version             = version or datetime.datetime.utcnow().replace(microsecond=0)
 
+        # indexes, the port lists are not modified after creation
+        self.ports      = {} # port_id -> port
+        self.port_pairs = {} # (inbound port id, outbound port id) -> bidirectional port
+        for port in itertools.chain(self.inbound_ports, self.outbound_ports, self.bidirectional_ports):
+            self.ports.setdefault(port.id_, port)
+        for port in self.bidirectional_ports:
+            self.port_pairs.setdefault( (port.inbound_port.id_, port.outbound_port.id_), port)
+
 
     def getPort(self, port_id):
-        for port in itertools.chain(self.inbound_ports, self.outbound_ports, self.bidirectional_ports):
-            if port.id_ == port_id:
-                return port
+        try:
+            return self.ports[port_id]
+        except KeyError:
+            pass
         # better error message
         ports = [ p.id_ for p in list(itertools.chain(self.inbound_ports, self.outbound_ports, self.bidirectional_ports)) ]
         raise error.STPUnavailableError('No port named %s for network %s (ports: %s)' %(port_id, self.id_, str(ports)))
@@ -167,10 +181,44 @@ class Network(object):
 
 
 
+def _intersect(label, *labels):
+    # intersect labels, None (no label) only matches None, as in nsa.Label.canMatch
+    for other in labels:
+        if label is None or other is None:
+            if label is not other:
+                raise nsa.EmptyLabelSet('Cannot intersect label with no label')
+        else:
+            label = label.intersect(other)
+    return label
+
+
+
+def _labelType(label):
+    return label.type_ if label is not None else None
+
+
+
 class Topology(object):
 
+    MAX_PATHS = 10 # default number of paths returned by findPaths
+
     def __init__(self):
         self.networks = {} # network_name -> ( Network, nsa.NetworkServiceAgent)
+        self.ports    = {} # port_id -> [ ( network_id, port ) ], in order of network insertion, first entry is used
+
+
+    def _indexNetwork(self, network):
+        for port_id, port in network.ports.items():
+            self.ports.setdefault(port_id, []).append( (network.id_, port) )
+
+
+    def _unindexNetwork(self, network):
+        for port_id in network.ports:
+            entries = [ e for e in self.ports.get(port_id, []) if e[0] != network.id_ ]
+            if entries:
+                self.ports[port_id] = entries
+            else:
+                self.ports.pop(port_id, None)
 
 
     def addNetwork(self, network, managing_nsa):
@@ -181,17 +229,21 @@ class Topology(object):
             raise error.TopologyError('Entry for network with id %s already exists' % network.id_)
 
         self.networks[network.id_] = (network, managing_nsa)
+        self._indexNetwork(network)
 
 
     def updateNetwork(self, network, managing_nsa):
         # update an existing network entry
         existing_entry = self.networks.pop(network.id_, None) # note - we may get none here (for new network)
+        if existing_entry:
+            self._unindexNetwork(existing_entry[0])
         try:
             self.addNetwork(network, managing_nsa)
         except error.TopologyError as e:
             log.msg('Error updating network entry for %s. Reason: %s' % (network.id_, str(e)))
             if existing_entry:
                 self.networks[network.id_] = existing_entry # restore old entry
+                self._indexNetwork(existing_entry[0])
             raise e
 
 
@@ -203,13 +255,9 @@ class Topology(object):
 
 
     def getNetworkPort(self, port_id):
-        for network_id, (network,_) in list(self.networks.items()):
-            try:
-                port = network.getPort(port_id)
-                return network_id, port
-            except error.TopologyError:
-                continue
-        else:
+        try:
+            return self.ports[port_id][0]
+        except KeyError:
             raise error.TopologyError('Cannot find port with id %s in topology' % port_id)
 
 
@@ -240,13 +288,13 @@ class Topology(object):
 
         remote_network = self.getNetwork(remote_network_in)
 
-        for rp in remote_network.findPorts(True):
-            if isinstance(rp, BidirectionalPort) and rp.inbound_port.id_ == remote_port_in.id_ and rp.outbound_port.id_ == remote_port_out.id_:
-                return remote_network.id_, rp.id_
-        return None
+        rp = remote_network.port_pairs.get( (remote_port_in.id_, remote_port_out.id_) )
+        if rp is None:
+            return None
+        return remote_network.id_, rp.id_
 
 
-    def findPaths(self, source_stp, dest_stp, bandwidth, exclude_networks=None):
+    def findPaths(self, source_stp, dest_stp, bandwidth, exclude_networks=None, max_paths=None):
 
         source_port = self.getNetwork(source_stp.network).getPort(source_stp.port)
         dest_port   = self.getNetwork(dest_stp.network).getPort(dest_stp.port)
@@ -272,10 +320,152 @@ class Topology(object):
 #        if not dest_port.canProvideBandwidth(bandwidth):
 #            raise error.BandwidthUnavailableError('Destination port cannot provide enough bandwidth (%i)' % bandwidth)
 
-        return self._findPathsRecurse(source_stp, dest_stp, bandwidth)
+        if max_paths is None:
+            max_paths = self.MAX_PATHS
+
+        return self._findShortestPaths(source_stp, dest_stp, bandwidth, exclude_networks or [], max_paths)
+
+
+    def _demarcationLinks(self, network_id, bandwidth):
+        # [ (link port, demarcation network id, demarcation port id) ] for the links out of a network, which can provide the bandwidth
+        network = self.getNetwork(network_id)
+        links = []
+        for lp in network.findPorts(True):
+            if not (lp.hasRemote() and lp.canProvideBandwidth(bandwidth)):
+                continue
+            demarcation = self.findDemarcationPort(lp)
+            if demarcation is None:
+                continue
+            d_network_id, d_port_id = demarcation
+            if self.getNetwork(d_network_id).getPort(d_port_id).canProvideBandwidth(bandwidth):
+                links.append( (lp, d_network_id, d_port_id) )
+        return links
+
+
+    def _networkDistances(self, dest_network_id, links):
+        # Dijkstra from the destination network over the reversed network graph, labels are ignored
+        # network id -> number of links to the destination, networks which cannot reach the destination are not included
+        reverse_links = {}
+        for network_id, network_links in links.items():
+            for _, d_network_id, _ in network_links:
+                reverse_links.setdefault(d_network_id, set()).add(network_id)
+
+        distances = {}
+        queue = [ (0, dest_network_id) ]
+        while queue:
+            distance, network_id = heapq.heappop(queue)
+            if network_id in distances:
+                continue
+            distances[network_id] = distance
+            for nid in reverse_links.get(network_id, ()):
+                if not nid in distances:
+                    heapq.heappush(queue, (distance + 1, nid) )
+        return distances
+
+
+    def _findShortestPaths(self, source_stp, dest_stp, bandwidth, exclude_networks, max_paths):
+        """
+        Find the max_paths shortest (fewest links) loop-free paths between two
+        bidirectional STPs, shortest first.
+
+        This is an A* search over partial paths, with the distance to the
+        destination network (found with Dijkstra) as heuristic. The label set
+        is intersected along each partial path, which is dropped when the label
+        set becomes empty. Link ports that cannot provide the bandwidth are
+        not used. As in k-shortest path algorithms, each port/label pair is
+        expanded at most max_paths times.
+
+        Returns the same paths (list of nsa.Link lists) as _findPathsRecurse,
+        but only the shortest ones.
+        """
+        source_network = self.getNetwork(source_stp.network)
+        dest_network   = self.getNetwork(dest_stp.network)
+        source_port    = source_network.getPort(source_stp.port)
+        dest_port      = dest_network.getPort(dest_stp.port)
+
+        if not (source_port.isBidirectional() and dest_port.isBidirectional()):
+            raise error.TopologyError('Unidirectional path-finding not implemented yet')
+
+        label_type = _labelType(source_stp.label)
+        links = dict( [ (network_id, self._demarcationLinks(network_id, bandwidth)) for network_id in self.networks ] )
+        distances = self._networkDistances(dest_network.id_, links)
+
+        if not source_network.id_ in distances:
+            return []
+
+        def createPath(hops):
+            # hops: [ (network, ingress port, ingress label, link port) ], link port is None for the destination network
+            # labels are intersected backwards from the destination, like in _findPathsRecurse
+            network, port, label, _ = hops[-1]
+            if network.canSwapLabel(label_type):
+                src_label = _intersect(port.label(), label)
+                dst_label = _intersect(dest_port.label(), dest_stp.label)
+            else:
+                src_label = _intersect(port.label(), dest_port.label(), label, dest_stp.label)
+                dst_label = src_label
+            path = [ nsa.Link(nsa.STP(network.id_, port.id_, src_label), nsa.STP(network.id_, dest_port.id_, dst_label)) ]
+
+            for network, port, label, lp in reversed(hops[:-1]):
+                next_label = path[0].src_stp.label
+                if network.canSwapLabel(label_type):
+                    src_label = _intersect(port.label(), label)
+                    dst_label = _intersect(lp.label(), next_label)
+                else:
+                    src_label = _intersect(port.label(), label, lp.label(), next_label)
+                    dst_label = src_label
+                path.insert(0, nsa.Link(nsa.STP(network.id_, port.id_, src_label), nsa.STP(network.id_, lp.id_, dst_label)) )
+            return path
+
+        paths = []
+        expanded = {} # (network id, port id, label value) -> times expanded
+        counter = itertools.count() # tie breaker, paths of the same length are found in insertion order
+
+        # queue entries: (estimated path length, tie breaker, hops, ingress port, ingress label)
+        queue = [ (distances[source_network.id_] + 1, next(counter), (), source_network, source_port, source_stp.label) ]
+
+        while queue and len(paths) < max_paths:
+            estimate, _, hops, network, port, label = heapq.heappop(queue)
+
+            key = (network.id_, port.id_, label.labelValue() if label is not None else None)
+            if expanded.get(key, 0) >= max_paths:
+                continue
+            expanded[key] = expanded.get(key, 0) + 1
+
+            if network.id_ == dest_network.id_:
+                try:
+                    paths.append( createPath(hops + ( (network, port, label, None), )) )
+                except nsa.EmptyLabelSet:
+                    pass
+                continue
+
+            visited = set( [ hop[0].id_ for hop in hops ] + [ network.id_ ] + exclude_networks )
+
+            for lp, d_network_id, d_port_id in links[network.id_]:
+                if d_network_id in visited or not d_network_id in distances:
+                    continue
+                if lp.id_ == port.id_ or not lp.canMatchLabel(label):
+                    continue
+                try:
+                    if network.canSwapLabel(label_type):
+                        d_label = lp.label()
+                    else:
+                        d_label = _intersect(label, port.label(), lp.label())
+                except nsa.EmptyLabelSet:
+                    continue
+
+                d_network = self.getNetwork(d_network_id)
+                d_port    = d_network.getPort(d_port_id)
+                if not d_port.canMatchLabel(d_label):
+                    continue
+
+                entry = ( len(hops) + 2 + distances[d_network_id], next(counter), hops + ( (network, port, label, lp), ), d_network, d_port, d_label )
+                heapq.heappush(queue, entry)
+
+        return paths
 
 
     def _findPathsRecurse(self, source_stp, dest_stp, bandwidth, exclude_networks=None):
+        # exhaustive search for all loop-free paths, superseded by _findShortestPaths, kept as reference for tests and benchmarks
 
         source_network = self.getNetwork(source_stp.network)
         dest_network   = self.getNetwork(dest_stp.network)
@@ -284,6 +474,8 @@ class Topology(object):
 
         if not (source_port.canMatchLabel(source_stp.label) or dest_port.canMatchLabel(dest_stp.label)):
             return []
+
+        label_type = _labelType(source_stp.label)
 #        if not (source_port.canProvideBandwidth(bandwidth) and dest_port.canProvideBandwidth(bandwidth)):
 #            return []
 
@@ -293,13 +485,13 @@ class Topology(object):
                 # while it is possible to cross other network in order to connect to intra-network STPs
                 # it is not something we really want to do in the real world, so we don't
                 try:
-                    if source_network.canSwapLabel(source_stp.label.type_):
-                        source_label = source_port.label().intersect(source_stp.label)
-                        dest_label   = dest_port.label().intersect(dest_stp.label)
+                    if source_network.canSwapLabel(label_type):
+                        source_label = _intersect(source_port.label(), source_stp.label)
+                        dest_label   = _intersect(dest_port.label(), dest_stp.label)
                     else:
-                        source_label = source_port.label().intersect(dest_port.label()).intersect(source_stp.label).intersect(dest_stp.label)
+                        source_label = _intersect(source_port.label(), dest_port.label(), source_stp.label, dest_stp.label)
                         dest_label   = source_label
-                    link = nsa.Link(source_stp.network, source_stp.port, dest_stp.port, source_label, dest_label)
+                    link = nsa.Link(nsa.STP(source_stp.network, source_stp.port, source_label), nsa.STP(source_stp.network, dest_stp.port, dest_label))
                     return [ [ link ] ]
                 except nsa.EmptyLabelSet:
                     return [] # no path
@@ -318,7 +510,10 @@ class Topology(object):
                     if exclude_networks is not None and demarcation[0] in exclude_networks:
                         continue # don't do loops in path finding
 
-                    demarcation_label = lp.label() if source_network.canSwapLabel(source_stp.label.type_) else source_stp.label.intersect(lp.label())
+                    try:
+                        demarcation_label = lp.label() if source_network.canSwapLabel(label_type) else _intersect(source_stp.label, lp.label())
+                    except nsa.EmptyLabelSet:
+                        continue
                     demarcation_stp = nsa.STP(demarcation[0], demarcation[1], demarcation_label)
                     sub_exclude_networks = [ source_network.id_ ] + (exclude_networks or [])
                     sub_links = self._findPathsRecurse(demarcation_stp, dest_stp, bandwidth, sub_exclude_networks)
@@ -328,14 +523,14 @@ class Topology(object):
 
                     for sl in sub_links:
                         # --
-                        if source_network.canSwapLabel(source_stp.label.type_):
-                            source_label = source_port.label().intersect(source_stp.label)
-                            dest_label   = lp.label().intersect(sl[0].src_stp.label)
+                        if source_network.canSwapLabel(label_type):
+                            source_label = _intersect(source_port.label(), source_stp.label)
+                            dest_label   = _intersect(lp.label(), sl[0].src_stp.label)
                         else:
-                            source_label = source_port.label().intersect(source_stp.label).intersect(lp.label()).intersect(sl[0].src_stp.label)
+                            source_label = _intersect(source_port.label(), source_stp.label, lp.label(), sl[0].src_stp.label)
                             dest_label   = source_label
 
-                        first_link = nsa.Link(source_stp.network, source_stp.port, lp.id_, source_label, dest_label)
+                        first_link = nsa.Link(nsa.STP(source_stp.network, source_stp.port, source_label), nsa.STP(source_stp.network, lp.id_, dest_label))
                         path = [ first_link ] + sl
                         links.append(path)
 
@@ -95,7 +95,7 @@ def parsePortSpec(source):
 
     # Line starting with # and blank lines should be ignored
 
-    assert isinstance(source, file) or isinstance(source, io.StringIO), 'Topology source must be file or StringIO instance'
+    assert isinstance(source, io.IOBase), 'Topology source must be file or StringIO instance'
 
     nrm_ports = []
 
@@ -1,15 +1,17 @@
 """
-HTTP Resource for displaying connection in OpenNSA.
+HTTP Resources for displaying connections and metrics in OpenNSA.
 
-Currently rather simple. No CSS, just raw html tables.
+Currently rather simple. No CSS, just raw html tables (and json for metrics).
 
 Author: Henrik Thostrup Jensen <htj@nordu.net>
 Copyright: NORDUnet (2012)
 """
 
+import json
+
 from twisted.web import resource, server
 
-from opennsa import database
+from opennsa import database, metrics
 
 
 HTML_HEADER = """<!DOCTYPE html>
@@ -89,3 +91,13 @@ class ConnectionListResource(resource.Resource):
         request.finish()
         return server.NOT_DONE_YET
 
+
+
+class MetricsResource(resource.Resource):
+
+    isLeaf = True
+
+    def render_GET(self, request):
+
+        request.setHeader(b'Content-Type', b'application/json')
+        return json.dumps(metrics.snapshot(), sort_keys=True, indent=2).encode()
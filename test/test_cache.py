@@ -0,0 +1,79 @@
+from twisted.trial import unittest
+from twisted.internet import task
+
+from opennsa.shared import cache
+
+
+
+class LRUCacheTest(unittest.TestCase):
+
+    def testEviction(self):
+
+        c = cache.LRUCache(2)
+        c['a'] = 1
+        c['b'] = 2
+        self.assertEqual(c.get('a'), 1) # b is now least recently used
+        c['c'] = 3
+
+        self.assertEqual(len(c), 2)
+        self.failIf('b' in c)
+        self.assertEqual(c.get('b'), None)
+        self.assertEqual(c.evictions.value, 1)
+        self.assertEqual(c.hits.value, 1)
+        self.assertEqual(c.misses.value, 1)
+
+
+    def testPinned(self):
+
+        c = cache.LRUCache(2, pinned=lambda value : value == 'busy')
+        c['a'] = 'busy'
+        c['b'] = 'idle'
+        c['c'] = 'idle'
+        self.assertEqual(sorted(c.entries.keys()), [ 'a', 'c' ] )
+
+        # everything pinned, cache grows
+        c = cache.LRUCache(1, pinned=lambda value : True)
+        c['a'] = 1
+        c['b'] = 2
+        self.assertEqual(len(c), 2)
+
+
+
+class ExpiringDictTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = task.Clock()
+        self.d = cache.ExpiringDict(10, clock=self.clock)
+
+
+    def testExpiry(self):
+
+        self.d['a'] = 1
+        self.clock.advance(5)
+        self.d['b'] = 2
+        self.assertEqual(self.d['a'], 1)
+
+        self.clock.advance(6)
+        self.failIf('a' in self.d)
+        self.assertRaises(KeyError, self.d.pop, 'a')
+        self.assertEqual(self.d.values(), [ 2 ])
+        self.assertEqual(self.d.items(), [ ('b', 2) ])
+        self.assertEqual(self.d.expired.value, 1)
+
+        self.assertEqual(self.d.pop('b'), 2)
+        self.assertEqual(self.d.pop('b', None), None)
+        self.assertEqual(len(self.d), 0)
+
+
+
+    def testOnExpire(self):
+
+        expired = []
+        d = cache.ExpiringDict(10, clock=self.clock, on_expire=lambda k, v : expired.append( (k, v) ))
+        d['a'] = 1
+        d['b'] = 2
+        self.clock.advance(11)
+        d['c'] = 3 # modification sweeps
+
+        self.assertEqual(expired, [ ('a', 1), ('b', 2) ])
+        self.assertEqual(d.expired.value, 2)
@@ -1,8 +1,9 @@
+import random
 import datetime
 
 from twisted.trial import unittest
 
-from opennsa import error
+from opennsa import nsa, error
 from opennsa.backends.common import calendar
 
 
@@ -87,3 +88,108 @@ class CalendarTest(unittest.TestCase):
         self.assertRaises(error.STPUnavailableError, self.c.checkReservation, 'r1', ds2, de2)
 
 
+
+
+    def testRemove(self):
+
+        ds1 = None
+        de1 = datetime.datetime.utcnow() + datetime.timedelta(seconds=5)
+
+        self.c.addReservation('r1', ds1, de1)
+        self.assertRaises(error.STPUnavailableError, self.c.checkReservation, 'r1', ds1, de1)
+
+        self.c.removeReservation('r1', ds1, de1)
+        self.c.checkReservation('r1', ds1, de1)
+
+        self.assertRaises(ValueError, self.c.removeReservation, 'r1', ds1, de1)
+
+
+    def testSeparateResources(self):
+
+        ds1 = None
+        de1 = datetime.datetime.utcnow() + datetime.timedelta(seconds=5)
+
+        self.c.addReservation('r1', ds1, de1)
+
+        self.c.checkReservation('r2', ds1, de1)
+        self.assertRaises(error.STPUnavailableError, self.c.checkReservation, 'r1', ds1, de1)
+
+
+    def testManyReservations(self):
+
+        now = datetime.datetime.utcnow()
+        for i in range(1, 100):
+            self.c.addReservation('r1', now + datetime.timedelta(hours=i*2), now + datetime.timedelta(hours=i*2+1))
+
+        de1 = now + datetime.timedelta(minutes=90)
+        self.c.checkReservation('r1', None, de1)
+
+        # long reservation, with a late start, covering the gaps
+        self.c.addReservation('r1', now + datetime.timedelta(hours=150), now + datetime.timedelta(hours=400))
+        self.c.removeReservation('r1', now + datetime.timedelta(hours=2), now + datetime.timedelta(hours=3))
+        self.c.checkReservation('r1', None, now + datetime.timedelta(minutes=200))
+        self.assertRaises(error.STPUnavailableError, self.c.checkReservation, 'r1', None, now + datetime.timedelta(minutes=300))
+
+
+    def testOverlapMatchesScan(self):
+
+        rand = random.Random(17)
+        now = datetime.datetime.utcnow()
+        hour = lambda h : now + datetime.timedelta(hours=h)
+
+        entries = []
+        for _ in range(300):
+            if entries and rand.random() < 0.3:
+                s, e = entries.pop(rand.randrange(len(entries)))
+                self.c.removeReservation('r1', s, e)
+            else:
+                s = hour(rand.randint(1, 500))
+                e = s + datetime.timedelta(hours=rand.randint(1, 50))
+                entries.append( (s, e) )
+                self.c.addReservation('r1', s, e)
+
+            qs = hour(rand.randint(1, 550))
+            qe = qs + datetime.timedelta(hours=rand.randint(1, 20))
+            expected = any( s <= qe and e >= qs for s, e in entries )
+            self.assertEqual(self.c._resourceOverlap('r1', qs, qe), expected)
+
+        self.assertEqual(sorted(self.c.reservations.get('r1', [])), sorted(entries))
+
+
+    def testDuplicateReservation(self):
+
+        de1 = datetime.datetime.utcnow() + datetime.timedelta(seconds=5)
+        self.c.addReservation('r1', None, de1)
+        self.c.addReservation('r1', None, de1)
+        self.assertEqual(len(self.c.reservations['r1']), 2)
+
+        self.c.removeReservation('r1', None, de1)
+        self.assertRaises(error.STPUnavailableError, self.c.checkReservation, 'r1', None, de1)
+        self.c.removeReservation('r1', None, de1)
+        self.assertNotIn('r1', self.c.reservations)
+        self.assertRaises(ValueError, self.c.removeReservation, 'r1', None, de1)
+
+
+    def testFindFreeLabel(self):
+
+        resource = lambda port, label : port + ':' + label.labelValue()
+        label = nsa.Label('vlan', '1780-1789')
+
+        de1 = datetime.datetime.utcnow() + datetime.timedelta(seconds=5)
+
+        self.assertEqual(self.c.findFreeLabel(resource, ['p1'], label, None, de1), 1780)
+
+        self.c.addReservation('p1:1780', None, de1)
+        self.c.addReservation('p1:1781', None, de1)
+        self.c.addReservation('p2:1782', None, de1)
+
+        self.assertEqual(self.c.findFreeLabel(resource, ['p1'], label, None, de1), 1782)
+        self.assertEqual(self.c.findFreeLabel(resource, ['p2'], label, None, de1), 1780)
+        self.assertEqual(self.c.findFreeLabel(resource, ['p1', 'p2'], label, None, de1), 1783)
+
+        self.c.removeReservation('p1:1780', None, de1)
+        self.assertEqual(self.c.findFreeLabel(resource, ['p1', 'p2'], label, None, de1), 1780)
+
+        for lv in range(1780, 1790):
+            self.c.addReservation('p3:%i' % lv, None, de1)
+        self.assertEqual(self.c.findFreeLabel(resource, ['p3'], label, None, de1), None)
@@ -0,0 +1,134 @@
+from twisted.trial import unittest
+from twisted.internet import defer, task, error
+from twisted.web.error import Error as WebError
+
+from opennsa.protocols.shared import deliveryqueue
+
+
+
+class TestDeliveryQueue(deliveryqueue.DeliveryQueue):
+
+    MAX_IN_FLIGHT = 2
+
+    def __init__(self, clock, persistent=False):
+        deliveryqueue.DeliveryQueue.__init__(self, persistent=persistent, clock=clock)
+        self.requests = [] # (message, deferred)
+        self.saves    = [] # (message, deferred), when persistent
+
+    def _sendRequest(self, message):
+        d = defer.Deferred()
+        self.requests.append( (message, d) )
+        return d
+
+    def _saveMessage(self, message):
+        d = defer.Deferred()
+        self.saves.append( (message, d) )
+        return d
+
+
+
+class DBMessage(object):
+
+    def __init__(self):
+        self.deleted = False
+
+    def delete(self):
+        self.deleted = True
+        return defer.succeed(None)
+
+
+
+class DeliveryQueueTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = task.Clock()
+        self.queue = TestDeliveryQueue(self.clock)
+
+
+    def testInFlightLimit(self):
+
+        for i in range(3):
+            self.queue.send('http://requester/', 'action', 'payload-%i' % i)
+
+        self.assertEqual(len(self.queue.requests), 2)
+        self.assertEqual(self.queue.queueDepth(), 3)
+
+        self.queue.requests[0][1].callback(None)
+        self.assertEqual(len(self.queue.requests), 3)
+        self.assertEqual(self.queue.requests[2][0].payload, 'payload-2')
+
+        for _, d in self.queue.requests[1:]:
+            d.callback(None)
+        self.assertEqual(self.queue.queueDepth(), 0)
+        self.assertEqual(self.queue.queues, {})
+
+
+    def testRetry(self):
+
+        self.queue.send('http://requester/', 'action', 'payload')
+        self.queue.requests[0][1].errback(error.ConnectionRefusedError())
+
+        # backing off
+        self.assertEqual(len(self.queue.requests), 1)
+        self.clock.advance(self.queue.RETRY_DELAY)
+        self.assertEqual(len(self.queue.requests), 2)
+
+        message, d = self.queue.requests[1]
+        self.assertEqual(message.attempts, 1)
+        d.errback(error.ConnectionRefusedError())
+
+        # second retry waits twice as long
+        self.clock.advance(self.queue.RETRY_DELAY)
+        self.assertEqual(len(self.queue.requests), 2)
+        self.clock.advance(self.queue.RETRY_DELAY)
+        self.assertEqual(len(self.queue.requests), 3)
+
+        self.queue.requests[2][1].callback(None)
+        self.assertEqual(self.queue.queueDepth(), 0)
+
+
+    def testNoRetryOnFault(self):
+
+        self.queue.send('http://requester/', 'action', 'payload')
+        self.queue.requests[0][1].errback(WebError(500, b'Internal Server Error', b'<fault/>'))
+
+        self.clock.advance(self.queue.MAX_RETRY_DELAY)
+        self.assertEqual(len(self.queue.requests), 1)
+        self.assertEqual(self.queue.queueDepth(), 0)
+
+
+
+    def testStoreFailure(self):
+
+        queue = TestDeliveryQueue(self.clock, persistent=True)
+
+        d = queue.send('http://requester/', 'action', 'payload')
+        self.failUnless(d.called)
+        self.assertEqual(len(queue.requests), 1) # sent without waiting for the database
+
+        queue.saves[0][1].errback(Exception('Database down'))
+        self.assertIdentical(queue.requests[0][0].db_message, None)
+
+        queue.requests[0][1].callback(None)
+        self.assertEqual(queue.queueDepth(), 0)
+
+
+    def testStoredAfterDelivery(self):
+
+        queue = TestDeliveryQueue(self.clock, persistent=True)
+
+        queue.send('http://requester/', 'action', 'payload-1')
+        queue.send('http://requester/', 'action', 'payload-2')
+
+        # first is delivered before it is stored, so the row is removed when the store completes
+        queue.requests[0][1].callback(None)
+        dbm1 = DBMessage()
+        queue.saves[0][1].callback(dbm1)
+        self.failUnless(dbm1.deleted)
+
+        # second is stored first, and removed on delivery
+        dbm2 = DBMessage()
+        queue.saves[1][1].callback(dbm2)
+        self.failIf(dbm2.deleted)
+        queue.requests[1][1].callback(None)
+        self.failUnless(dbm2.deleted)
@@ -0,0 +1,62 @@
+from twisted.trial import unittest
+from twisted.internet import reactor, defer
+from twisted.web import server, resource
+from twisted.web.error import Error as WebError
+
+from opennsa.protocols.shared import httpclient
+
+
+
+class EchoResource(resource.Resource):
+
+    isLeaf = True
+
+    def __init__(self):
+        resource.Resource.__init__(self)
+        self.clients = []
+
+    def render_POST(self, request):
+        self.clients.append(request.getClientAddress().port)
+        if request.getHeader('soapaction') == 'fault':
+            request.setResponseCode(500)
+        return request.content.read()
+
+
+
+class HTTPClientTest(unittest.TestCase):
+
+    def setUp(self):
+        self.resource = EchoResource()
+        self.port = reactor.listenTCP(0, server.Site(self.resource), interface='127.0.0.1')
+        self.url = 'http://127.0.0.1:%i/' % self.port.getHost().port
+
+
+    @defer.inlineCallbacks
+    def tearDown(self):
+        yield httpclient.closeConnections()
+        yield self.port.stopListening()
+
+
+    @defer.inlineCallbacks
+    def testConnectionReuse(self):
+
+        data = yield httpclient.soapRequest(self.url, 'action', '<payload/>')
+        self.assertEqual(data, b'<payload/>')
+
+        data = yield httpclient.soapRequest(self.url, 'action', '<payload2/>')
+        self.assertEqual(data, b'<payload2/>')
+
+        # both requests over the same connection
+        self.assertEqual(len(set(self.resource.clients)), 1)
+
+
+    @defer.inlineCallbacks
+    def testFault(self):
+
+        try:
+            yield httpclient.soapRequest(self.url, 'fault', '<fault/>')
+            self.fail('Request should have failed')
+        except WebError as e:
+            self.assertEqual(e.status, b'500')
+            self.assertEqual(e.response, b'<fault/>')
+
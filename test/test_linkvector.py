@@ -1,7 +1,13 @@
+import io
+
+from twisted.internet import defer
 from twisted.trial import unittest
 
+from opennsa import nsa, setup, aggregator, database, constants as cnt
 from opennsa.topology import linkvector
 
+from . import topology
+
 
 ARUBA_PORT       = 'aruba'
 BONAIRE_PORT     = 'bonaire'
@@ -74,3 +80,152 @@ class LinkVectorTest(unittest.TestCase):
         self.assertEqual( self.rv.vector(CURACAO_TOPO), None)
 
 
+
+
+    def testIncrementalUpdate(self):
+
+        updates = []
+        self.rv.callOnUpdate(lambda : updates.append(self.rv.listVectors()))
+
+        changed = self.rv.updateVector(ARUBA_PORT, { ARUBA_TOPO : 1, BONAIRE_TOPO : 2 } )
+        self.assertEqual(changed, set( [ ARUBA_TOPO, BONAIRE_TOPO ] ))
+        self.assertEqual(len(updates), 1)
+
+        # same vector again (next fetch cycle), nothing changes
+        changed = self.rv.updateVector(ARUBA_PORT, { ARUBA_TOPO : 1, BONAIRE_TOPO : 2 } )
+        self.assertEqual(changed, set())
+        self.assertEqual(len(updates), 1)
+
+        # more expensive path, not used
+        changed = self.rv.updateVector(BONAIRE_PORT, { BONAIRE_TOPO : 3 } )
+        self.assertEqual(changed, set())
+        self.assertEqual(len(updates), 1)
+
+        # cheaper path, only bonaire changes
+        changed = self.rv.updateVector(BONAIRE_PORT, { BONAIRE_TOPO : 1 } )
+        self.assertEqual(changed, set( [ BONAIRE_TOPO ] ))
+        self.assertEqual(updates[-1], { ARUBA_TOPO : 1, BONAIRE_TOPO : 1 } )
+        self.assertEqual(self.rv.vector(BONAIRE_TOPO), BONAIRE_PORT)
+
+        # same cost via another port, the exported vectors are the same
+        self.rv.updateVector(CURACAO_PORT, { ARUBA_TOPO : 1 } )
+        changed = self.rv.updateVector(ARUBA_PORT, { ARUBA_TOPO : 2 } )
+        self.assertEqual(changed, set( [ ARUBA_TOPO ] ))
+        self.assertEqual(self.rv.vector(ARUBA_TOPO), CURACAO_PORT)
+        self.assertEqual(len(updates), 2)
+
+
+    def testDeleteVector(self):
+
+        self.rv.updateVector(ARUBA_PORT, { ARUBA_TOPO : 1, BONAIRE_TOPO : 2 } )
+        self.rv.updateVector(BONAIRE_PORT, { BONAIRE_TOPO : 3 } )
+
+        updates = []
+        self.rv.callOnUpdate(lambda : updates.append(self.rv.listVectors()))
+
+        changed = self.rv.deleteVector(ARUBA_PORT)
+        self.assertEqual(changed, set( [ ARUBA_TOPO, BONAIRE_TOPO ] ))
+        self.assertEqual(updates, [ { BONAIRE_TOPO : 3 } ])
+        self.assertEqual(self.rv.vector(ARUBA_TOPO), None)
+        self.assertEqual(self.rv.vector(BONAIRE_TOPO), BONAIRE_PORT)
+
+        self.assertEqual(self.rv.deleteVector(ARUBA_PORT), set())
+
+
+    def testMultiplePorts(self):
+
+        self.rv.updateVector(ARUBA_PORT,    { ARUBA_TOPO : 1, CURACAO_TOPO : 3 } )
+        self.rv.updateVector(BONAIRE_PORT,  { ARUBA_TOPO : 1, CURACAO_TOPO : 2 } )
+        self.rv.updateVector(DOMINICA_PORT, { ARUBA_TOPO : 2 } )
+
+        # equal cost ports only, in port update order
+        self.assertEqual( self.rv.vectorPorts(ARUBA_TOPO),   [ ARUBA_PORT, BONAIRE_PORT ] )
+        self.assertEqual( self.rv.vectorPorts(CURACAO_TOPO), [ BONAIRE_PORT ] )
+        self.assertEqual( self.rv.vectorPorts(BONAIRE_TOPO), [] )
+        self.assertEqual( self.rv.vector(ARUBA_TOPO), ARUBA_PORT )
+
+        # first port gone, the alternative becomes the vector
+        self.rv.deleteVector(ARUBA_PORT)
+        self.assertEqual( self.rv.vectorPorts(ARUBA_TOPO), [ BONAIRE_PORT ] )
+        self.assertEqual( self.rv.vector(ARUBA_TOPO), BONAIRE_PORT )
+
+
+    def testCostSlackAndMaxPorts(self):
+
+        self.rv = linkvector.LinkVector( [ LOCAL_TOPO ], max_ports=2, cost_slack=1 )
+
+        self.rv.updateVector(ARUBA_PORT,    { CURACAO_TOPO : 3 } )
+        self.rv.updateVector(BONAIRE_PORT,  { CURACAO_TOPO : 2 } )
+        self.rv.updateVector(CURACAO_PORT,  { CURACAO_TOPO : 4 } )
+        self.assertEqual( self.rv.vectorPorts(CURACAO_TOPO), [ BONAIRE_PORT, ARUBA_PORT ] )
+
+        self.rv.updateVector(DOMINICA_PORT, { CURACAO_TOPO : 2 } )
+        self.assertEqual( self.rv.vectorPorts(CURACAO_TOPO), [ BONAIRE_PORT, DOMINICA_PORT ] )
+        self.failUnlessEquals( self.rv.listVectors(), { CURACAO_TOPO : 2 } )
+
+
+    def testPathSubscribers(self):
+
+        changes = []
+        self.rv.callOnUpdate(changes.append, paths=True)
+
+        self.rv.updateVector(ARUBA_PORT, { ARUBA_TOPO : 1, BONAIRE_TOPO : 2 } )
+        self.assertEqual(changes, [ set( [ ARUBA_TOPO, BONAIRE_TOPO ] ) ])
+
+        # alternative port, the exported vectors are the same, but the paths are not
+        updates = []
+        self.rv.callOnUpdate(lambda : updates.append(self.rv.listVectors()))
+        self.rv.updateVector(BONAIRE_PORT, { BONAIRE_TOPO : 2 } )
+        self.assertEqual(changes[-1], set( [ BONAIRE_TOPO ] ))
+        self.assertEqual(updates, [])
+
+        self.rv.updateVector(BONAIRE_PORT, { BONAIRE_TOPO : 2 } )
+        self.assertEqual(len(changes), 2)
+
+
+
+class DemarcationCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        nrm_map = io.StringIO(topology.ARUBA_TOPOLOGY)
+        _, nml_network, self.link_vector = setup.setupTopology(nrm_map, 'aruba:topology', 'aruba.net')
+        self.aggregator = aggregator.Aggregator('aruba:topology', None, nml_network, self.link_vector, None, None, [], None)
+
+
+    def testVectorUpdateInvalidates(self):
+
+        demarcations = self.aggregator._demarcationPorts('bonaire')
+        self.assertEqual( [ d[0].id_ for d in demarcations ], [ 'aruba:topology:bon' ] )
+
+        hits = self.aggregator.demarcation_cache.hits.value
+        self.assertIdentical(self.aggregator._demarcationPorts('bonaire'), demarcations)
+        self.assertEqual(self.aggregator.demarcation_cache.hits.value, hits + 1)
+
+        # parallel path via dominica
+        self.link_vector.updateVector('dom', { 'bonaire' : 1 } )
+        demarcations = self.aggregator._demarcationPorts('bonaire')
+        self.assertEqual( [ d[0].id_ for d in demarcations ], [ 'aruba:topology:bon', 'aruba:topology:dom' ] )
+
+
+    @defer.inlineCallbacks
+    def testRankDemarcationPorts(self):
+
+        self.link_vector.updateVector('dom', { 'bonaire' : 1 } )
+        demarcations = self.aggregator._demarcationPorts('bonaire')
+        self.assertEqual( [ d[0].id_ for d in demarcations ], [ 'aruba:topology:bon', 'aruba:topology:dom' ] )
+
+        # bon (1000) cannot carry another 400 on top of 700, dom (500) can, though it has fewer free labels
+        # the last row has a bandwidth different from the requested one
+        label = lambda value : nsa.Label(cnt.ETHERNET_VLAN, value)
+        rows = [ ('aruba:topology', 'bon', label('1780'), 'aruba:topology', 'ps', label('1780'), 700),
+                 ('aruba:topology', 'dom', label('1781'), 'aruba:topology', 'ps', label('1781'), 10),
+                 ('aruba:topology', 'dom', label('1782'), 'aruba:topology', 'ps', label('1782'), 10) ]
+        self.patch(database, 'getPortUsage', lambda *args : defer.succeed(rows))
+
+        schedule = nsa.Schedule(None, None)
+        ranked = yield self.aggregator._rankDemarcationPorts(demarcations, schedule, 400)
+        self.assertEqual( [ d[0].id_ for d in ranked ], [ 'aruba:topology:dom', 'aruba:topology:bon' ] )
+
+        # without the bandwidth constraint, the port with most free labels comes first
+        ranked = yield self.aggregator._rankDemarcationPorts(demarcations, schedule, 100)
+        self.assertEqual( [ d[0].id_ for d in ranked ], [ 'aruba:topology:bon', 'aruba:topology:dom' ] )
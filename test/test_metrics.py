@@ -0,0 +1,63 @@
+from twisted.trial import unittest
+from twisted.internet import task
+
+from opennsa import metrics
+
+
+
+class MetricsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = metrics.MetricsRegistry()
+
+
+    def testCounter(self):
+
+        self.registry.counter('test.counter').increment()
+        self.registry.counter('test.counter').increment(2)
+
+        self.assertEqual(self.registry.snapshot(), { 'test.counter' : 3 } )
+
+
+    def testSample(self):
+
+        s = self.registry.sample('test.sample')
+        for v in (1, 2, 6):
+            s.add(v)
+
+        self.assertEqual(self.registry.snapshot()['test.sample'], { 'count' : 3, 'mean' : 3.0, 'min' : 1, 'max' : 6 } )
+
+
+    def testGauge(self):
+
+        values = [ 1, 2 ]
+        self.registry.gauge('test.gauge', lambda : len(values))
+        values.append(3)
+
+        self.assertEqual(self.registry.snapshot()['test.gauge'], 3)
+
+
+    def testTypeMismatch(self):
+
+        self.registry.counter('test.metric')
+        self.assertRaises(AssertionError, self.registry.sample, 'test.metric')
+
+
+
+class ReactorLagMonitorTest(unittest.TestCase):
+
+    def testLag(self):
+
+        clock = task.Clock()
+        monitor = metrics.ReactorLagMonitor(clock)
+        monitor.startService()
+
+        clock.advance(monitor.INTERVAL)
+        self.assertEqual(monitor.last_lag, 0)
+
+        clock.advance(monitor.INTERVAL + 0.5) # reactor blocked
+        self.assertAlmostEqual(monitor.last_lag, 0.5)
+        self.failUnless(metrics.sample('reactor.lag').max > 0.4)
+
+        monitor.stopService()
+        self.failIf(clock.getDelayedCalls())
@@ -0,0 +1,59 @@
+from twisted.trial import unittest
+
+from opennsa.protocols.shared import minisoap
+
+
+
+class PayloadParsingTest(unittest.TestCase):
+
+    def testRoundTrip(self):
+
+        payload = minisoap.createSoapPayload()
+        headers, bodies = minisoap.parseSoapPayload(payload)
+        self.assertEqual(headers, [])
+        self.assertEqual(bodies, [])
+
+
+    def testSizeLimit(self):
+
+        payload = b'<a>' + b' ' * 1000 + b'</a>'
+        self.assertEqual(minisoap.parsePayload(payload, max_size=2000).tag, 'a')
+        self.assertRaises(minisoap.PayloadError, minisoap.parsePayload, payload, max_size=1000)
+
+
+    def testDepthLimit(self):
+
+        payload = b'<a>' * 10 + b'</a>' * 10
+        minisoap.parsePayload(payload, max_depth=10)
+        self.assertRaises(minisoap.PayloadError, minisoap.parsePayload, payload, max_depth=9)
+
+
+    def testEntityExpansion(self):
+
+        payload = b'<?xml version="1.0"?><!DOCTYPE lolz [<!ENTITY lol "lol"><!ENTITY lol2 "&lol;&lol;&lol;">]><lolz>&lol2;</lolz>'
+        self.assertRaises(minisoap.PayloadError, minisoap.parsePayload, payload)
+
+
+    def testMarkupAcrossChunks(self):
+
+        # forbidden markup split over the chunk boundary
+        prefix = b'<!--' + b' ' * (minisoap.PARSE_CHUNK_SIZE - 8) + b'-->'
+        payload = prefix + b'<!DOCTYPE a><a/>'
+        self.assertRaises(minisoap.PayloadError, minisoap.parsePayload, payload)
+
+
+    def testInvalidXML(self):
+
+        self.assertRaises(minisoap.PayloadError, minisoap.parsePayload, b'<a><b></a>')
+        self.assertRaises(minisoap.PayloadError, minisoap.parsePayload, b'')
+
+
+
+    def testReplySize(self):
+
+        # replies, e.g., query results, are allowed to be larger than requests
+        payload = minisoap.createSoapPayload(pretty_print=False)
+        payload = payload.replace(b'<soap:Body', b'<!-- ' + b' ' * minisoap.MAX_PAYLOAD_SIZE + b' --><soap:Body', 1)
+        self.assertRaises(minisoap.PayloadError, minisoap.parseSoapPayload, payload)
+        headers, bodies = minisoap.parseSoapPayload(payload, minisoap.MAX_REPLY_SIZE)
+        self.assertEqual(bodies, [])
@@ -0,0 +1,51 @@
+from twisted.trial import unittest
+from twisted.internet import defer, task
+
+from opennsa import nsa, error
+from opennsa.protocols.nsi2 import provider
+
+
+PROVIDER_NSA    = 'urn:ogf:network:example.net:2013:nsa'
+REQUESTER_NSA   = 'urn:ogf:network:example.org:2013:nsa'
+REPLY_TO        = 'http://requester.example.org/NSI/services/RequesterService2'
+
+
+
+class FakeServiceProvider:
+
+    def provision(self, header, connection_id, request_info):
+        return defer.succeed(connection_id)
+
+    def querySummary(self, header, connection_ids, global_reservation_ids, request_info):
+        return defer.succeed(None) # never confirmed
+
+
+
+class ProviderNotificationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = task.Clock()
+        self.provider = provider.Provider(FakeServiceProvider(), None, notification_ttl=60, clock=self.clock)
+
+
+    def testExpiry(self):
+
+        header = nsa.NSIHeader(REQUESTER_NSA, PROVIDER_NSA, 'urn:uuid:1', REPLY_TO)
+        self.provider.provision(header, 'conn-1', None)
+
+        header = nsa.NSIHeader(REQUESTER_NSA, PROVIDER_NSA, 'urn:uuid:2', REPLY_TO)
+        qd = self.provider.querySummarySync(header, [ 'conn-1' ], None, None)
+        self.assertEqual(len(self.provider.notifications), 2)
+
+        self.clock.advance(61)
+        header = nsa.NSIHeader(REQUESTER_NSA, PROVIDER_NSA, 'urn:uuid:3', REPLY_TO)
+        self.provider.provision(header, 'conn-2', None)
+
+        # expired entries are swept on the next insert, pending query is failed
+        self.assertEqual(len(self.provider.notifications), 1)
+        self.assertEqual(self.provider.notifications.expired.value, 2)
+        self.failureResultOf(qd, error.CallbackTimeoutError)
+
+        # late confirmation is ignored
+        d = self.provider.provisionConfirmed(None, 'conn-1')
+        self.assertEqual(self.successResultOf(d), None)
@@ -0,0 +1,79 @@
+"""
+Benchmarks for path finding in the NML topology model.
+
+These run as part of the test suite, but only check that the results are
+sane, timings are logged (run trial with --reporter=bwverbose and look in
+_trial_temp/test.log).
+"""
+
+import timeit
+
+from twisted.python import log
+from twisted.trial import unittest
+
+from opennsa import nsa, constants as cnt
+
+from . import topology
+from .test_topology import createTopology
+
+
+LOG_SYSTEM = 'PathBenchmark'
+
+VLANS = 'vlan:1780-1799' # same vlans on all links, so all loop-free paths are valid
+ROUNDS = 3
+
+
+
+def _time(func, rounds=ROUNDS):
+    return min(timeit.repeat(func, number=1, repeat=rounds))
+
+
+def _stps(n_networks):
+    label = nsa.Label(cnt.ETHERNET_VLAN, '1780-1799')
+    source = nsa.STP('net00', 'net00:ps', label)
+    dest   = nsa.STP('net%02i' % (n_networks // 2), 'net%02i:ps' % (n_networks // 2), label)
+    return source, dest
+
+
+
+class PathfindingBenchmark(unittest.TestCase):
+
+    def testCompareRecursion(self):
+
+        n_networks = 16
+        nml_topology = createTopology(topology.createMeshTopology(n_networks, 10, vlans=VLANS))
+        source, dest = _stps(n_networks)
+
+        recurse  = lambda : nml_topology._findPathsRecurse(source, dest, 100)
+        shortest = lambda : nml_topology.findPaths(source, dest, 100)
+
+        all_paths = recurse()
+        paths = shortest()
+        recurse_time  = _time(recurse)
+        shortest_time = _time(shortest)
+
+        log.msg('%i networks: recursion %.4fs (%i paths), shortest paths %.4fs (%i paths)' % \
+                (n_networks, recurse_time, len(all_paths), shortest_time, len(paths)), system=LOG_SYSTEM)
+
+        self.assertEqual(len(paths), nml_topology.MAX_PATHS)
+        self.assertEqual( [ len(p) for p in paths ], [ len(p) for p in all_paths[:len(paths)] ])
+        self.failUnless(shortest_time < recurse_time)
+
+
+    def testLargeMesh(self):
+
+        # too large for the recursion
+        n_networks = 40
+        nml_topology = createTopology(topology.createMeshTopology(n_networks, 40, vlans=VLANS))
+        source, dest = _stps(n_networks)
+
+        shortest = lambda : nml_topology.findPaths(source, dest, 100)
+        paths = shortest()
+        shortest_time = _time(shortest)
+
+        log.msg('%i networks: shortest paths %.4fs (%i paths)' % (n_networks, shortest_time, len(paths)), system=LOG_SYSTEM)
+
+        lengths = [ len(p) for p in paths ]
+        self.assertEqual(len(paths), nml_topology.MAX_PATHS)
+        self.assertEqual(lengths, sorted(lengths))
+
@@ -806,6 +806,104 @@ class DUDBackendTest(GenericProviderTest, unittest.TestCase):
     testHairpinConnection.skip = 'Tested in aggregator'
 
 
+    @defer.inlineCallbacks
+    def testEndtimeBatchFailure(self):
+
+        # two connections with the same end time, ending the first fails
+        from opennsa.backends.common import genericbackend
+
+        failing_cid = yield self._reserveCommit(self.provider, '1781')
+        cid         = yield self._reserveCommit(self.provider, '1782')
+
+        passedEndtime = genericbackend.state.passedEndtime
+        def failingPassedEndtime(conn):
+            if conn.connection_id == failing_cid:
+                return defer.fail(error.InternalServerError('Cannot save connection %s' % conn.connection_id))
+            return passedEndtime(conn)
+        self.patch(genericbackend.state, 'passedEndtime', failingPassedEndtime)
+
+        freed = defer.Deferred()
+        doFreeResources = self.backend._doFreeResources
+        def recordFreeResources(conns):
+            d = doFreeResources(conns)
+            d.addCallback(lambda _ : freed.callback( [ conn.connection_id for conn in conns ] ))
+            return d
+        self.patch(self.backend, '_doFreeResources', recordFreeResources)
+
+        self.clock.advance(11)
+
+        freed_cids = yield freed
+        self.failUnlessEqual(freed_cids, [ cid ])
+        self.failIf(cid in self.backend.calendar_entries)
+        self.failUnless(failing_cid in self.backend.calendar_entries)
+        self.failUnlessEqual(len(self.flushLoggedErrors(error.InternalServerError)), 1)
+
+
+    def _reserveCommit(self, provider, vlan):
+        source_stp = nsa.STP(self.network, self.source_port, nsa.Label(cnt.ETHERNET_VLAN, vlan) )
+        dest_stp   = nsa.STP(self.network, self.dest_port,   nsa.Label(cnt.ETHERNET_VLAN, vlan) )
+        criteria   = nsa.Criteria(0, self.schedule, nsa.Point2PointService(source_stp, dest_stp, 100, cnt.BIDIRECTIONAL, False, None) )
+
+        @defer.inlineCallbacks
+        def reserveCommit():
+            self.requester.reserve_defer        = defer.Deferred()
+            self.requester.reserve_commit_defer = defer.Deferred()
+
+            self.header.newCorrelationId()
+            cid = yield provider.reserve(self.header, None, None, None, criteria)
+            yield self.requester.reserve_defer
+
+            yield provider.reserveCommit(self.header, cid)
+            yield self.requester.reserve_commit_defer
+            defer.returnValue(cid)
+
+        return reserveCommit()
+
+
+    @defer.inlineCallbacks
+    def testReserveDuringSnapshotRestore(self):
+
+        from opennsa.backends.common import genericbackend
+
+        cid = yield self._reserveCommit(self.backend, '1781')
+
+        self.backend.snapshot_file = self.mktemp()
+        yield self.backend._writeCalendarSnapshot()
+
+        # restart, the schedule is built by hand, so the walk can be held while a connection is reserved
+        self.patch(genericbackend.reactor, 'callWhenRunning', lambda f, *args : None)
+        nrm_ports = nrm.parsePortSpec(io.StringIO(topology.ARUBA_TOPOLOGY))
+        backend = dud.DUDNSIBackend(self.network, nrm_ports, self.requester, {})
+        backend.scheduler.clock = self.clock
+        backend.snapshot_file = self.backend.snapshot_file
+        self.addCleanup(backend.stopService)
+
+        walk_gate = defer.Deferred()
+        find = genericbackend.GenericBackendConnections.find
+        def gatedFind(*args, **kwargs):
+            if 'id > ?' in kwargs['where'][0] and not walk_gate.called:
+                return walk_gate.addCallback(lambda _ : find(*args, **kwargs))
+            return find(*args, **kwargs)
+        self.patch(genericbackend.GenericBackendConnections, 'find', gatedFind)
+
+        backend.buildSchedule()
+        yield backend.calendar_defer
+        self.failIf(backend.restore_defer.called)
+
+        cid2 = yield self._reserveCommit(backend, '1782')
+
+        walk_gate.callback(None)
+        yield backend.restore_defer
+
+        self.failUnlessEqual(sorted(backend.calendar_entries), sorted( [ cid, cid2 ] ))
+        # a single calendar reservation for each resource
+        for source_resource, dest_resource, _, _ in backend.calendar_entries.values():
+            self.failUnlessEqual(len(backend.calendar.reservations[source_resource]), 1)
+            self.failUnlessEqual(len(backend.calendar.reservations[dest_resource]), 1)
+        # one scheduled call for the connection reserved during the restore
+        self.failUnless(backend.scheduler.hasScheduledCall(cid2))
+
+
 
 class AggregatorTest(GenericProviderTest, unittest.TestCase):
 
@@ -0,0 +1,136 @@
+from twisted.trial import unittest
+from twisted.internet import defer, task, address
+from twisted.web import server
+from twisted.web.test.requesthelper import DummyRequest
+
+from opennsa import metrics
+from opennsa.protocols.shared import ratelimit, soapresource, minisoap
+
+
+
+class RateLimiterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = task.Clock()
+
+
+    def testTokenBucket(self):
+
+        limiter = ratelimit.RateLimiter(rate=2, burst=3, clock=self.clock)
+
+        for _ in range(3):
+            self.assertIdentical(limiter.acquire('a'), None)
+            limiter.release('a')
+
+        err = limiter.acquire('a')
+        self.assertIsInstance(err, ratelimit.RateLimitExceeded)
+        self.assertEqual(err.errorId, '00600')
+        self.assertEqual(err.retry_after, 1)
+
+        # other requesters have their own bucket
+        self.assertIdentical(limiter.acquire('b'), None)
+
+        self.clock.advance(0.5) # one token
+        self.assertIdentical(limiter.acquire('a'), None)
+        self.assertIsInstance(limiter.acquire('a'), ratelimit.RateLimitExceeded)
+
+        self.clock.advance(100) # never more than burst
+        for _ in range(3):
+            self.assertIdentical(limiter.acquire('a'), None)
+        self.assertIsInstance(limiter.acquire('a'), ratelimit.RateLimitExceeded)
+
+
+    def testMaxInflight(self):
+
+        limiter = ratelimit.RateLimiter(max_inflight=2, clock=self.clock)
+
+        self.assertIdentical(limiter.acquire('a'), None)
+        self.assertIdentical(limiter.acquire('a'), None)
+        self.assertIsInstance(limiter.acquire('a'), ratelimit.RateLimitExceeded)
+
+        limiter.release('a')
+        self.assertIdentical(limiter.acquire('a'), None)
+
+
+    def testRejectionCounters(self):
+
+        limiter = ratelimit.RateLimiter(rate=1, burst=1, clock=self.clock)
+        total = metrics.counter('ratelimit.rejected').value
+        requester = metrics.counter('ratelimit.rejected.requester.example.org').value
+
+        limiter.acquire('requester.example.org')
+        limiter.acquire('requester.example.org')
+        limiter.acquire('requester.example.org')
+
+        self.assertEqual(metrics.counter('ratelimit.rejected').value, total + 2)
+        self.assertEqual(metrics.counter('ratelimit.rejected.requester.example.org').value, requester + 2)
+
+
+
+class SOAPResourceLimitTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = task.Clock()
+        self.limiter = ratelimit.RateLimiter(max_inflight=1, clock=self.clock)
+        self.soap_resource = soapresource.SOAPResource(limiter=self.limiter)
+        self.replies = []
+        self.soap_resource.registerDecoder('"test"', self.decode)
+
+
+    def decode(self, soap_data, request_info):
+        d = defer.Deferred()
+        self.replies.append(d)
+        return d
+
+
+    def _request(self, payload=b'<payload/>'):
+        request = DummyRequest([b''])
+        request.method = b'POST'
+        request.isSecure = lambda : False
+        request.client = address.IPv4Address('TCP', '192.0.2.1', 40000)
+        request.requestHeaders.setRawHeaders('soapaction', [ '"test"' ])
+        request.content = DummyContent(payload)
+        return request
+
+
+    def testRejectInflight(self):
+
+        request = self._request()
+        self.assertEqual(self.soap_resource.render_POST(request), server.NOT_DONE_YET)
+
+        rejected = self._request()
+        payload = self.soap_resource.render_POST(rejected)
+        self.assertEqual(rejected.responseCode, 429)
+        self.assertEqual(rejected.responseHeaders.getRawHeaders('retry-after'), [ '1' ])
+        self.failUnless(b'Too many requests' in payload)
+        self.assertEqual(len(self.replies), 1)
+
+        # answering the request releases it
+        self.replies[0].callback(b'<reply/>')
+        self.assertEqual(self.soap_resource.render_POST(self._request()), server.NOT_DONE_YET)
+        self.assertEqual(len(self.replies), 2)
+
+
+    def testPayloadTooLarge(self):
+
+        payload = b'<payload>' + b' ' * minisoap.MAX_PAYLOAD_SIZE + b'</payload>'
+
+        request = self._request(payload)
+        self.assertEqual(self.soap_resource.render_POST(request), b'Payload too large\r\n')
+        self.assertEqual(request.responseCode, 413)
+
+        # resources receiving replies from peers allow larger payloads
+        reply_resource = soapresource.SOAPResource(replies=True)
+        reply_resource.registerDecoder('"test"', self.decode)
+        self.assertEqual(reply_resource.render_POST(self._request(payload)), server.NOT_DONE_YET)
+
+
+
+class DummyContent(object):
+
+    def __init__(self, data):
+        self.data = data
+
+    def read(self, size=-1):
+        return self.data
+
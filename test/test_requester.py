@@ -0,0 +1,49 @@
+from twisted.trial import unittest
+from twisted.internet import task
+
+from opennsa import nsa, error, metrics
+from opennsa.shared import timerwheel
+from opennsa.protocols.nsi2 import requester
+
+
+PROVIDER_NSA = 'urn:ogf:network:example.net:2013:nsa'
+
+
+
+class RequesterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = task.Clock()
+        self.requester = requester.Requester(None, callback_timeout=10, timeout_wheel=timerwheel.TimerWheel(clock=self.clock))
+
+
+    def testCallbackTimeout(self):
+
+        d1 = self.requester.addCall(PROVIDER_NSA, 'c1', requester.PROVISION)
+        d2 = self.requester.addCall(PROVIDER_NSA, 'c2', requester.RELEASE)
+        self.assertEqual(self.requester.outstandingCalls(), { PROVIDER_NSA : 2 } )
+
+        self.requester.triggerCall(PROVIDER_NSA, 'c1', requester.PROVISION, 'conn-1')
+        self.assertEqual(self.successResultOf(d1), 'conn-1')
+
+        self.clock.pump( [1] * 11 )
+        self.failureResultOf(d2, error.CallbackTimeoutError)
+        self.assertEqual(self.requester.outstandingCalls(), {} )
+        self.failIf(self.clock.getDelayedCalls())
+
+
+    def testNotificationBuffering(self):
+
+        dropped = metrics.counter('requester.notifications_dropped').value
+        header = nsa.NSIHeader('urn:requester', PROVIDER_NSA)
+
+        for i in range(requester.MAX_PENDING_NOTIFICATIONS + 5):
+            self.requester.dataPlaneStateChange(header, 'conn-1', i, None, (True, 0, True))
+
+        self.assertEqual(len(self.requester.notifications.pending), requester.MAX_PENDING_NOTIFICATIONS)
+        self.assertEqual(metrics.counter('requester.notifications_dropped').value - dropped, 5)
+
+        # oldest are dropped
+        d = self.requester.notifications.get()
+        event, _, data = self.successResultOf(d)
+        self.assertEqual( (event, data[1]), ('dataPlaneStateChange', 5) )
@@ -0,0 +1,91 @@
+import datetime
+
+from twisted.trial import unittest
+from twisted.internet import task
+
+from opennsa.backends.common import scheduler
+
+
+
+class SchedulerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = task.Clock()
+        self.sched = scheduler.CallScheduler()
+        self.sched.clock = self.clock
+        self.calls = []
+
+
+    def transitionTime(self, seconds):
+        return datetime.datetime.utcnow() + datetime.timedelta(seconds=seconds)
+
+
+    def testScheduleOrder(self):
+
+        self.sched.scheduleCall('c2', self.transitionTime(4), self.calls.append, 'c2')
+        self.sched.scheduleCall('c1', self.transitionTime(2), self.calls.append, 'c1')
+        self.sched.scheduleCall('c3', self.transitionTime(6), self.calls.append, 'c3')
+
+        # only a single timer should be armed
+        self.assertEqual(len(self.clock.getDelayedCalls()), 1)
+
+        self.clock.advance(3)
+        self.assertEqual(self.calls, ['c1'])
+        self.assertFalse(self.sched.hasScheduledCall('c1'))
+        self.assertTrue(self.sched.hasScheduledCall('c2'))
+
+        self.clock.advance(4)
+        self.assertEqual(self.calls, ['c1', 'c2', 'c3'])
+        self.assertEqual(len(self.clock.getDelayedCalls()), 0)
+
+
+    def testCancel(self):
+
+        self.sched.scheduleCall('c1', self.transitionTime(2), self.calls.append, 'c1')
+        self.sched.scheduleCall('c2', self.transitionTime(4), self.calls.append, 'c2')
+
+        self.sched.cancelCall('c1')
+        self.assertFalse(self.sched.hasScheduledCall('c1'))
+
+        # reschedule after cancel
+        self.sched.scheduleCall('c1', self.transitionTime(5), self.calls.append, 'c1-new')
+
+        self.clock.advance(6)
+        self.assertEqual(self.calls, ['c2', 'c1-new'])
+
+
+    def testCancelAll(self):
+
+        self.sched.scheduleCall('c1', self.transitionTime(2), self.calls.append, 'c1')
+        self.sched.scheduleCall('c2', self.transitionTime(4), self.calls.append, 'c2')
+
+        self.sched.cancelAllCalls()
+        self.assertEqual(len(self.clock.getDelayedCalls()), 0)
+
+        self.clock.advance(6)
+        self.assertEqual(self.calls, [])
+
+
+    def testDoubleSchedule(self):
+
+        self.sched.scheduleCall('c1', self.transitionTime(2), self.calls.append, 'c1')
+        self.assertRaises(AssertionError, self.sched.scheduleCall, 'c1', self.transitionTime(3), self.calls.append, 'c1')
+
+
+    def testBatchCall(self):
+
+        batches = []
+        self.sched.scheduleBatchCall('c1', self.transitionTime(2), batches.append, 'c1')
+        self.sched.scheduleBatchCall('c2', self.transitionTime(2), batches.append, 'c2')
+        self.sched.scheduleBatchCall('c3', self.transitionTime(2), batches.append, 'c3')
+        self.sched.scheduleBatchCall('c4', self.transitionTime(4), batches.append, 'c4')
+        self.sched.scheduleCall('c5', self.transitionTime(2), self.calls.append, 'c5')
+
+        self.sched.cancelCall('c2')
+
+        self.clock.advance(3)
+        self.assertEqual(batches, [ ['c1', 'c3'] ])
+        self.assertEqual(self.calls, ['c5'])
+
+        self.clock.advance(2)
+        self.assertEqual(batches, [ ['c1', 'c3'], ['c4'] ])
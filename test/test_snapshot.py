@@ -0,0 +1,43 @@
+import os
+import datetime
+
+from twisted.trial import unittest
+
+from opennsa.backends.common import snapshot
+
+
+
+class SnapshotTest(unittest.TestCase):
+
+    def setUp(self):
+        self.filename = self.mktemp()
+
+
+    def testRoundTrip(self):
+
+        start_time = datetime.datetime(2017, 3, 1, 12, 0, 0, 1234)
+        end_time   = datetime.datetime(2017, 3, 2, 12, 0, 0)
+
+        entries = { 'cid-1' : ('ps1780', 'bon1780', start_time, end_time),
+                    'cid-2' : ('ps1781', 'cur1781', None, None) }
+
+        snapshot.writeSnapshot(self.filename, 42, entries)
+        self.failIf(os.path.exists(self.filename + '.tmp'))
+
+        high_water_mark, loaded_entries = snapshot.readSnapshot(self.filename)
+        self.failUnlessEqual(high_water_mark, 42)
+        self.failUnlessEqual(loaded_entries, entries)
+
+
+    def testMissingFile(self):
+
+        self.failUnlessRaises(snapshot.SnapshotError, snapshot.readSnapshot, self.filename)
+
+
+    def testCorruptFile(self):
+
+        with open(self.filename, 'wb') as f:
+            f.write(b'not a snapshot')
+
+        self.failUnlessRaises(snapshot.SnapshotError, snapshot.readSnapshot, self.filename)
+
@@ -0,0 +1,260 @@
+"""
+Benchmarks for SOAP payload creation and logging.
+
+These run as part of the test suite, but only check that the results are
+sane, timings are logged (run trial with --reporter=bwverbose and look in
+_trial_temp/test.log).
+"""
+
+import io
+import timeit
+import datetime
+
+from twisted.python import log
+from twisted.trial import unittest
+from twisted.internet import reactor, defer, task
+
+from opennsa import nsa, logging, constants as cnt
+from opennsa.protocols.shared import minisoap, offload
+from opennsa.protocols.nsi2 import helper, queryhelper
+from opennsa.protocols.nsi2.bindings import nsiconnection, p2pservices
+
+
+LOG_SYSTEM = 'SOAPBenchmark'
+
+CORRELATION_ID = 'urn:uuid:5c5e4e1a-fe2e-11e6-9a3e-0800276d4a3d'
+REQUESTER   = 'urn:ogf:network:example.org:2013:nsa:requester'
+PROVIDER    = 'urn:ogf:network:example.net:2013:nsa:provider'
+NETWORK     = 'example.net:topology'
+
+QUERY_SIZE  = 1000 # connections in query summary result
+ROUNDS      = 5
+
+
+
+def createReserveElements():
+
+    header_element = helper.createProviderHeader(REQUESTER, PROVIDER, 'https://requester.example.org/NSI/services/RequesterService2',
+                                                 CORRELATION_ID)
+
+    schedule = nsiconnection.ScheduleType('2017-03-01T12:00:00Z', '2017-03-02T12:00:00Z')
+    service_def = p2pservices.P2PServiceBaseType(1000, cnt.BIDIRECTIONAL, True,
+                                                 'urn:ogf:network:%s:ps?vlan=1780' % NETWORK, 'urn:ogf:network:%s:bon?vlan=1781' % NETWORK, None, None)
+    criteria = nsiconnection.ReservationRequestCriteriaType(1, schedule, cnt.EVTS_AGOLE, service_def)
+    reservation = nsiconnection.ReserveType(None, 'urn:uuid:dfb9bf5c-0e46-4fe2-a6c0-9dc4e2f4ae82', 'Benchmark connection', criteria)
+
+    return reservation.xml(nsiconnection.reserve), header_element
+
+
+
+def createConnectionInfos(n_connections, n_children=0):
+
+    start_time = datetime.datetime(2017, 3, 1, 12, 0, 0)
+    end_time   = datetime.datetime(2017, 3, 2, 12, 0, 0)
+    states     = ('ReserveStart', 'Provisioned', 'Created', (True, 1, True))
+
+    def createCriteria(i, children=None):
+        source_stp  = nsa.STP(NETWORK, 'ps',  nsa.Label(cnt.ETHERNET_VLAN, str(1000 + i % 1000)))
+        dest_stp    = nsa.STP(NETWORK, 'bon', nsa.Label(cnt.ETHERNET_VLAN, str(2000 + i % 1000)))
+        sd          = nsa.Point2PointService(source_stp, dest_stp, 1000, cnt.BIDIRECTIONAL, False, None)
+        return nsa.QueryCriteria(0, nsa.Schedule(start_time, end_time), sd, children)
+
+    connection_infos = []
+    for i in range(n_connections):
+        children = [ nsa.ConnectionInfo('conn-%i-%i' % (i, c), None, None, cnt.EVTS_AGOLE, [ createCriteria(i) ],
+                                        PROVIDER, REQUESTER, states, None, None) for c in range(n_children) ]
+        ci = nsa.ConnectionInfo('conn-%i' % i, None, 'Connection %i' % i, cnt.EVTS_AGOLE, [ createCriteria(i, children) ],
+                                PROVIDER, REQUESTER, states, i, 0)
+        connection_infos.append(ci)
+
+    return connection_infos
+
+
+
+def createQuerySummaryElements(n_connections=QUERY_SIZE):
+
+    header_element = helper.createRequesterHeader(REQUESTER, PROVIDER, correlation_id=CORRELATION_ID)
+
+    qs_reservations = queryhelper.buildQuerySummaryResultType(createConnectionInfos(n_connections))
+    qsct = nsiconnection.QuerySummaryConfirmedType(qs_reservations)
+
+    return qsct.xml(nsiconnection.querySummaryConfirmed), header_element
+
+
+
+def createQueryRecursiveElements(n_connections=QUERY_SIZE, n_children=2):
+
+    header_element = helper.createRequesterHeader(REQUESTER, PROVIDER, correlation_id=CORRELATION_ID)
+
+    qr_reservations = queryhelper.buildQueryRecursiveResultType(createConnectionInfos(n_connections, n_children))
+    qrct = nsiconnection.QueryRecursiveConfirmedType(qr_reservations)
+
+    return qrct.xml(nsiconnection.queryRecursiveConfirmed), header_element
+
+
+
+def _time(func, rounds=ROUNDS):
+    return min(timeit.repeat(func, number=1, repeat=rounds))
+
+
+
+class SerializationBenchmark(unittest.TestCase):
+
+    def _compareModes(self, name, body_element, header_element):
+
+        # indenting modifies the elements, so the compact payload must be created first
+        pretty  = lambda : minisoap.createSoapPayload(body_element, header_element, pretty_print=True)
+        compact = lambda : minisoap.createSoapPayload(body_element, header_element, pretty_print=False)
+
+        compact_payload = compact()
+        compact_time = _time(compact)
+        pretty_payload = pretty()
+        pretty_time = _time(pretty)
+
+        log.msg('%s: pretty %.4fs, %i bytes. compact %.4fs, %i bytes' % \
+                (name, pretty_time, len(pretty_payload), compact_time, len(compact_payload)), system=LOG_SYSTEM)
+
+        self.failUnless(len(compact_payload) < len(pretty_payload))
+
+        # same content, regardless of mode
+        _, compact_body = minisoap.parseSoapPayload(compact_payload)
+        _, pretty_body  = minisoap.parseSoapPayload(pretty_payload)
+        self.assertEqual(compact_body[0].tag, pretty_body[0].tag)
+        self.assertEqual(len(list(compact_body[0].iter())), len(list(pretty_body[0].iter())))
+
+
+    def testReserveSerialization(self):
+
+        body_element, header_element = createReserveElements()
+        self._compareModes('reserve', body_element, header_element)
+
+
+    def testQuerySummarySerialization(self):
+
+        body_element, header_element = createQuerySummaryElements()
+        self._compareModes('querySummaryConfirmed', body_element, header_element)
+
+
+    def testDefaultMode(self):
+
+        body_element, header_element = createReserveElements()
+        payload = minisoap.createSoapPayload(body_element, header_element)
+        self.failIf(b'\n' in payload, 'Default payload mode should be compact')
+
+
+
+class CodecBenchmark(unittest.TestCase):
+
+    def _roundTrip(self, name, body_element, header_element):
+
+        payload = minisoap.createSoapPayload(body_element, header_element)
+
+        def decode():
+            return helper.parseRequest(payload)
+
+        def encode(header, body):
+            header_element = helper.createRequesterHeader(header.requester_nsa, header.provider_nsa, correlation_id=header.correlation_id)
+            return minisoap.createSoapPayload(body.xml(body_element.tag), header_element)
+
+        header, body = decode()
+        decode_time = _time(decode)
+        encode_time = _time(lambda : encode(header, body))
+
+        log.msg('%s (%i bytes): decode %.4fs, encode %.4fs' % (name, len(payload), decode_time, encode_time), system=LOG_SYSTEM)
+
+        # decoding and encoding again must give the same payload
+        self.assertEqual(encode(header, body), payload)
+
+
+    def testReserveRoundTrip(self):
+
+        body_element, header_element = createReserveElements()
+        header_element = helper.createRequesterHeader(REQUESTER, PROVIDER, correlation_id=CORRELATION_ID)
+        self._roundTrip('reserve', body_element, header_element)
+
+
+    def testQuerySummaryRoundTrip(self):
+
+        body_element, header_element = createQuerySummaryElements()
+        self._roundTrip('querySummaryConfirmed', body_element, header_element)
+
+
+    def testQueryRecursiveRoundTrip(self):
+
+        body_element, header_element = createQueryRecursiveElements()
+        self._roundTrip('queryRecursiveConfirmed', body_element, header_element)
+
+
+
+class PayloadLogBenchmark(unittest.TestCase):
+
+    def testDisabledPayloadLogging(self):
+
+        body_element, header_element = createQuerySummaryElements(100)
+        payload = minisoap.createSoapPayload(body_element, header_element)
+
+        # the way payloads were logged before, formatted and then dropped by the observer
+        publisher = log.LogPublisher()
+        publisher.addObserver(logging.DebugLogObserver(io.StringIO(), debug=False, payload=False).emit)
+        eager = lambda : publisher.msg(' -- Sending Payload --\n%s\n -- END. Sending Payload --' % payload, system=LOG_SYSTEM, payload=True)
+        lazy  = lambda : logging.payload(' -- Sending Payload --\n%s\n -- END. Sending Payload --', payload, system=LOG_SYSTEM)
+
+        self.failIf(logging.PAYLOAD)
+        eager_time = _time(eager, 1000)
+        lazy_time  = _time(lazy, 1000)
+
+        log.msg('payload log (%i bytes): eager %.2f us, lazy %.2f us' % (len(payload), eager_time * 1e6, lazy_time * 1e6), system=LOG_SYSTEM)
+        self.failUnless(lazy_time < eager_time)
+
+
+
+class OffloadBenchmark(unittest.TestCase):
+
+    def setUp(self):
+        self.thread_payload_size = offload.THREAD_PAYLOAD_SIZE
+
+
+    def tearDown(self):
+        offload.THREAD_PAYLOAD_SIZE = self.thread_payload_size
+
+
+    @defer.inlineCallbacks
+    def _decodeWithLag(self, payload):
+        # max reactor lag while decoding the payload, measured with a looping call
+        interval = 0.005
+        lags = []
+        expected = [ reactor.seconds() ]
+
+        def tick():
+            now = reactor.seconds()
+            lags.append(now - expected[0])
+            expected[0] = now + interval
+
+        lc = task.LoopingCall(tick)
+        lc.start(interval, now=False)
+        expected[0] = reactor.seconds() + interval
+        yield task.deferLater(reactor, interval * 2, lambda : None)
+
+        result = yield offload.decode(helper.parseRequest, payload)
+
+        yield task.deferLater(reactor, interval * 2, lambda : None)
+        lc.stop()
+        defer.returnValue( (result, max(lags)) )
+
+
+    @defer.inlineCallbacks
+    def testThreadedDecodeLag(self):
+
+        body_element, header_element = createQuerySummaryElements(QUERY_SIZE * 2)
+        payload = minisoap.createSoapPayload(body_element, header_element)
+
+        offload.THREAD_PAYLOAD_SIZE = 0
+        (inline_header, _), inline_lag = yield self._decodeWithLag(payload)
+
+        offload.THREAD_PAYLOAD_SIZE = len(payload)
+        (threaded_header, threaded_body), threaded_lag = yield self._decodeWithLag(payload)
+
+        log.msg('decode lag (%i bytes): inline %.1f ms, threaded %.1f ms' % (len(payload), inline_lag * 1e3, threaded_lag * 1e3), system=LOG_SYSTEM)
+        self.assertEqual(inline_header.correlation_id, threaded_header.correlation_id)
+        self.assertEqual(len(threaded_body.reservations), QUERY_SIZE * 2)
+        self.failUnless(threaded_lag < inline_lag)
@@ -0,0 +1,60 @@
+from twisted.trial import unittest
+
+from opennsa import constants as cnt
+from opennsa.protocols.shared import minisoap
+from opennsa.protocols.nsi2 import helper, templates
+from opennsa.protocols.nsi2.bindings import nsiconnection
+
+
+REQUESTER   = 'urn:ogf:network:example.org:2013:nsa:requester'
+PROVIDER    = 'urn:ogf:network:example.net:2013:nsa:provider'
+
+# values that needs escaping, and non-ascii
+CORRELATION_IDS = [ 'urn:uuid:5c5e4e1a-fe2e-11e6-9a3e-0800276d4a3d', 'urn:uuid:a&b<c>d', 'urn:uuid:æøå' ]
+
+
+
+def _bindingsAcknowledgement(protocol_type, correlation_id):
+    header_element = helper._createHeader(REQUESTER, PROVIDER, correlation_id=correlation_id, protocol_type=protocol_type)
+    body_element = nsiconnection.GenericAcknowledgmentType().xml(nsiconnection.acknowledgment)
+    return minisoap.createSoapPayload(body_element, header_element)
+
+
+def _bindingsConfirmed(element_name, correlation_id, connection_id):
+    header_element = helper.createRequesterHeader(REQUESTER, PROVIDER, correlation_id=correlation_id)
+    body_element = nsiconnection.GenericConfirmedType(connection_id).xml(element_name)
+    return minisoap.createSoapPayload(body_element, header_element)
+
+
+
+class TemplateTest(unittest.TestCase):
+
+    def testAcknowledgementEquivalence(self):
+
+        for protocol_type in (cnt.CS2_PROVIDER, cnt.CS2_REQUESTER):
+            for correlation_id in CORRELATION_IDS:
+                payload = templates.genericAcknowledgement(protocol_type, REQUESTER, PROVIDER, correlation_id)
+                self.assertEqual(payload, _bindingsAcknowledgement(protocol_type, correlation_id))
+
+
+    def testConfirmedEquivalence(self):
+
+        for element_name in (nsiconnection.provisionConfirmed, nsiconnection.releaseConfirmed, nsiconnection.terminateConfirmed,
+                             nsiconnection.reserveCommitConfirmed, nsiconnection.reserveAbortConfirmed):
+            for correlation_id in CORRELATION_IDS:
+                for connection_id in ('conn-1', 'a&b<>'):
+                    payload = templates.genericConfirmed(cnt.CS2_REQUESTER, element_name, REQUESTER, PROVIDER, correlation_id, connection_id)
+                    self.assertEqual(payload, _bindingsConfirmed(element_name, correlation_id, connection_id))
+
+
+    def testFallback(self):
+
+        self.assertEqual(templates.genericConfirmed(cnt.CS2_REQUESTER, nsiconnection.provisionConfirmed, REQUESTER, PROVIDER, CORRELATION_IDS[0], ''), None)
+        self.assertEqual(templates.genericAcknowledgement(cnt.CS2_PROVIDER, REQUESTER, None, CORRELATION_IDS[0]), None)
+
+        minisoap.PRETTY_PRINT = True
+        try:
+            self.assertEqual(templates.genericAcknowledgement(cnt.CS2_PROVIDER, REQUESTER, PROVIDER, CORRELATION_IDS[0]), None)
+        finally:
+            minisoap.PRETTY_PRINT = False
+
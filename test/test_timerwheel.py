@@ -0,0 +1,56 @@
+from twisted.trial import unittest
+from twisted.internet import task
+
+from opennsa.shared import timerwheel
+
+
+
+class TimerWheelTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = task.Clock()
+        self.wheel = timerwheel.TimerWheel(resolution=1, clock=self.clock)
+        self.fired = []
+
+
+    def testExpiry(self):
+
+        self.clock.advance(0.5)
+        self.wheel.add(2, self.fired.append, 'a')
+        self.wheel.add(5, self.fired.append, 'b')
+        self.assertEqual(len(self.wheel), 2)
+        self.assertEqual(len(self.clock.getDelayedCalls()), 1)
+
+        self.clock.pump( [1, 1] )
+        self.assertEqual(self.fired, []) # never early
+
+        self.clock.advance(1)
+        self.assertEqual(self.fired, [ 'a' ])
+
+        self.clock.pump( [1, 1, 1] )
+        self.assertEqual(self.fired, [ 'a', 'b' ])
+
+        # no timeouts, no delayed call
+        self.assertEqual(len(self.wheel), 0)
+        self.failIf(self.clock.getDelayedCalls())
+
+
+    def testCancel(self):
+
+        t = self.wheel.add(2, self.fired.append, 'a')
+        self.failUnless(self.wheel.cancel(t))
+        self.failIf(self.wheel.cancel(t))
+
+        self.clock.pump( [1, 1, 1] )
+        self.assertEqual(self.fired, [])
+        self.failIf(self.clock.getDelayedCalls())
+
+
+    def testFailingCallback(self):
+
+        self.wheel.add(1, lambda : 1/0)
+        self.wheel.add(1, self.fired.append, 'a')
+
+        self.clock.pump( [1, 1] )
+        self.assertEqual(self.fired, [ 'a' ])
+        self.assertEqual(len(self.flushLoggedErrors(ZeroDivisionError)), 1)
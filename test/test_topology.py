@@ -218,3 +218,143 @@ class TopologyTest(unittest.TestCase):
 
     testNoAvailableBandwidth.skip = 'Bandwidth currently not available in path finding'
 
+
+
+
+class TopologyIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.topology = nml.Topology()
+        self.nsa = nsa.NetworkServiceAgent('aruba:nsa', 'a-endpoint')
+        for name, spec in ( ('aruba', topology.ARUBA_TOPOLOGY), ('bonaire', topology.BONAIRE_TOPOLOGY) ):
+            network = nml.createNMLNetwork(nrm.parsePortSpec(StringIO(spec)), name, name)
+            self.topology.addNetwork(network, self.nsa)
+
+
+    def testGetPort(self):
+
+        network = self.topology.getNetwork('aruba')
+        self.assertEqual(network.getPort('aruba:bon').name, 'bon')
+        self.assertEqual(network.getPort('aruba:bon-in').name, 'bon-in')
+        self.assertRaises(error.STPUnavailableError, network.getPort, 'aruba:nosuchport')
+
+
+    def testGetNetworkPort(self):
+
+        network_id, port = self.topology.getNetworkPort('bonaire:aru-out')
+        self.assertEqual(network_id, 'bonaire')
+        self.assertEqual(port.name, 'aru-out')
+        self.assertRaises(error.TopologyError, self.topology.getNetworkPort, 'curacao:bon-in')
+
+
+    def testFindDemarcationPort(self):
+
+        port = self.topology.getNetwork('aruba').getPort('aruba:bon')
+        self.assertEqual(self.topology.findDemarcationPort(port), ('bonaire', 'bonaire:aru'))
+
+        port = self.topology.getNetwork('aruba').getPort('aruba:dom')
+        self.assertEqual(self.topology.findDemarcationPort(port), None) # dominica is not in the topology
+
+
+    def testUpdateNetwork(self):
+
+        # replace bonaire with a network without the aruba port
+        spec = '\n'.join( [ l for l in topology.BONAIRE_TOPOLOGY.split('\n') if not 'aruba' in l ] )
+        network = nml.createNMLNetwork(nrm.parsePortSpec(StringIO(spec)), 'bonaire', 'bonaire')
+        self.topology.updateNetwork(network, self.nsa)
+
+        self.assertRaises(error.TopologyError, self.topology.getNetworkPort, 'bonaire:aru-in')
+        network_id, port = self.topology.getNetworkPort('bonaire:cur-in')
+        self.assertIdentical(port, network.getPort('bonaire:cur-in'))
+
+        port = self.topology.getNetwork('aruba').getPort('aruba:bon')
+        self.assertEqual(self.topology.findDemarcationPort(port), None)
+
+
+
+
+def createTopology(specs):
+    # network name -> topology spec, as in test/topology.py
+    nml_topology = nml.Topology()
+    for name, spec in sorted(specs.items()):
+        network = nml.createNMLNetwork(nrm.parsePortSpec(StringIO(spec)), name, name)
+        nml_topology.addNetwork(network, nsa.NetworkServiceAgent(name + ':nsa', name + '-endpoint'))
+    return nml_topology
+
+
+def pathKey(path):
+    return [ (link.src_stp.network, link.src_stp.port, link.src_stp.label.labelValue(), link.dst_stp.port, link.dst_stp.label.labelValue()) for link in path ]
+
+
+
+class ShortestPathTest(unittest.TestCase):
+
+    def setUp(self):
+        self.topology = createTopology(topology.createMeshTopology(8, 6))
+        self.source = nsa.STP('net00', 'net00:ps', nsa.Label(cnt.ETHERNET_VLAN, '1780-1799'))
+        self.dest   = nsa.STP('net04', 'net04:ps', nsa.Label(cnt.ETHERNET_VLAN, '1780-1799'))
+
+
+    def testSameAsRecursion(self):
+
+        all_paths = self.topology._findPathsRecurse(self.source, self.dest, 100)
+        paths = self.topology.findPaths(self.source, self.dest, 100, max_paths=len(all_paths) + 1)
+
+        self.failUnless(len(all_paths) > 2)
+        self.assertEqual(len(paths), len(all_paths))
+        self.assertEqual(sorted( [ pathKey(p) for p in paths ] ), sorted( [ pathKey(p) for p in all_paths ] ))
+
+
+    def testShortestFirst(self):
+
+        all_paths = self.topology._findPathsRecurse(self.source, self.dest, 100)
+        paths = self.topology.findPaths(self.source, self.dest, 100, max_paths=3)
+
+        self.assertEqual(len(paths), 3)
+        self.assertEqual( [ len(p) for p in paths ], [ len(p) for p in all_paths[:3] ])
+        for path in paths:
+            self.failUnless(pathKey(path) in [ pathKey(p) for p in all_paths ])
+
+
+    def testLabelPruning(self):
+
+        dest = nsa.STP('net04', 'net04:ps', nsa.Label(cnt.ETHERNET_VLAN, '1799'))
+        self.assertEqual(self.topology.findPaths(self.source, dest, 100), []) # no link has vlan 1799
+
+        source = nsa.STP('net00', 'net00:ps', nsa.Label(cnt.ETHERNET_VLAN, '1785'))
+        for path in self.topology.findPaths(source, self.dest, 100, max_paths=100):
+            for link in path:
+                self.assertEqual(link.src_stp.label.labelValue(), '1785')
+                self.assertEqual(link.dst_stp.label.labelValue(), '1785')
+
+
+    def testBandwidthPruning(self):
+
+        paths = self.topology.findPaths(self.source, self.dest, 1000, max_paths=100)
+        for path in paths:
+            for link in path[:-1]:
+                port = self.topology.getNetwork(link.dst_stp.network).getPort(link.dst_stp.port)
+                self.failUnless(port.canProvideBandwidth(1000))
+        self.failUnless(len(paths) < len(self.topology.findPaths(self.source, self.dest, 100, max_paths=100)))
+
+
+    def testUnlabeledPorts(self):
+
+        # net00 - net01 - net02 without labels, the direct net00 - net02 link has a label, so it cannot be used
+        port = 'ethernet     %s      %s     %s  1000    em%i    -'
+        specs = {
+            'net00' : [ port % ('ps', '-', '-', 0), port % ('net01', 'net01#net00-(in|out)', '-', 1), port % ('net02', 'net02#net00-(in|out)', 'vlan:1780-1789', 2) ],
+            'net01' : [ port % ('ps', '-', '-', 0), port % ('net00', 'net00#net01-(in|out)', '-', 1), port % ('net02', 'net02#net01-(in|out)', '-', 2) ],
+            'net02' : [ port % ('ps', '-', '-', 0), port % ('net01', 'net01#net02-(in|out)', '-', 1), port % ('net00', 'net00#net02-(in|out)', 'vlan:1780-1789', 2) ]
+        }
+        nml_topology = createTopology( dict( [ (name, '\n'.join(lines) + '\n') for name, lines in specs.items() ] ) )
+        source = nsa.STP('net00', 'net00:ps', None)
+        dest   = nsa.STP('net02', 'net02:ps', None)
+
+        for paths in ( nml_topology.findPaths(source, dest, 100), nml_topology._findPathsRecurse(source, dest, 100) ):
+            self.assertEqual(len(paths), 1)
+            self.assertEqual( [ (link.src_stp.network, link.src_stp.port, link.dst_stp.port) for link in paths[0] ],
+                              [ ('net00', 'net00:ps', 'net00:net01'), ('net01', 'net01:net00', 'net01:net02'), ('net02', 'net02:net01', 'net02:ps') ] )
+            for link in paths[0]:
+                self.assertEqual(link.src_stp.label, None)
+                self.assertEqual(link.dst_stp.label, None)
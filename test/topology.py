@@ -29,3 +29,33 @@ ethernet     bon     bonaire#dom-(in|out)    vlan:1781-1782  100     em2    -
 ethernet     cur     curacao#dom-(in|out)    vlan:1783-1786  1000    em3    -
 """
 
+
+
+# Synthetic mesh topologies, for pathfinding benchmarks
+
+def createMeshTopology(n_networks, n_links, seed=1, vlans=None):
+    """
+    Create a mesh of n_networks networks, in a ring plus n_links random extra
+    links. Each network has a termination port named ps. Links get random vlan
+    ranges, unless vlans is given. Returns a dict with network name ->
+    topology in config format.
+    """
+    import random
+    rng = random.Random(seed)
+
+    names = [ 'net%02i' % i for i in range(n_networks) ]
+    lines = dict( [ (name, [ 'ethernet     ps      -     vlan:1780-1799  1000    em0    -' ]) for name in names ] )
+
+    pairs = set( [ tuple(sorted( (i, (i+1) % n_networks) )) for i in range(n_networks) ] )
+    while len(pairs) < n_networks + n_links:
+        i, j = sorted(rng.sample(range(n_networks), 2))
+        pairs.add( (i,j) )
+
+    for i, j in sorted(pairs):
+        start = rng.randint(1780, 1790)
+        label = vlans or 'vlan:%i-%i' % (start, start + rng.randint(0, 9))
+        bandwidth = rng.choice( [100, 500, 1000] )
+        for a, b in ( (i, j), (j, i) ):
+            lines[names[a]].append('ethernet     %s      %s#%s-(in|out)     %s  %i    em%i    -' % (names[b], names[b], names[a], label, bandwidth, len(lines[names[a]])) )
+
+    return dict( [ (name, '\n'.join(spec_lines) + '\n') for name, spec_lines in lines.items() ] )